@@ -0,0 +1,129 @@
+from Inference import InferenceStage, ProcessInferenceStage, YoloDetector, TiledDetector
+
+import time
+
+import numpy as np
+
+"""
+推理吞吐量基准测试 - 不需要无人机。
+
+使用合成视频源（总是有新帧）测量每秒检测的帧数：
+先在同一进程的线程中运行 (InferenceStage)，
+再用不同数量的工作进程运行 (ProcessInferenceStage)。
+理想情况下，吞吐量随工作进程数量近似线性增长，直到用完 CPU 核心。
+最后测量分块推理 (TiledDetector) 在不同图块设置下处理 4K 帧的吞吐量。
+
+设置 MODEL_PATH 以测试真实的 YOLO 模型，
+设置为 None 则使用纯 Python 的合成检测器（模拟持有 GIL 的计算）。
+"""
+
+# 模型路径，None 使用合成检测器
+MODEL_PATH = None
+
+# 合成帧尺寸
+FRAME_SHAPE = (1080, 1920, 3)
+
+# 要测试的工作进程数量
+WORKER_COUNTS = [1, 2, 4]
+
+# 每个配置的测量时间
+DURATION = 10.0  # 秒
+
+# 预热时间（加载模型、启动进程）
+WARMUP = 5.0  # 秒
+
+# 分块推理的帧尺寸
+TILED_FRAME_SHAPE = (2160, 3840, 3)
+
+# 要测试的分块设置：(图块大小, 重叠比例)，None 表示整帧推理
+TILE_SETTINGS = [None, (1280, 0.2), (960, 0.2), (640, 0.2), (640, 0.1)]
+
+
+class SyntheticSource:
+    """ 模拟 OpenDJI 的视频源，每次调用 waitFrame 都有一个新帧。 """
+
+    def __init__(self):
+        self._seq = 0
+        self._frame = np.random.randint(0, 255, FRAME_SHAPE, dtype=np.uint8)
+
+    def waitFrame(self, last_seq: int = 0, timeout: float | None = None):
+        # 模拟 30 fps 的视频流
+        time.sleep(1 / 30)
+        self._seq += 1
+        return self._seq, self._frame
+
+
+class SyntheticDetector:
+    """ 纯 Python 计算的检测器，运行时持有 GIL。 """
+
+    def __init__(self, work: int = 2000000):
+        self._work = work
+
+    def __call__(self, frames: list) -> list:
+        output = []
+        for frame in frames:
+            total = 0
+            for i in range(self._work):
+                total += i * i
+            output.append((np.zeros((1, 4), dtype=np.float32),
+                           np.ones(1, dtype=np.float32),
+                           np.zeros(1, dtype=np.int32)))
+        return output
+
+
+def measure(stage) -> float:
+    """ 启动推理阶段，预热后测量每秒检测的帧数。 """
+    with stage:
+        time.sleep(WARMUP)
+        start_frames = stage._frames
+        start = time.monotonic()
+        time.sleep(DURATION)
+        return (stage._frames - start_frames) / (time.monotonic() - start)
+
+
+def measureTiled(detector, frame) -> tuple[float, int]:
+    """ 在同一线程中反复检测同一帧，返回 (每秒的帧数, 每帧的图块数)。 """
+    detector([frame])
+    frames = 0
+    start = time.monotonic()
+    while time.monotonic() - start < DURATION:
+        detector([frame])
+        frames += 1
+    tiles = len(detector.tiles(frame.shape)) if isinstance(detector, TiledDetector) else 1
+    return frames / (time.monotonic() - start), tiles
+
+
+if __name__ == '__main__':
+
+    if MODEL_PATH is None:
+        factory, args = SyntheticDetector, ()
+    else:
+        factory, args = YoloDetector, (MODEL_PATH,)
+
+    # 多个视频源，保证工作进程总是有帧可以处理
+    sources = [SyntheticSource() for _ in range(max(WORKER_COUNTS))]
+
+    fps = measure(InferenceStage(factory(*args), sources, max_batch=1))
+    print(f"Thread    : {fps:7.2f} fps")
+    baseline = None
+
+    for workers in WORKER_COUNTS:
+        stage = ProcessInferenceStage(factory, args, sources, workers=workers,
+                                      max_shape=FRAME_SHAPE)
+        fps = measure(stage)
+        baseline = baseline or fps / workers
+        print(f"Workers {workers} : {fps:7.2f} fps "
+              f"(x{fps / baseline:.2f}, ideal x{workers})")
+
+    # 分块推理：一批图块的吞吐量
+    detector = factory(*args)
+    frame = np.random.randint(0, 255, TILED_FRAME_SHAPE, dtype=np.uint8)
+    for setting in TILE_SETTINGS:
+        if setting is None:
+            fps, tiles = measureTiled(detector, frame)
+            name = "Full frame"
+        else:
+            tile, overlap = setting
+            fps, tiles = measureTiled(TiledDetector(detector, tile, overlap), frame)
+            name = f"Tile {tile} / {overlap:.0%}"
+        print(f"{name:16s}: {fps:7.2f} fps ({tiles} tiles, {fps * tiles:7.1f} tiles/s)")
@@ -0,0 +1,335 @@
+from OpenDJI import OpenDJI
+from OpenDJI import BatchListener
+
+from threading import Thread, Condition, Event
+import json
+import math
+import time
+
+"""
+等距拍照调度器 - 测绘任务中每飞行固定的地面距离拍一张照片。
+
+位置和速度通过 listen() 推送（不轮询），每次更新后根据速度预测
+到达下一个触发点的时刻，并提前 "命令延迟" 发送拍照动作。
+命令延迟根据每次 action 的往返时间持续测量。拍照动作在独立的线程中发送，
+不会阻塞导航；每张照片的估计拍摄位置被记录下来，用于统计实际的间距。
+
+使用方法：
+    scheduler = CaptureScheduler(drone, spacing=20.0)
+    scheduler.start()
+    ...                      # 飞行
+    scheduler.stop()
+    print(scheduler.summary())
+"""
+
+# 地球半径
+EARTH_RADIUS = 6371e3  # 米
+
+
+class CaptureRecord:
+    """
+    一次拍照。
+
+    Attributes:
+        sent (float): 发送动作的时间 (time.monotonic)。
+        rtt (float): 动作的往返时间（秒）。
+        latitude (float): 估计的拍摄位置。
+        longitude (float): 估计的拍摄位置。
+        result (str | None): 动作的响应。
+    """
+
+    def __init__(self, sent: float, rtt: float, latitude: float, longitude: float,
+                 result: str | None):
+        self.sent = sent
+        self.rtt = rtt
+        self.latitude = latitude
+        self.longitude = longitude
+        self.result = result
+
+
+class _MotionListener(BatchListener):
+    """ 将位置和速度的更新交给调度器 """
+
+    def __init__(self, scheduler):
+        self._scheduler = scheduler
+
+    def onBatch(self, keys, values, timestamps):
+        self._scheduler._onBatch(keys, values, timestamps)
+
+
+class CaptureScheduler:
+    """
+    按地面距离触发拍照动作。
+    """
+
+    POSITION_KEY = (OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftLocation3D")
+    VELOCITY_KEY = (OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftVelocity")
+
+    def __init__(self, drone: OpenDJI, spacing: float,
+                 action: tuple = (OpenDJI.MODULE_CAMERA, "StartShootPhoto"),
+                 telemetry_latency: float = 0.0, initial_latency: float = 0.1,
+                 min_speed: float = 0.3, trigger_first: bool = True):
+        """
+        Args:
+            drone (OpenDJI): 无人机（需要查询通道）。
+            spacing (float): 相邻照片之间的地面距离（米）。
+            action (tuple): 拍照动作 (模块, 键) 或 (模块, 键, 参数)。
+            telemetry_latency (float): 位置从测量到到达 PC 的延迟（秒）。
+            initial_latency (float): 还没有测量时使用的命令延迟（秒）。
+            min_speed (float): 低于此速度（米/秒）时不预测，只在到达触发点时拍照。
+            trigger_first (bool): start() 时是否立即拍第一张照片。
+        """
+        self._drone = drone
+        self.spacing = spacing
+        self.action = action
+        self.telemetry_latency = telemetry_latency
+        self.min_speed = min_speed
+        self.trigger_first = trigger_first
+
+        # 命令延迟（单程，约为往返时间的一半），指数平均
+        self._latency = initial_latency
+
+        self._cond = Condition()
+        self._live = False
+        self._origin = None
+        self._sample = None       # (时间, e, n)，时间已减去遥测延迟
+        self._velocity = None     # (ve, vn)
+        self._reference = None    # 上一次触发的估计拍摄位置 (e, n)
+        self._fire_time = None
+
+        # 拍照已经请求或正在进行（动作还没有返回），此时的触发推迟到动作返回
+        self._capturing = Event()
+        self._records = []
+        self._delayed = 0
+        self._threads = []
+
+    ###### 启动 / 停止 ######
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self) -> None:
+        """ 订阅位置和速度，启动调度线程和拍照线程。 """
+        self._live = True
+        self._threads = [Thread(target=self.__Schedule__, daemon=True),
+                         Thread(target=self.__Capture__, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        self._drone.listenBatch([self.POSITION_KEY, self.VELOCITY_KEY], _MotionListener(self))
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        """
+        取消订阅并停止线程。
+
+        Args:
+            timeout (float | None): 每次取消订阅和等待线程的超时时间（秒）。
+        """
+        for module, key in (self.POSITION_KEY, self.VELOCITY_KEY):
+            self._drone.unlisten(module, key, timeout=timeout)
+        with self._cond:
+            self._live = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    ###### 遥测 ######
+
+    def _toLocal(self, latitude: float, longitude: float) -> tuple[float, float]:
+        """ 以第一个位置为原点的本地坐标（米）。 """
+        origin_latitude, origin_longitude = self._origin
+        scale_n = math.radians(1.0) * EARTH_RADIUS
+        scale_e = scale_n * math.cos(math.radians(origin_latitude))
+        return (longitude - origin_longitude) * scale_e, (latitude - origin_latitude) * scale_n
+
+    def _toGPS(self, e: float, n: float) -> tuple[float, float]:
+        origin_latitude, origin_longitude = self._origin
+        scale_n = math.radians(1.0) * EARTH_RADIUS
+        scale_e = scale_n * math.cos(math.radians(origin_latitude))
+        return origin_latitude + n / scale_n, origin_longitude + e / scale_e
+
+    def _onBatch(self, keys: list[str], values: list[str], timestamps: list[float]) -> None:
+        position_key = " ".join(self.POSITION_KEY)
+        velocity_key = " ".join(self.VELOCITY_KEY)
+
+        with self._cond:
+            for unique_key, value, timestamp in zip(keys, values, timestamps):
+                try:
+                    data = json.loads(value)
+                    if unique_key == velocity_key:
+                        # NED：x 向北，y 向东
+                        self._velocity = (float(data["y"]), float(data["x"]))
+                    elif unique_key == position_key:
+                        latitude, longitude = float(data["latitude"]), float(data["longitude"])
+                        if self._origin is None:
+                            self._origin = (latitude, longitude)
+                        e, n = self._toLocal(latitude, longitude)
+                        self._sample = (timestamp - self.telemetry_latency, e, n)
+                except (ValueError, TypeError, KeyError):
+                    continue
+
+            self._fire_time = self._predict()
+            self._cond.notify_all()
+
+    def _position(self, at: float) -> tuple[float, float]:
+        """ 用最新的位置和速度外推 'at' 时刻的位置（调用者持有锁）。 """
+        sample_time, e, n = self._sample
+        if self._velocity is None:
+            return e, n
+        ve, vn = self._velocity
+        dt = max(0.0, at - sample_time)
+        return e + ve * dt, n + vn * dt
+
+    def _predict(self) -> float | None:
+        """
+        下一次应该发送动作的时刻（调用者持有锁），没有位置时返回 None。
+
+        拍摄发生在发送之后约一个命令延迟，因此发送时刻 =
+        到达触发点的时刻 - 命令延迟。
+        """
+        if self._sample is None:
+            return None
+        sample_time, e, n = self._sample
+
+        if self._reference is None:
+            return sample_time if self.trigger_first else None
+
+        de, dn = e - self._reference[0], n - self._reference[1]
+        c = de * de + dn * dn - self.spacing * self.spacing
+        if c >= 0:
+            # 已经到达（或越过）触发点
+            return sample_time - self._latency
+
+        speed = math.hypot(*self._velocity) if self._velocity is not None else 0.0
+        if speed < self.min_speed:
+            # 太慢（悬停或转弯）时不预测，等待下一次更新
+            return None
+
+        # 沿当前速度飞行，|位置 + 速度 * t - 参考点| = spacing 的正根
+        ve, vn = self._velocity
+        a = speed * speed
+        b = 2 * (de * ve + dn * vn)
+        t = (-b + math.sqrt(b * b - 4 * a * c)) / (2 * a)
+        return sample_time + t - self._latency
+
+    ###### 后台线程 ######
+
+    def __Schedule__(self):
+        """
+        等待预测的发送时刻，然后把拍照交给拍照线程。
+        每次遥测更新都会重新预测。
+        """
+        # 当前的触发是否已经因为相机忙而推迟（每个触发只计数一次）
+        delayed = False
+        while True:
+            with self._cond:
+                if not self._live:
+                    break
+
+                if self._sample is not None and self._reference is None and not self.trigger_first:
+                    # 不立即拍照：以当前位置作为第一个参考点
+                    self._reference = self._position(time.monotonic())
+                    self._fire_time = self._predict()
+
+                now = time.monotonic()
+                if self._fire_time is None or self._fire_time > now:
+                    wait = None if self._fire_time is None else self._fire_time - now
+                    self._cond.wait(wait)
+                    continue
+
+                if self._capturing.is_set():
+                    # 上一个动作还没有返回（相机忙）：触发保持等待，动作返回后立即拍照。
+                    #  参考点不移动，否则下一个间距从一张没有拍的照片算起
+                    if not delayed:
+                        self._delayed += 1
+                        delayed = True
+                    self._cond.wait()
+                    continue
+                delayed = False
+
+                # 估计的拍摄时刻和位置，作为下一个间距的参考点
+                shot_time = now + self._latency
+                self._reference = self._position(shot_time)
+                self._fire_time = self._predict()
+                self._capturing.set()
+
+    def __Capture__(self):
+        """
+        发送拍照动作，测量往返时间并更新命令延迟。
+        """
+        while self._live:
+            if not self._capturing.wait(timeout=0.5):
+                continue
+
+            sent = time.monotonic()
+            try:
+                result = self._drone.action(*self.action)
+            except Exception as e:
+                print(f"拍照失败: {e}")
+                continue
+            finally:
+                # 动作返回之后才接受新的触发（唤醒等待中的触发）
+                with self._cond:
+                    self._capturing.clear()
+                    self._cond.notify_all()
+            rtt = time.monotonic() - sent
+
+            with self._cond:
+                # 单程延迟约为往返时间的一半
+                self._latency = 0.8 * self._latency + 0.2 * (rtt / 2)
+                if self._sample is None:
+                    continue
+                e, n = self._position(sent + rtt / 2)
+                latitude, longitude = self._toGPS(e, n)
+                self._records.append(CaptureRecord(sent, rtt, latitude, longitude, result))
+
+    ###### 统计 ######
+
+    def latency(self) -> float:
+        """ 当前估计的命令延迟（秒）。 """
+        return self._latency
+
+    def records(self) -> list[CaptureRecord]:
+        """ 所有拍照记录。 """
+        with self._cond:
+            return list(self._records)
+
+    def stats(self) -> dict:
+        """
+        实际间距的统计。
+
+        Return:
+            {"count", "delayed"（因为相机忙而推迟的触发）, "mean", "std", "min", "max", "mean_error", "latency"}，
+            间距单位为米。
+        """
+        records = self.records()
+        spacings = []
+        if self._origin is not None:
+            points = [self._toLocal(record.latitude, record.longitude) for record in records]
+            spacings = [math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(points, points[1:])]
+
+        stats = {"count": len(records), "delayed": self._delayed, "latency": self._latency}
+        if spacings:
+            mean = sum(spacings) / len(spacings)
+            stats.update(
+                mean=mean,
+                std=math.sqrt(sum((s - mean) ** 2 for s in spacings) / len(spacings)),
+                min=min(spacings),
+                max=max(spacings),
+                mean_error=sum(abs(s - self.spacing) for s in spacings) / len(spacings),
+            )
+        return stats
+
+    def summary(self) -> str:
+        """ 统计的文字说明。 """
+        stats = self.stats()
+        text = f"照片: {stats['count']}  推迟: {stats['delayed']}  命令延迟: {stats['latency'] * 1000:.0f} ms"
+        if "mean" in stats:
+            text += (f"\n间距: 平均 {stats['mean']:.2f} m (目标 {self.spacing:.2f} m)  "
+                     f"标准差 {stats['std']:.2f}  最小 {stats['min']:.2f}  最大 {stats['max']:.2f}  "
+                     f"平均误差 {stats['mean_error']:.2f}")
+        return text
@@ -0,0 +1,430 @@
+from OpenDJI import OpenDJI
+from OpenDJI import BatchListener
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Condition
+import argparse
+import base64
+import hashlib
+import socket
+import struct
+import json
+import time
+
+import cv2
+
+"""
+浏览器仪表盘 - 内置的 HTTP 服务器，局域网中的用户不需要 Qt 程序 (main.py)，
+用浏览器就可以观看视频和遥测。
+
+    /                 - 页面（视频 + 遥测）
+    /stream.mjpg      - MJPEG 视频流
+    /snapshot.jpg     - 最新的一帧
+    /ws/video         - WebSocket，每条二进制消息是一帧 JPEG
+    /ws/telemetry     - WebSocket，每条文本消息是遥测的 JSON
+    /telemetry.json   - 最新的遥测
+
+每个新帧只在编码线程中按设定的分辨率编码一次 JPEG，所有观看者共享同一份数据；
+每个观看者总是发送最新的帧，太慢的观看者直接跳过中间的帧，不会积压。
+遥测通过 listenBatch 按固定频率合并，每次合并只序列化一次 JSON。
+因此 CPU 的开销与观看者的数量无关，没有观看者时也不编码。
+
+命令行：
+    python Dashboard.py 10.0.0.6 --port 8080
+"""
+
+# WebSocket 握手使用的 GUID (RFC 6455)
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+_INDEX_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>OpenDJI</title>
+<style>
+body { margin: 0; background: #111; color: #ddd; font-family: monospace; display: flex; }
+img { max-width: 75vw; max-height: 100vh; }
+pre { margin: 8px; font-size: 12px; white-space: pre-wrap; }
+</style>
+</head>
+<body>
+<img src="/stream.mjpg">
+<pre id="telemetry">等待遥测...</pre>
+<script>
+function connect() {
+    var socket = new WebSocket("ws://" + location.host + "/ws/telemetry");
+    socket.onmessage = function (event) {
+        var values = JSON.parse(event.data).values;
+        var text = "";
+        for (var key in values) text += key + "\\n  " + JSON.stringify(values[key]) + "\\n";
+        document.getElementById("telemetry").textContent = text;
+    };
+    socket.onclose = function () { setTimeout(connect, 1000); };
+}
+connect();
+</script>
+</body>
+</html>
+"""
+
+
+def _websocketFrame(payload: bytes, opcode: int) -> bytes:
+    """ 服务器发送的 WebSocket 帧（不掩码，FIN=1）。 """
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+class _TelemetryListener(BatchListener):
+    """ 将合并后的遥测交给仪表盘 """
+
+    def __init__(self, dashboard):
+        self._dashboard = dashboard
+
+    def onBatch(self, keys, values, timestamps):
+        self._dashboard._onBatch(keys, values, timestamps)
+
+
+class Dashboard:
+    """
+    MJPEG / WebSocket 仪表盘服务器，在后台线程中运行。
+    """
+
+    # 默认推送的遥测：(模块, 键)
+    TELEMETRY = [
+        (OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftLocation3D"),
+        (OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftAttitude"),
+        (OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftVelocity"),
+        (OpenDJI.MODULE_FLIGHTCONTROLLER, "CompassHeading"),
+        (OpenDJI.MODULE_GIMBAL, "GimbalAttitude"),
+        (OpenDJI.MODULE_BATTERY, "ChargeRemainingInPercent"),
+    ]
+
+    def __init__(self, drone: OpenDJI, host: str = "0.0.0.0", port: int = 8080,
+                 width: int | None = 960, quality: int = 75, max_fps: float = 15.0,
+                 telemetry: list[tuple[str, str]] | None = None, telemetry_rate: float = 10.0,
+                 send_timeout: float = 10.0):
+        """
+        启动服务器和编码线程。
+
+        Args:
+            drone (OpenDJI): 无人机（需要视频通道，推送遥测还需要查询通道）。
+            host (str): 监听地址，'0.0.0.0' 表示局域网中的所有接口。
+            port (int): 监听端口，0 表示自动选择。
+            width (int | None): JPEG 的宽度（保持宽高比缩放），None 表示原始分辨率。
+            quality (int): JPEG 质量 (0 - 100)。
+            max_fps (float): 最多每秒编码的帧数。
+            telemetry (list | None): 推送的遥测 (模块, 键)，None 使用 TELEMETRY，[] 表示不推送。
+            telemetry_rate (float): 遥测合并推送的频率 (Hz)。
+            send_timeout (float): 发送超时（秒），超过时断开卡住的观看者。
+        """
+        self._drone = drone
+        self.width = width
+        self.quality = quality
+        self.max_fps = max_fps
+        self.send_timeout = send_timeout
+        self._telemetry_keys = list(self.TELEMETRY if telemetry is None else telemetry)
+
+        # 编码后的最新帧，所有观看者共享
+        self._frame_cond = Condition()
+        self._jpeg = None
+        self._jpeg_seq = 0
+        self._viewers = 0
+        self._encoded = 0
+        self._encode_time = 0.0
+
+        # 合并后的最新遥测
+        self._telemetry_cond = Condition()
+        self._values = {}
+        self._telemetry_json = json.dumps({"values": {}})
+        self._telemetry_version = 0
+
+        if self._telemetry_keys:
+            drone.listenBatch(self._telemetry_keys, _TelemetryListener(self), max_rate=telemetry_rate)
+
+        self._live = True
+        self._encoder = Thread(target=self.__Encode__)
+        self._encoder.daemon = True
+        self._encoder.start()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+
+        self._thread = Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        """ 本机访问的地址，例如 'http://127.0.0.1:8080'。 """
+        return f"http://127.0.0.1:{self.port}"
+
+    ###### 编码线程 ######
+
+    def __Encode__(self):
+        """
+        有观看者时等待新帧，缩放并编码一次 JPEG，然后唤醒所有观看者。
+        """
+        last_seq = 0
+        next_time = 0.0
+
+        while self._live:
+            with self._frame_cond:
+                self._frame_cond.wait_for(lambda: self._viewers > 0 or not self._live)
+            if not self._live:
+                break
+
+            # 限制编码帧率
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            seq, frame = self._drone.waitFrame(last_seq, timeout=0.5)
+            if frame is None or seq == last_seq:
+                continue
+            last_seq = seq
+
+            start = time.perf_counter()
+            try:
+                if self.width is not None and frame.shape[1] != self.width:
+                    height = round(frame.shape[0] * self.width / frame.shape[1])
+                    frame = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+                ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            except Exception as e:
+                print(f"JPEG 编码失败: {e}")
+                continue
+            if not ok:
+                continue
+            self._encode_time += time.perf_counter() - start
+            next_time = time.monotonic() + 1.0 / self.max_fps
+
+            with self._frame_cond:
+                self._jpeg = buffer.tobytes()
+                self._jpeg_seq = seq
+                self._encoded += 1
+                self._frame_cond.notify_all()
+
+    def _nextJpeg(self, last_seq: int, timeout: float = 1.0) -> tuple[int, bytes | None]:
+        """
+        等待比 'last_seq' 更新的 JPEG（调用者已经通过 _viewers 注册）。
+
+        Return:
+            (序号, JPEG)，超时时序号等于 'last_seq'。
+        """
+        with self._frame_cond:
+            self._frame_cond.wait_for(lambda: self._jpeg_seq != last_seq or not self._live, timeout)
+            return self._jpeg_seq, self._jpeg
+
+    def _addViewer(self, count: int) -> None:
+        with self._frame_cond:
+            self._viewers += count
+            self._frame_cond.notify_all()
+
+    ###### 遥测 ######
+
+    def _onBatch(self, keys: list[str], values: list[str], timestamps: list[float]) -> None:
+        with self._telemetry_cond:
+            for unique_key, value in zip(keys, values):
+                try:
+                    self._values[unique_key] = json.loads(value)
+                except ValueError:
+                    self._values[unique_key] = value
+
+            # 每次合并只序列化一次，所有观看者发送同一个字符串
+            self._telemetry_json = json.dumps({"time": time.time(), "values": self._values})
+            self._telemetry_version += 1
+            self._telemetry_cond.notify_all()
+
+    def _nextTelemetry(self, last_version: int, timeout: float = 1.0) -> tuple[int, str]:
+        with self._telemetry_cond:
+            self._telemetry_cond.wait_for(
+                lambda: self._telemetry_version != last_version or not self._live, timeout)
+            return self._telemetry_version, self._telemetry_json
+
+    ###### 请求 ######
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> None:
+        path = request.path.split("?", 1)[0]
+        request.connection.settimeout(self.send_timeout)
+
+        try:
+            if path in ("/", "/index.html"):
+                self._sendBody(request, _INDEX_HTML.encode("utf-8"), "text/html; charset=utf-8")
+            elif path == "/stream.mjpg":
+                self._streamMjpeg(request)
+            elif path == "/snapshot.jpg":
+                self._snapshot(request)
+            elif path == "/telemetry.json":
+                self._sendBody(request, self._telemetry_json.encode("utf-8"), "application/json")
+            elif path == "/ws/video":
+                self._streamWebSocket(request, binary=True)
+            elif path == "/ws/telemetry":
+                self._streamWebSocket(request, binary=False)
+            else:
+                request.send_error(404)
+        except (OSError, ValueError):
+            # 观看者断开或发送超时
+            request.close_connection = True
+
+    @staticmethod
+    def _sendBody(request: BaseHTTPRequestHandler, data: bytes, content_type: str) -> None:
+        request.send_response(200)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(data)))
+        request.send_header("Cache-Control", "no-cache")
+        request.end_headers()
+        request.wfile.write(data)
+
+    def _snapshot(self, request: BaseHTTPRequestHandler) -> None:
+        with self._frame_cond:
+            # 没有观看者时编码线程是空闲的，已有的 JPEG 可能很旧，等待新的一帧
+            last_seq = self._jpeg_seq if self._viewers == 0 else 0
+            self._viewers += 1
+            self._frame_cond.notify_all()
+        try:
+            seq, jpeg = self._nextJpeg(last_seq, timeout=2.0)
+        finally:
+            self._addViewer(-1)
+        if jpeg is None or seq == last_seq:
+            request.send_error(503, "没有视频")
+            return
+        self._sendBody(request, jpeg, "image/jpeg")
+
+    def _streamMjpeg(self, request: BaseHTTPRequestHandler) -> None:
+        request.send_response(200)
+        request.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        request.send_header("Cache-Control", "no-cache")
+        request.end_headers()
+        request.close_connection = True
+
+        self._addViewer(1)
+        try:
+            seq = 0
+            while self._live:
+                new_seq, jpeg = self._nextJpeg(seq)
+                if new_seq == seq or jpeg is None:
+                    continue
+                seq = new_seq
+                # 发送期间到达的帧被跳过，下一次直接发送最新的帧
+                request.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n"
+                                    b"Content-Length: " + str(len(jpeg)).encode() + b"\r\n\r\n")
+                request.wfile.write(jpeg)
+                request.wfile.write(b"\r\n")
+                request.wfile.flush()
+        finally:
+            self._addViewer(-1)
+
+    def _streamWebSocket(self, request: BaseHTTPRequestHandler, binary: bool) -> None:
+        key = request.headers.get("Sec-WebSocket-Key")
+        if key is None or "websocket" not in request.headers.get("Upgrade", "").lower():
+            request.send_error(400, "需要 WebSocket")
+            return
+
+        accept = base64.b64encode(hashlib.sha1((key + _WEBSOCKET_GUID).encode()).digest()).decode()
+        request.send_response(101)
+        request.send_header("Upgrade", "websocket")
+        request.send_header("Connection", "Upgrade")
+        request.send_header("Sec-WebSocket-Accept", accept)
+        request.end_headers()
+        request.wfile.flush()
+        request.close_connection = True
+
+        if binary:
+            self._addViewer(1)
+        try:
+            version = 0
+            while self._live:
+                if binary:
+                    new_version, payload = self._nextJpeg(version)
+                    opcode = 0x2
+                else:
+                    new_version, text = self._nextTelemetry(version)
+                    payload = text.encode("utf-8")
+                    opcode = 0x1
+                if new_version == version or payload is None:
+                    continue
+                version = new_version
+                request.wfile.write(_websocketFrame(payload, opcode))
+                request.wfile.flush()
+        finally:
+            if binary:
+                self._addViewer(-1)
+
+    ###### 统计 / 停止 ######
+
+    def stats(self) -> dict:
+        """
+        Return:
+            {"viewers"（当前的视频观看者）, "encoded"（编码的帧数）,
+             "encode_ms"（每帧平均的缩放 + 编码时间）, "jpeg_bytes"（最新一帧的大小）}
+        """
+        return {
+            "viewers": self._viewers,
+            "encoded": self._encoded,
+            "encode_ms": self._encode_time / self._encoded * 1000 if self._encoded else 0.0,
+            "jpeg_bytes": len(self._jpeg) if self._jpeg is not None else 0,
+        }
+
+    def stop(self) -> None:
+        """ 停止服务器和编码线程，取消遥测订阅。 """
+        for module, key in self._telemetry_keys:
+            try:
+                self._drone.unlisten(module, key)
+            except RuntimeError:
+                pass
+
+        self._live = False
+        with self._frame_cond:
+            self._frame_cond.notify_all()
+        with self._telemetry_cond:
+            self._telemetry_cond.notify_all()
+
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._encoder.join(2.0)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="无人机浏览器仪表盘")
+    parser.add_argument("host", help="打开了 MSDK Remote 的手机的 IP 地址")
+    parser.add_argument("--port", type=int, default=8080, help="HTTP 端口")
+    parser.add_argument("--width", type=int, default=960, help="JPEG 宽度，0 表示原始分辨率")
+    parser.add_argument("--quality", type=int, default=75, help="JPEG 质量")
+    parser.add_argument("--fps", type=float, default=15.0, help="最大帧率")
+    arguments = parser.parse_args()
+
+    with OpenDJI(arguments.host) as drone:
+        with Dashboard(drone, port=arguments.port, width=arguments.width or None,
+                       quality=arguments.quality, max_fps=arguments.fps) as dashboard:
+            print(f"仪表盘: http://{socket.gethostname()}:{dashboard.port}/ ，按 Ctrl+C 退出")
+            try:
+                while True:
+                    time.sleep(5)
+                    stats = dashboard.stats()
+                    print(f"观看者: {stats['viewers']}  编码: {stats['encode_ms']:.1f} ms/帧  "
+                          f"{stats['jpeg_bytes'] // 1024} KB", end='\t\t\r')
+            except KeyboardInterrupt:
+                pass
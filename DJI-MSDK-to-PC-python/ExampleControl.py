@@ -28,7 +28,7 @@ ROTATE_VALUE = 0.15
 
 
 # 连接到无人机
-with OpenDJI(IP_ADDR) as drone:
+with OpenDJI(IP_ADDR, channels={"control"}) as drone:
 
     # 按 'x' 关闭程序
     print("按 'x' 关闭程序")
@@ -0,0 +1,43 @@
+from GeoFence import GeoFence
+
+import sys
+
+"""
+这个示例不需要无人机：它在一个正方形禁飞区周围检查 clampMove 的行为。
+
+    - 安全区域中朝向禁飞区的移动停在安全距离之外；
+    - 在安全距离内远离边界、沿边界平行移动都是允许的，接近边界被阻止；
+    - 在禁飞区内离开的移动是允许的，更深入被阻止。
+
+全部检查通过时退出码为 0。
+"""
+
+# 原点和安全距离
+ORIGIN = (31.2304, 121.4737)
+MARGIN = 2.0
+
+fence = GeoFence(*ORIGIN, margin=MARGIN)
+
+# 以原点为中心、边长 40 米的禁飞区（本地坐标 -20 ~ 20 米）
+corners = [(-20.0, -20.0), (20.0, -20.0), (20.0, 20.0), (-20.0, 20.0)]
+fence.addNoFlyZone([fence.toGPS(e, n) for e, n in corners])
+
+# (说明, 起点 e, 起点 n, 位移 de, 位移 dn, 最小比例, 最大比例)
+CHECKS = [
+    ("安全区域，远离",            40.0, 0.0, 5.0, 0.0, 1.0, 1.0),
+    ("安全区域，朝向禁飞区",      30.0, 0.0, -10.0, 0.0, 0.55, 0.8),
+    ("安全距离内，远离",          21.0, 0.0, 5.0, 0.0, 1.0, 1.0),
+    ("安全距离内，平行",          21.0, 0.0, 0.0, 5.0, 1.0, 1.0),
+    ("安全距离内，接近",          21.0, 0.0, -5.0, 0.0, 0.0, 0.0),
+    ("禁飞区内，离开",            19.0, 0.0, 5.0, 0.0, 1.0, 1.0),
+    ("禁飞区内，更深入",          19.0, 0.0, -5.0, 0.0, 0.0, 0.0),
+]
+
+failed = 0
+for name, e, n, de, dn, low, high in CHECKS:
+    scale = fence.clampMove(e, n, de, dn)
+    ok = low - 1e-9 <= scale <= high + 1e-9
+    failed += not ok
+    print(f"{'OK  ' if ok else 'FAIL'} {name}: {scale:.2f} (期望 {low:.2f} ~ {high:.2f})")
+
+sys.exit(1 if failed else 0)
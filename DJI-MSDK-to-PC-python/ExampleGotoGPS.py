@@ -1,5 +1,6 @@
 from OpenDJI import OpenDJI
 from OpenDJI import EventListener
+from GeoFence import GeoFence
 
 import keyboard
 import cv2
@@ -32,6 +33,17 @@ GPS_threshold = 3.0  # 米
 # GPS时间戳阈值 - GPS的有效时间 - 以防GPS信号丢失。
 GPS_timestamp_expired = 3.0  # 秒
 
+# 禁飞区 - 无人机不会进入这些多边形（以及安全距离内）
+# TODO : 设置禁飞区的GPS顶点
+NO_FLY_ZONES = [
+    [(32.13400, 34.80650,), (32.13450, 34.80650,),
+     (32.13450, 34.80720,), (32.13400, 34.80720,)],
+]
+
+# 围栏预测距离 - 作用力为 MOVE_VALUE 时，
+#  每个指令周期内检查前方多远的路径。
+FENCE_LOOKAHEAD = 5.0  # 米
+
 # 移动系数
 MOVE_VALUE = 0.025
 ROTATE_VALUE = 0.15
@@ -211,6 +223,13 @@ def calc_distance(latitude_1, longitude_1, latitude_2, longitude_2):
     return distance
 
 
+# 构建地理围栏，以第一个GPS坐标为本地坐标原点。
+# 索引只在第一次查询时构建一次。
+fence = GeoFence(*POS_GPS_1)
+for zone in NO_FLY_ZONES:
+    fence.addNoFlyZone(zone)
+
+
 # 移动到指定的GPS坐标
 def gotoGPS(drone: OpenDJI, latitude: float, longitude: float):
     """
@@ -248,6 +267,19 @@ def gotoGPS(drone: OpenDJI, latitude: float, longitude: float):
         fb_force = np.cos(np.deg2rad(r_bearing)) * MOVE_VALUE
         lr_force = np.sin(np.deg2rad(r_bearing)) * MOVE_VALUE
 
+        # 按照地理围栏缩小会越界的移动
+        lr_force, fb_force = fence.clampStick(p_latitude, p_longitude, c_bearing,
+                                              lr_force, fb_force,
+                                              FENCE_LOOKAHEAD / MOVE_VALUE)
+
+        # 如果无法在不越界的情况下继续前进，则停止
+        if lr_force == 0.0 and fb_force == 0.0:
+            if DEBUG_OUTPUT:
+                print("Geofence: target is blocked.")
+            drone.move(0, 0, 0, 0)
+            drone.disableControl()
+            return False
+
         # 移动无人机
         drone.move(0, 0, lr_force, fb_force)
 
@@ -12,7 +12,7 @@ import re
 IP_ADDR = "10.0.0.6"
 
 # 连接到无人机
-with OpenDJI(IP_ADDR) as drone:
+with OpenDJI(IP_ADDR, channels={"query"}) as drone:
     # 获取电池信息
     battery_text = drone.getValue(OpenDJI.MODULE_REMOTECONTROLLER, "BatteryInfo")
     print("原始结果 :", battery_text)
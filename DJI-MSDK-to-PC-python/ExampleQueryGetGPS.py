@@ -13,7 +13,7 @@ IP_ADDR = "192.168.1.184"
 NUM_REG = '[-+]?\\d+\\.?\\d*'
 
 # 连接到无人机
-with OpenDJI(IP_ADDR) as drone:
+with OpenDJI(IP_ADDR, channels={"query"}) as drone:
     # 获取位置信息
     location3D = drone.getValue(OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftLocation3D")
     print("Original result :", location3D)
@@ -9,20 +9,28 @@ from OpenDJI import OpenDJI
 IP_ADDR = "10.0.0.6"
 
 # 连接到无人机
-with OpenDJI(IP_ADDR) as drone:
-    # 获取可用模块列表
-    list_modules = drone.getModules()[1:-1].replace('"', '').split(",")
-    print("Modules :", list_modules)
+with OpenDJI(IP_ADDR, channels={"query"}) as drone:
+    # 获取可用模块列表（等待超时时返回 None）
+    modules = drone.getModules()
+    if modules is None:
+        print("Modules : 等待响应超时")
+    else:
+        list_modules = modules[1:-1].replace('"', '').split(",")
+        print("Modules :", list_modules)
     print()
 
     # 获取模块内的可用键 (key) 列表
-    list_keys = drone.getModuleKeys(OpenDJI.MODULE_BATTERY)[1:-1].replace('"', '').split(",")
-    print("Module Keys :", sorted(list_keys))
+    keys = drone.getModuleKeys(OpenDJI.MODULE_BATTERY)
+    if keys is None:
+        print("Module Keys : 等待响应超时")
+    else:
+        list_keys = keys[1:-1].replace('"', '').split(",")
+        print("Module Keys :", sorted(list_keys))
     print()
 
     # 获取特定键 (key) 的信息
     key_info = drone.getKeyInfo(OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftLocation3D")
     print("Key Info :")
-    print(key_info)
+    print(key_info if key_info is not None else "等待响应超时")
 
-    print()
\ No newline at end of file
+    print()
@@ -37,7 +37,7 @@ class MapUpdateListener(EventListener):
 
 
 # 连接到无人机
-with OpenDJI(IP_ADDR) as drone:
+with OpenDJI(IP_ADDR, channels={"query"}) as drone:
     # 注册一些监听器，用于获取操纵杆位置更新
     drone.listen("RemoteController", "StickLeftVertical", MapUpdateListener("LV"))
     drone.listen("RemoteController", "StickLeftHorizontal", MapUpdateListener("LH"))
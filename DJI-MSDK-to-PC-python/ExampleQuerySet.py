@@ -14,7 +14,7 @@ set 功能需要特定的文本，每个键 (key) 都不同，
 IP_ADDR = "10.201.162.60"
 
 # 连接到无人机
-with OpenDJI(IP_ADDR) as drone:
+with OpenDJI(IP_ADDR, channels={"query"}) as drone:
     # 获取 LED 信息
     LEDs_settings_original = drone.getValue("FlightController", "LEDsSettings")
     print("Original result :", LEDs_settings_original)
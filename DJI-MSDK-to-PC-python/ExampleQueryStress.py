@@ -0,0 +1,179 @@
+from OpenDJI import EventListener
+from OpenDJI import BackgroundCommandListener
+
+from threading import Thread, Lock
+import random
+import socket
+import time
+import sys
+
+"""
+这个示例不需要无人机：它启动一个本地的模拟服务器（模拟 MSDK Remote 的查询端口），
+然后从多个线程同时发送 help 和 get 请求，检查每个调用者是否得到自己请求的响应。
+
+模拟服务器会：
+    - 打乱同一批键信息响应的顺序（响应中带有模块和键）；
+    - 对 listen 一个不存在的键回复错误消息（未绑定的消息，不属于任何请求，
+      消息中带有模块名，不能被同时等待的 help 请求取走）；
+    - 对 help 一个不存在的模块或键回复纯文本的错误消息（这个请求的响应）；
+    - 延迟 0.3 秒回复 'help Late'（请求超时后迟到的响应由它自己接收，
+      之后的请求仍然得到自己的响应）；
+    - 随机延迟响应。
+
+全部检查通过时退出码为 0。
+"""
+
+# 并发的线程数和每个线程的请求数
+THREADS = 16
+REQUESTS_PER_THREAD = 300
+
+# 模拟的模块和键
+MODULES = {module: [f"{module}Key{i}" for i in range(20)]
+           for module in ("Gimbal", "RemoteController", "FlightController", "Battery")}
+
+
+def expected(command: str) -> str:
+    """ 模拟服务器对命令的响应 """
+    parts = command.split(" ")
+    if parts[0] == "help":
+        if command == "help Late":
+            return '{"LateKey"}'
+        if len(parts) > 1 and parts[1] not in MODULES:
+            return f"Unknown module {parts[1]}"
+        if len(parts) > 2 and parts[2] not in MODULES[parts[1]]:
+            return f"Unknown key {parts[2]}"
+        if len(parts) == 1:
+            return "{" + ",".join(f'"{m}"' for m in MODULES) + "}"
+        if len(parts) == 2:
+            return "{" + ",".join(f'"{k}"' for k in MODULES[parts[1]]) + "}"
+        return (f"{{module:'{parts[1]}', key:'{parts[2]}', CanGet:true, CanSet:false, "
+                f"CanListen:true, CanAction:false, parameter:'java.lang.Integer', example:\"{len(parts[2])}\"}}")
+    if parts[0] == "get":
+        return f"{parts[1]} {parts[2]} value-of-{parts[2]}"
+    if parts[0] == "listen":
+        return f"Error: {parts[1]} key {parts[2]} not found"
+    return "UnknownCommand"
+
+
+def fakeServer(server: socket.socket):
+    """ 模拟服务器：每次读取一批命令，打乱其中键信息响应的顺序后回复 """
+    conn, _ = server.accept()
+    buffer = ""
+    while True:
+        data = conn.recv(1 << 16)
+        if len(data) == 0:
+            break
+        buffer += data.decode("utf-8")
+        commands = buffer.split("\r\n")
+        buffer = commands[-1]
+
+        replies = [expected(command) for command in commands[:-1] if command]
+
+        # 'help Late' 的响应（以及之后的所有响应）在等待的请求超时之后才发出
+        if "help Late" in commands[:-1]:
+            time.sleep(0.3)
+
+        # 键信息的响应可以交换位置（它们带有模块和键）
+        positions = [i for i, reply in enumerate(replies) if reply.startswith("{module:")]
+        shuffled = [replies[i] for i in positions]
+        random.shuffle(shuffled)
+        for i, reply in zip(positions, shuffled):
+            replies[i] = reply
+
+        if random.random() < 0.3:
+            time.sleep(random.random() * 0.005)
+        conn.sendall(bytes("".join(reply + "\r\n" for reply in replies), "utf-8"))
+
+
+class UnsolicitedCounter(EventListener):
+    """ 统计未请求的消息 """
+
+    def __init__(self):
+        self.count = 0
+
+    def onValue(self, value):
+        self.count += 1
+
+
+# 启动模拟服务器并连接
+server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+server.bind(("127.0.0.1", 0))
+server.listen()
+Thread(target=fakeServer, args=(server,), daemon=True).start()
+
+listener = BackgroundCommandListener(socket.create_connection(server.getsockname()))
+unsolicited = UnsolicitedCounter()
+listener.setUnsolicitedListener(unsolicited)
+
+errors = []
+errors_lock = Lock()
+counts = {"help": 0, "get": 0, "listen": 0}
+
+
+def worker(seed: int):
+    rng = random.Random(seed)
+    for _ in range(REQUESTS_PER_THREAD):
+        module = rng.choice(list(MODULES))
+        key = rng.choice(MODULES[module])
+        kind = rng.random()
+
+        if kind < 0.15:
+            command = "help"
+        elif kind < 0.3:
+            command = f"help {module}"
+        elif kind < 0.7:
+            command = f"help {module} {key}"
+        elif kind < 0.75:
+            # 错误的 help：服务器回复纯文本的错误消息
+            command = rng.choice([f"help Bogus{seed}", f"help {module} Bogus{seed}"])
+        elif kind < 0.95:
+            command = f"get {module} {key}"
+        else:
+            # 错误的 listen：服务器回复一条不属于任何请求的消息
+            listener.send_command(f"listen {module} NoSuchKey")
+            counts["listen"] += 1
+            continue
+
+        if command.startswith("help"):
+            result = listener.readUnbound(command, timeout=5.0)
+            counts["help"] += 1
+            want = expected(command)
+        else:
+            result = listener.readOnce(f"{module} {key}", command)
+            counts["get"] += 1
+            want = expected(command).split(" ", 2)[2]
+
+        if result != want:
+            with errors_lock:
+                errors.append((command, result))
+
+
+start = time.perf_counter()
+threads = [Thread(target=worker, args=(i,)) for i in range(THREADS)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+elapsed = time.perf_counter() - start
+
+# 响应迟到的 help 超时后，迟到的响应由它自己接收，不会交给之后的请求
+late = listener.readUnbound("help Late", timeout=0.1)
+for command in ("help", f"help {list(MODULES)[0]}", "help Bogus", "help"):
+    result = listener.readUnbound(command, timeout=5.0)
+    counts["help"] += 1
+    if result != expected(command):
+        errors.append((command, result))
+if late is not None:
+    errors.append(("help Late", late))
+
+# 等待最后的错误消息到达
+time.sleep(0.2)
+listener.stop(1.0)
+
+print(f"help: {counts['help']}  get: {counts['get']}  错误的 listen: {counts['listen']}  "
+      f"用时: {elapsed:.2f} 秒")
+print(f"未请求的消息: {unsolicited.count}  不匹配的响应: {len(errors)}")
+for command, result in errors[:10]:
+    print(f"    {command!r} -> {result!r}")
+
+sys.exit(1 if errors or unsolicited.count != counts["listen"] else 0)
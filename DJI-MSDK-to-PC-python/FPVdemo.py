@@ -1,4 +1,5 @@
 from OpenDJI import OpenDJI
+from HUD import HUD
 
 import keyboard
 import cv2
@@ -7,6 +8,7 @@ import numpy as np
 """
 在这个示例中，你可以实时飞行并观看无人机的视频！
 就像电脑游戏一样，用键盘移动无人机并在电脑屏幕上看到它的图像！
+视频上叠加了 HUD（高度、速度、电量、航向和操纵杆位置）。
 
     按 F - 无人机起飞。
     按 R - 无人机降落。
@@ -32,13 +34,17 @@ MOVE_VALUE = 0.015
 ROTATE_VALUE = 0.15
 
 # 创建空白帧
-BLANK_FRAME = np.zeros((1080, 1920, 3))
+BLANK_FRAME = np.zeros((1080, 1920, 3), dtype=np.uint8)
 BLNAK_FRAME = cv2.putText(BLANK_FRAME, "No Image", (200, 300),
                           cv2.FONT_HERSHEY_DUPLEX, 10,
                           (255, 255, 255), 15)
 
 # 连接到无人机
 with OpenDJI(IP_ADDR) as drone:
+    # 订阅 HUD 需要的遥测
+    hud = HUD()
+    hud.listen(drone)
+
     # 按 'x' 关闭程序
     print("Press 'x' to close the program")
     while not keyboard.is_pressed('x'):
@@ -56,6 +62,9 @@ with OpenDJI(IP_ADDR) as drone:
                            fx=SCALE_FACTOR,
                            fy=SCALE_FACTOR)
 
+        # 在缩小后的帧上叠加 HUD
+        hud.apply(frame)
+
         # 显示帧
         cv2.imshow("Live video", frame)
         cv2.waitKey(20)
@@ -85,4 +94,6 @@ with OpenDJI(IP_ADDR) as drone:
         if keyboard.is_pressed('f'): print(drone.takeoff(True))
         if keyboard.is_pressed('r'): print(drone.land(True))
         if keyboard.is_pressed('e'): print(drone.enableControl(True))
-        if keyboard.is_pressed('q'): print(drone.disableControl(True))
\ No newline at end of file
+        if keyboard.is_pressed('q'): print(drone.disableControl(True))
+
+    hud.unlisten(drone)
\ No newline at end of file
@@ -0,0 +1,386 @@
+import math
+
+"""
+地理围栏 - 在本地 ENU（东-北-天）坐标系中检查禁飞区和障碍物。
+
+所有多边形在添加时转换为以 'origin' 为原点的本地坐标（米），
+随后一次性构建均匀网格索引，使每次位置更新的查询只需要
+检查附近网格中的少量边，而不是全部多边形。
+"""
+
+# 地球半径
+EARTH_RADIUS = 6371e3  # 米
+
+
+class GeoFence:
+    """
+    地理围栏 - 禁飞多边形、允许飞行区域（keep-in）和障碍点的空间索引。
+
+    支持的查询：
+        isViolated(e, n)      - 该点是否违反围栏。
+        boundaryDistance(e, n) - 到最近围栏边界的距离（米）。
+        clampMove(...)        - 缩短会穿越围栏的移动。
+
+    本地坐标的 x 轴指向东 (e)，y 轴指向北 (n)。
+    """
+
+    def __init__(self, origin_latitude: float, origin_longitude: float,
+                 cell_size: float = 20.0, margin: float = 2.0):
+        """
+        初始化空的地理围栏。
+
+        Args:
+            origin_latitude (float): 本地坐标系原点的纬度。
+            origin_longitude (float): 本地坐标系原点的经度。
+            cell_size (float): 网格单元的边长（米）。
+            margin (float): 与围栏边界保持的安全距离（米）。
+        """
+        self.origin_latitude = origin_latitude
+        self.origin_longitude = origin_longitude
+        self.cell_size = cell_size
+        self.margin = margin
+
+        # 将经纬度（度）转换为米的系数
+        self._scale_n = math.radians(1.0) * EARTH_RADIUS
+        self._scale_e = self._scale_n * math.cos(math.radians(origin_latitude))
+
+        # 多边形列表：(顶点列表, 是否为 keep-in, 包围盒)
+        self._polygons = []
+        # 障碍点列表：(e, n, 半径)
+        self._obstacles = []
+        # 所有多边形的边：(e1, n1, e2, n2)
+        self._edges = []
+
+        # 网格索引，在 build() 中构建
+        self._cell_edges = {}
+        self._cell_polygons = {}
+        self._cell_obstacles = {}
+        self._keep_in = []
+        self._grid_bounds = None
+        self._built = False
+
+    ###### 坐标转换 ######
+
+    def toLocal(self, latitude: float, longitude: float) -> tuple[float, float]:
+        """
+        将 GPS 坐标转换为本地 ENU 坐标（米）。
+
+        Return:
+            (e, n) 相对于原点的东向和北向距离。
+        """
+        return ((longitude - self.origin_longitude) * self._scale_e,
+                (latitude - self.origin_latitude) * self._scale_n)
+
+    def toGPS(self, e: float, n: float) -> tuple[float, float]:
+        """
+        将本地 ENU 坐标（米）转换回 GPS 坐标。
+
+        Return:
+            (latitude, longitude)
+        """
+        return (self.origin_latitude + n / self._scale_n,
+                self.origin_longitude + e / self._scale_e)
+
+    ###### 构建围栏 ######
+
+    def addNoFlyZone(self, points: list[tuple[float, float]]) -> None:
+        """
+        添加禁飞多边形，无人机不允许进入其内部。
+
+        Args:
+            points (list): 多边形顶点的 (latitude, longitude) 列表。
+        """
+        self._addPolygon(points, keep_in=False)
+
+    def addKeepInZone(self, points: list[tuple[float, float]]) -> None:
+        """
+        添加允许飞行的多边形，一旦设置了至少一个，
+        无人机必须位于其中某个多边形的内部。
+
+        Args:
+            points (list): 多边形顶点的 (latitude, longitude) 列表。
+        """
+        self._addPolygon(points, keep_in=True)
+
+    def addObstacle(self, latitude: float, longitude: float, radius: float) -> None:
+        """
+        添加障碍点，无人机必须与其保持 'radius' 米的距离。
+
+        Args:
+            latitude (float): 障碍点的纬度。
+            longitude (float): 障碍点的经度。
+            radius (float): 障碍物半径（米）。
+        """
+        e, n = self.toLocal(latitude, longitude)
+        self._obstacles.append((e, n, radius))
+        self._built = False
+
+    def _addPolygon(self, points, keep_in: bool) -> None:
+        if len(points) < 3:
+            raise ValueError("多边形至少需要三个顶点")
+
+        vertices = [self.toLocal(lat, lon) for lat, lon in points]
+        es = [v[0] for v in vertices]
+        ns = [v[1] for v in vertices]
+        bbox = (min(es), min(ns), max(es), max(ns))
+        self._polygons.append((vertices, keep_in, bbox))
+
+        # 保存多边形的所有边（包括闭合边）
+        for i in range(len(vertices)):
+            e1, n1 = vertices[i]
+            e2, n2 = vertices[(i + 1) % len(vertices)]
+            self._edges.append((e1, n1, e2, n2))
+        self._built = False
+
+    def _cell(self, e: float, n: float) -> tuple[int, int]:
+        return (math.floor(e / self.cell_size), math.floor(n / self.cell_size))
+
+    def _cellsOfBox(self, min_e, min_n, max_e, max_n):
+        ie1, in1 = self._cell(min_e, min_n)
+        ie2, in2 = self._cell(max_e, max_n)
+        for ie in range(ie1, ie2 + 1):
+            for in_ in range(in1, in2 + 1):
+                yield (ie, in_)
+
+    def build(self) -> None:
+        """
+        构建网格索引。添加多边形后会在第一次查询时自动调用，
+        也可以提前调用以避免第一次查询的延迟。
+        """
+        self._cell_edges = {}
+        self._cell_polygons = {}
+        self._cell_obstacles = {}
+
+        # 将每条边登记到其包围盒覆盖的所有网格中
+        for index, (e1, n1, e2, n2) in enumerate(self._edges):
+            for cell in self._cellsOfBox(min(e1, e2), min(n1, n2), max(e1, e2), max(n1, n2)):
+                self._cell_edges.setdefault(cell, []).append(index)
+
+        # 将每个禁飞多边形登记到其包围盒覆盖的所有网格中，
+        # keep-in 多边形需要对全部空间判断，因此单独保存。
+        self._keep_in = [index for index, polygon in enumerate(self._polygons) if polygon[1]]
+        for index, (_, keep_in, bbox) in enumerate(self._polygons):
+            if keep_in:
+                continue
+            for cell in self._cellsOfBox(*bbox):
+                self._cell_polygons.setdefault(cell, []).append(index)
+
+        # 障碍点同时作为 "边界" 参与距离查询
+        for index, (e, n, radius) in enumerate(self._obstacles):
+            for cell in self._cellsOfBox(e - radius, n - radius, e + radius, n + radius):
+                self._cell_obstacles.setdefault(cell, []).append(index)
+
+        # 记录网格的范围，用于限制最近边界的搜索
+        cells = list(self._cell_edges) + list(self._cell_obstacles)
+        if cells:
+            self._grid_bounds = (min(c[0] for c in cells), min(c[1] for c in cells),
+                                 max(c[0] for c in cells), max(c[1] for c in cells))
+        else:
+            self._grid_bounds = None
+
+        self._built = True
+
+    ###### 查询 ######
+
+    @staticmethod
+    def _insidePolygon(e: float, n: float, vertices) -> bool:
+        """ 射线法判断点是否在多边形内部 """
+        inside = False
+        e1, n1 = vertices[-1]
+        for e2, n2 in vertices:
+            if (n1 > n) != (n2 > n):
+                if e < (e2 - e1) * (n - n1) / (n2 - n1) + e1:
+                    inside = not inside
+            e1, n1 = e2, n2
+        return inside
+
+    @staticmethod
+    def _segmentDistance(e: float, n: float, e1, n1, e2, n2) -> float:
+        """ 点到线段的距离 """
+        de = e2 - e1
+        dn = n2 - n1
+        length2 = de * de + dn * dn
+        if length2 == 0.0:
+            return math.hypot(e - e1, n - n1)
+        t = ((e - e1) * de + (n - n1) * dn) / length2
+        t = min(1.0, max(0.0, t))
+        return math.hypot(e - (e1 + t * de), n - (n1 + t * dn))
+
+    def isViolated(self, e: float, n: float) -> bool:
+        """
+        检查本地坐标点是否违反围栏：位于禁飞区内、
+        障碍物半径内，或者位于所有 keep-in 区域之外。
+
+        Args:
+            e (float): 东向坐标（米）。
+            n (float): 北向坐标（米）。
+        """
+        if not self._built:
+            self.build()
+
+        cell = self._cell(e, n)
+
+        for index in self._cell_polygons.get(cell, ()):
+            vertices, _, bbox = self._polygons[index]
+            if bbox[0] <= e <= bbox[2] and bbox[1] <= n <= bbox[3]:
+                if self._insidePolygon(e, n, vertices):
+                    return True
+
+        for index in self._cell_obstacles.get(cell, ()):
+            oe, on, radius = self._obstacles[index]
+            if math.hypot(e - oe, n - on) < radius:
+                return True
+
+        # 如果定义了 keep-in 区域，则点必须在其中之一的内部
+        for index in self._keep_in:
+            vertices, _, bbox = self._polygons[index]
+            if bbox[0] <= e <= bbox[2] and bbox[1] <= n <= bbox[3]:
+                if self._insidePolygon(e, n, vertices):
+                    return False
+        return len(self._keep_in) > 0
+
+    def boundaryDistance(self, e: float, n: float) -> float:
+        """
+        计算到最近的围栏边界（多边形边或障碍物圆周）的距离。
+        从点所在的网格开始逐圈向外搜索，
+        一旦剩余网格不可能更近就停止。
+
+        Args:
+            e (float): 东向坐标（米）。
+            n (float): 北向坐标（米）。
+
+        Return:
+            距离（米），如果没有任何边界则为 math.inf。
+        """
+        if not self._built:
+            self.build()
+        if self._grid_bounds is None:
+            return math.inf
+
+        ce, cn = self._cell(e, n)
+        bounds = self._grid_bounds
+        min_e, min_n, max_e, max_n = bounds
+        # 从第一个与网格范围相交的圈开始，到覆盖整个范围的圈结束
+        first_ring = max(0, min_e - ce, ce - max_e, min_n - cn, cn - max_n)
+        last_ring = max(abs(ce - min_e), abs(ce - max_e), abs(cn - min_n), abs(cn - max_n))
+
+        best = math.inf
+        seen_edges = set()
+        seen_obstacles = set()
+
+        for ring in range(first_ring, last_ring + 1):
+            # 第 'ring' 圈中的网格与点的距离至少为 (ring - 1) * cell_size
+            if best <= (ring - 1) * self.cell_size:
+                break
+
+            for cell in self._ringCells(ce, cn, ring, bounds):
+                for index in self._cell_edges.get(cell, ()):
+                    if index in seen_edges:
+                        continue
+                    seen_edges.add(index)
+                    best = min(best, self._segmentDistance(e, n, *self._edges[index]))
+
+                for index in self._cell_obstacles.get(cell, ()):
+                    if index in seen_obstacles:
+                        continue
+                    seen_obstacles.add(index)
+                    oe, on, radius = self._obstacles[index]
+                    best = min(best, abs(math.hypot(e - oe, n - on) - radius))
+
+        return best
+
+    @staticmethod
+    def _ringCells(ce: int, cn: int, ring: int, bounds):
+        """ 以 (ce, cn) 为中心的第 'ring' 圈网格，裁剪到网格范围 'bounds' 内 """
+        min_e, min_n, max_e, max_n = bounds
+        if ring == 0:
+            yield (ce, cn)
+            return
+        e_range = range(max(ce - ring, min_e), min(ce + ring, max_e) + 1)
+        n_range = range(max(cn - ring + 1, min_n), min(cn + ring - 1, max_n) + 1)
+        for in_ in (cn - ring, cn + ring):
+            if min_n <= in_ <= max_n:
+                for ie in e_range:
+                    yield (ie, in_)
+        for ie in (ce - ring, ce + ring):
+            if min_e <= ie <= max_e:
+                for in_ in n_range:
+                    yield (ie, in_)
+
+    def clampMove(self, e: float, n: float, de: float, dn: float) -> float:
+        """
+        检查从 (e, n) 沿 (de, dn) 移动是否会使围栏的情况变差，
+        并返回允许的移动比例。
+
+        在安全区域中，移动不能进入安全距离；已经在安全距离内（或违反围栏）时，
+        远离边界、沿边界平行移动和离开违反区域的移动都是允许的，
+        只有更接近（或更深入）围栏的部分被截断。
+
+        使用步进（sphere tracing）：每一步前进到最近边界距离减去安全距离，
+        因此不会跳过狭窄的禁飞区；在安全距离内使用固定的小步长。
+
+        Args:
+            e (float): 当前东向坐标（米）。
+            n (float): 当前北向坐标（米）。
+            de (float): 期望的东向位移（米）。
+            dn (float): 期望的北向位移（米）。
+
+        Return:
+            0.0 到 1.0 之间的比例，1.0 表示整个移动都是允许的。
+        """
+        length = math.hypot(de, dn)
+        if length == 0.0:
+            return 1.0
+
+        min_step = min(self.margin, self.cell_size) * 0.25
+        # 沿边界平行移动时距离的数值误差
+        tolerance = 1e-3
+
+        # 侵入程度：安全区域为 0，进入安全距离后随着接近边界增大，违反围栏后随着深入继续增大。
+        #  沿路径的侵入程度不能超过之前达到的最小值
+        best = math.inf
+        previous = 0.0
+        travelled = 0.0
+        while True:
+            pe = e + de * travelled / length
+            pn = n + dn * travelled / length
+
+            distance = self.boundaryDistance(pe, pn)
+            violated = self.isViolated(pe, pn)
+            penalty = self.margin + distance if violated else max(0.0, self.margin - distance)
+            if penalty > best + tolerance:
+                return max(0.0, min(1.0, previous / length))
+            best = min(best, penalty)
+
+            if travelled >= length:
+                return 1.0
+
+            previous = travelled
+            clearance = 0.0 if violated else distance - self.margin
+            travelled = min(length, travelled + max(clearance, min_step))
+
+    def clampStick(self, latitude: float, longitude: float, heading: float,
+                   lr: float, bf: float, lookahead: float) -> tuple[float, float]:
+        """
+        将机体坐标系的移动指令（与 OpenDJI.move 的 lr/bf 参数相同）
+        按照围栏进行缩放，以便在发送 move() 之前阻止越界。
+
+        Args:
+            latitude (float): 无人机当前纬度。
+            longitude (float): 无人机当前经度。
+            heading (float): 罗盘方位角（度，正北为 0，顺时针）。
+            lr (float): 向左 (-) 或向右 (+) 的作用力。
+            bf (float): 向后 (-) 或向前 (+) 的作用力。
+            lookahead (float): 作用力为 1.0 时在预测时间窗内移动的距离（米）。
+
+        Return:
+            缩放后的 (lr, bf)。
+        """
+        h = math.radians(heading)
+        # 前向单位向量 (sin h, cos h)，右向单位向量 (cos h, -sin h)
+        de = (bf * math.sin(h) + lr * math.cos(h)) * lookahead
+        dn = (bf * math.cos(h) - lr * math.sin(h)) * lookahead
+
+        e, n = self.toLocal(latitude, longitude)
+        scale = self.clampMove(e, n, de, dn)
+        return lr * scale, bf * scale
@@ -0,0 +1,254 @@
+from functools import lru_cache
+import math
+
+import numpy as np
+
+"""
+像素地理定位 - 将图像上的点（例如检测框的中心）投影到地面，得到经纬度。
+
+一次处理一帧中的所有点：相机内参的逆矩阵和相机姿态的旋转矩阵合并为
+一个 3x3 矩阵（按相机姿态缓存），每个点只需要一次矩阵乘法和一次除法。
+地面可以是平面（起飞点高度），也可以是高程网格 (ElevationGrid)。
+
+坐标系：
+    相机 - x 向右，y 向下，z 沿光轴向前。
+    本地 - ENU（东-北-天），原点在无人机正下方的起飞点高度，单位为米。
+
+姿态使用云台的绝对角度（度）：yaw 以正北为 0、顺时针为正，
+pitch 水平为 0、向下为负（-90 为垂直向下），roll 向右为正。
+
+使用方法：
+    locator = GeoLocator(CameraModel(hfov=82.1))
+    state = sync.atFrame(detections.seq)     # TimeSync
+    latlon = locator.locateDetections(detections, state)
+"""
+
+# 地球半径
+EARTH_RADIUS = 6371e3  # 米
+
+# 缓存旋转矩阵时角度的精度（度）
+ANGLE_RESOLUTION = 0.01
+
+# 相机坐标 -> 机体坐标 (x 向前, y 向右, z 向下)
+_BODY_FROM_CAMERA = np.array([[0.0, 0.0, 1.0],
+                              [1.0, 0.0, 0.0],
+                              [0.0, 1.0, 0.0]])
+
+# NED -> ENU
+_ENU_FROM_NED = np.array([[0.0, 1.0, 0.0],
+                          [1.0, 0.0, 0.0],
+                          [0.0, 0.0, -1.0]])
+
+
+@lru_cache(maxsize=1024)
+def _rotation(yaw: float, pitch: float, roll: float) -> np.ndarray:
+    """ 相机坐标 -> ENU 的旋转矩阵（角度已经按 ANGLE_RESOLUTION 取整）。 """
+    cy, sy = math.cos(math.radians(yaw)), math.sin(math.radians(yaw))
+    cp, sp = math.cos(math.radians(pitch)), math.sin(math.radians(pitch))
+    cr, sr = math.cos(math.radians(roll)), math.sin(math.radians(roll))
+
+    rz = np.array([[cy, -sy, 0.0], [sy, cy, 0.0], [0.0, 0.0, 1.0]])
+    ry = np.array([[cp, 0.0, sp], [0.0, 1.0, 0.0], [-sp, 0.0, cp]])
+    rx = np.array([[1.0, 0.0, 0.0], [0.0, cr, -sr], [0.0, sr, cr]])
+    return _ENU_FROM_NED @ rz @ ry @ rx @ _BODY_FROM_CAMERA
+
+
+def rotationMatrix(yaw: float, pitch: float, roll: float) -> np.ndarray:
+    """
+    相机坐标 -> ENU 的旋转矩阵，按角度缓存（只读，不要修改）。
+
+    Args:
+        yaw (float): 偏航（度），正北为 0，顺时针为正。
+        pitch (float): 俯仰（度），向下为负。
+        roll (float): 横滚（度）。
+    """
+    def snap(angle):
+        return round(angle / ANGLE_RESOLUTION) * ANGLE_RESOLUTION
+
+    return _rotation(snap(yaw), snap(pitch), snap(roll))
+
+
+class CameraModel:
+    """
+    针孔相机模型。内参可以来自水平视场角，也可以来自某个分辨率下的标定结果，
+    其他分辨率（例如缩小后的视频）按比例换算。
+    """
+
+    def __init__(self, hfov: float = 82.1,
+                 calibration: tuple[int, int, float, float, float, float] | None = None):
+        """
+        Args:
+            hfov (float): 水平视场角（度），没有标定结果时使用。
+            calibration (tuple | None): (宽, 高, fx, fy, cx, cy)，标定时的分辨率和内参（像素）。
+        """
+        self.hfov = hfov
+        self.calibration = calibration
+        self._inverse = lru_cache(maxsize=16)(self._computeInverse)
+
+    def intrinsics(self, width: int, height: int) -> np.ndarray:
+        """ 该分辨率下的内参矩阵 K (3x3)。 """
+        if self.calibration is not None:
+            cal_width, cal_height, fx, fy, cx, cy = self.calibration
+            sx, sy = width / cal_width, height / cal_height
+            fx, fy, cx, cy = fx * sx, fy * sy, cx * sx, cy * sy
+        else:
+            fx = fy = (width / 2) / math.tan(math.radians(self.hfov) / 2)
+            cx, cy = width / 2, height / 2
+        return np.array([[fx, 0.0, cx], [0.0, fy, cy], [0.0, 0.0, 1.0]])
+
+    def _computeInverse(self, width: int, height: int) -> np.ndarray:
+        return np.linalg.inv(self.intrinsics(width, height))
+
+    def inverse(self, width: int, height: int) -> np.ndarray:
+        """ 内参的逆矩阵 K^-1，按分辨率缓存。 """
+        return self._inverse(int(width), int(height))
+
+
+class ElevationGrid:
+    """
+    规则网格的地面高程（DEM），高度与无人机的高度使用同一个基准（例如起飞点）。
+    """
+
+    def __init__(self, heights: np.ndarray, origin_latitude: float, origin_longitude: float,
+                 spacing: float):
+        """
+        Args:
+            heights (np.ndarray): (行, 列) 高度（米），第 0 行在南，第 0 列在西。
+            origin_latitude (float): 第 0 行第 0 列的纬度。
+            origin_longitude (float): 第 0 行第 0 列的经度。
+            spacing (float): 网格间距（米）。
+        """
+        self.heights = np.asarray(heights, dtype=np.float64)
+        self.origin_latitude = origin_latitude
+        self.origin_longitude = origin_longitude
+        self.spacing = spacing
+
+    def heightAt(self, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+        """ 双线性插值的高度（向量化），网格之外使用边缘的值。 """
+        scale_n = math.radians(1.0) * EARTH_RADIUS
+        scale_e = scale_n * math.cos(math.radians(self.origin_latitude))
+        row = (np.asarray(latitude) - self.origin_latitude) * scale_n / self.spacing
+        col = (np.asarray(longitude) - self.origin_longitude) * scale_e / self.spacing
+
+        rows, cols = self.heights.shape
+        row = np.clip(row, 0, rows - 1)
+        col = np.clip(col, 0, cols - 1)
+        r0 = np.minimum(row.astype(np.intp), max(rows - 2, 0))
+        c0 = np.minimum(col.astype(np.intp), max(cols - 2, 0))
+        r1 = np.minimum(r0 + 1, rows - 1)
+        c1 = np.minimum(c0 + 1, cols - 1)
+        fr = row - r0
+        fc = col - c0
+
+        h = self.heights
+        top = h[r0, c0] * (1 - fc) + h[r0, c1] * fc
+        bottom = h[r1, c0] * (1 - fc) + h[r1, c1] * fc
+        return top * (1 - fr) + bottom * fr
+
+
+class GeoLocator:
+    """
+    将图像上的点投影到地面（平面或 ElevationGrid）。
+    """
+
+    def __init__(self, camera: CameraModel, dem: ElevationGrid | None = None,
+                 ground_altitude: float = 0.0, iterations: int = 3, max_range: float = 5000.0):
+        """
+        Args:
+            camera (CameraModel): 相机模型。
+            dem (ElevationGrid | None): 地面高程，None 表示平坦地面。
+            ground_altitude (float): 平坦地面的高度（与无人机高度同一基准）。
+            iterations (int): 使用 DEM 时求交点的迭代次数。
+            max_range (float): 超过此水平距离（米）的点视为无效（接近地平线）。
+        """
+        self.camera = camera
+        self.dem = dem
+        self.ground_altitude = ground_altitude
+        self.iterations = iterations
+        self.max_range = max_range
+
+    def rays(self, points: np.ndarray, width: int, height: int,
+             yaw: float, pitch: float, roll: float) -> np.ndarray:
+        """
+        像素点在 ENU 坐标中的方向（未归一化）。
+
+        Args:
+            points (np.ndarray): (N, 2) 像素坐标 (u, v)。
+            width (int): 图像宽度。
+            height (int): 图像高度。
+            yaw, pitch, roll (float): 相机的绝对姿态（度）。
+
+        Return:
+            (N, 3) 方向 (e, n, u)。
+        """
+        # 相机姿态和内参合并为一个矩阵：方向 = M @ [u, v, 1]
+        matrix = rotationMatrix(yaw, pitch, roll) @ self.camera.inverse(width, height)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return points @ matrix[:, :2].T + matrix[:, 2]
+
+    def project(self, points: np.ndarray, width: int, height: int,
+                latitude: float, longitude: float, altitude: float,
+                yaw: float, pitch: float, roll: float) -> np.ndarray:
+        """
+        将像素点投影到地面。
+
+        Args:
+            points (np.ndarray): (N, 2) 像素坐标 (u, v)。
+            width (int): 图像宽度。
+            height (int): 图像高度。
+            latitude, longitude (float): 无人机的位置。
+            altitude (float): 无人机的高度（米）。
+            yaw, pitch, roll (float): 相机（云台）的绝对姿态（度）。
+
+        Return:
+            (N, 2) 纬度和经度，没有与地面相交的点为 NaN；
+            姿态不完整（例如 TimeSync 没有足够新的样本，值为 NaN）时全部为 NaN。
+        """
+        if not np.all(np.isfinite([latitude, longitude, altitude, yaw, pitch, roll])):
+            return np.full((len(np.asarray(points).reshape(-1, 2)), 2), np.nan)
+
+        rays = self.rays(points, width, height, yaw, pitch, roll)
+        down = rays[:, 2]
+        valid = down < -1e-6
+
+        scale_n = math.radians(1.0) * EARTH_RADIUS
+        scale_e = scale_n * math.cos(math.radians(latitude))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # 平坦地面的交点
+            ground = np.full(len(rays), self.ground_altitude)
+            for _ in range(1 + (self.iterations if self.dem is not None else 0)):
+                distance = (ground - altitude) / down
+                e = rays[:, 0] * distance
+                n = rays[:, 1] * distance
+                result_latitude = latitude + n / scale_n
+                result_longitude = longitude + e / scale_e
+                if self.dem is not None:
+                    # 用交点处的地面高度重新求交（地形不太陡时收敛）
+                    ground = self.dem.heightAt(result_latitude, result_longitude)
+
+        valid &= (distance > 0) & (e * e + n * n < self.max_range ** 2)
+        result = np.stack([result_latitude, result_longitude], axis=1)
+        result[~valid] = np.nan
+        return result
+
+    def locateDetections(self, detections, state: dict) -> np.ndarray:
+        """
+        检测框中心的经纬度。
+
+        Args:
+            detections (Detections): 检测结果（Inference）。
+            state (dict): 帧时刻的遥测，TimeSync.atFrame() 的结果，
+                需要 "position" 和 "gimbal"。
+
+        Return:
+            (N, 2) 纬度和经度，无效的点为 NaN。
+        """
+        boxes = np.asarray(detections.boxes, dtype=np.float64).reshape(-1, 4)
+        centres = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+        height, width = detections.frame_shape[:2]
+        position = state["position"]
+        gimbal = state["gimbal"]
+        return self.project(centres, width, height,
+                            position["latitude"], position["longitude"], position["altitude"],
+                            gimbal["yaw"], gimbal["pitch"], gimbal["roll"])
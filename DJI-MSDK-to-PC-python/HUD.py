@@ -0,0 +1,324 @@
+from OpenDJI import OpenDJI
+from OpenDJI import EventListener
+
+from threading import Lock
+import json
+import math
+
+import cv2
+import numpy as np
+
+"""
+HUD - 在视频上叠加遥测信息（高度、速度、电量、航向、操纵杆位置）。
+
+静态部分（面板、标签、准星、摇杆框）只在显示尺寸改变时绘制一次；
+每个控件只在它的值改变时重新绘制自己的区域。
+叠加时只处理控件所在的区域，并使用预乘的颜色和透明度，
+每个区域只需要一次 OpenCV 乘法和一次加法。
+
+使用方法：
+    hud = HUD()
+    hud.listen(drone)
+    ...
+    frame = cv2.resize(frame, ...)   # 先缩小到显示尺寸
+    hud.apply(frame)                 # 原地绘制
+"""
+
+# 遥控器摇杆的范围
+STICK_RANGE = 660
+
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class _Widget:
+    """
+    HUD 控件：占据一个矩形区域，依赖一组值的名称。
+
+    pm / ia 是区域的预乘颜色和反向透明度 (255 - alpha)，
+    控件重新绘制后更新。
+    """
+
+    def __init__(self, names: tuple, rect: tuple):
+        self.names = names
+        self.rect = rect
+        self.pm = None
+        self.ia = None
+
+    def drawStatic(self, hud, color: np.ndarray, alpha: np.ndarray) -> None:
+        """ 在静态层上绘制不变的部分（坐标相对于控件区域）。 """
+        pass
+
+    def drawValue(self, hud, color: np.ndarray, alpha: np.ndarray, values: dict) -> None:
+        """ 在区域上绘制当前的值（坐标相对于控件区域）。 """
+        pass
+
+
+class _TextWidget(_Widget):
+    """ 半透明面板，左侧标签，右侧数值。 """
+
+    def __init__(self, name: str, label: str, rect: tuple):
+        super().__init__((name,), rect)
+        self.label = label
+
+    def drawStatic(self, hud, color, alpha):
+        alpha[:] = 110
+        hud.putText(color, alpha, self.label, (hud.pad, self.rect[3] - hud.pad))
+
+    def drawValue(self, hud, color, alpha, values):
+        text = values.get(self.names[0], "--")
+        hud.putText(color, alpha, text, (self.rect[2] // 3, self.rect[3] - hud.pad))
+
+
+class _StickWidget(_Widget):
+    """ 摇杆框，点表示摇杆的位置。 """
+
+    def __init__(self, horizontal: str, vertical: str, rect: tuple):
+        super().__init__((horizontal, vertical), rect)
+
+    def drawStatic(self, hud, color, alpha):
+        w, h = self.rect[2], self.rect[3]
+        alpha[:] = 70
+        for canvas, value in ((color, hud.color), (alpha, 255)):
+            cv2.rectangle(canvas, (0, 0), (w - 1, h - 1), value, 1)
+            cv2.line(canvas, (w // 2, 0), (w // 2, h - 1), value, 1)
+            cv2.line(canvas, (0, h // 2), (w - 1, h // 2), value, 1)
+
+    def drawValue(self, hud, color, alpha, values):
+        w, h = self.rect[2], self.rect[3]
+        horizontal = values.get(self.names[0], 0) / STICK_RANGE
+        vertical = values.get(self.names[1], 0) / STICK_RANGE
+        x = int((0.5 + 0.5 * min(max(horizontal, -1.0), 1.0)) * (w - 1))
+        y = int((0.5 - 0.5 * min(max(vertical, -1.0), 1.0)) * (h - 1))
+        radius = max(3, w // 14)
+        cv2.circle(color, (x, y), radius, hud.color, -1)
+        cv2.circle(alpha, (x, y), radius, 255, -1)
+
+
+class _CrosshairWidget(_Widget):
+    """ 画面中心的准星（只有静态部分）。 """
+
+    def __init__(self, rect: tuple):
+        super().__init__((), rect)
+
+    def drawStatic(self, hud, color, alpha):
+        w, h = self.rect[2], self.rect[3]
+        gap = w // 5
+        for canvas, value in ((color, hud.color), (alpha, 255)):
+            cv2.line(canvas, (0, h // 2), (w // 2 - gap, h // 2), value, hud.thickness)
+            cv2.line(canvas, (w // 2 + gap, h // 2), (w - 1, h // 2), value, hud.thickness)
+            cv2.line(canvas, (w // 2, 0), (w // 2, h // 2 - gap), value, hud.thickness)
+            cv2.line(canvas, (w // 2, h // 2 + gap), (w // 2, h - 1), value, hud.thickness)
+
+
+class _HUDListener(EventListener):
+    """ 解析 listen() 的新值并更新 HUD（在网络线程中调用）。 """
+
+    def __init__(self, hud, parser):
+        self._hud = hud
+        self._parser = parser
+
+    def onValue(self, value):
+        try:
+            updates = self._parser(value)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return
+        for name, text in updates.items():
+            self._hud.setValue(name, text)
+
+
+def _parseLocation(value: str) -> dict:
+    return {"altitude": f"{float(json.loads(value)['altitude']):.1f} m"}
+
+
+def _parseVelocity(value: str) -> dict:
+    velocity = json.loads(value)
+    speed = math.hypot(float(velocity["x"]), float(velocity["y"]))
+    return {"speed": f"{speed:.1f} m/s"}
+
+
+def _parseBattery(value: str) -> dict:
+    return {"battery": f"{int(float(value))} %"}
+
+
+def _parseHeading(value: str) -> dict:
+    return {"heading": f"{float(value) % 360:05.1f}"}
+
+
+def _stickParser(name: str):
+    return lambda value: {name: int(value)}
+
+
+class HUD:
+    """
+    遥测 HUD 合成器。
+
+    setValue() 可以在任何线程中调用（例如 listen() 的回调），
+    apply() 在显示线程中调用。
+    """
+
+    # listen() 订阅的键：(模块, 键, 解析函数)
+    SUBSCRIPTIONS = [
+        (OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftLocation3D", _parseLocation),
+        (OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftVelocity", _parseVelocity),
+        (OpenDJI.MODULE_FLIGHTCONTROLLER, "CompassHeading", _parseHeading),
+        (OpenDJI.MODULE_BATTERY, "ChargeRemainingInPercent", _parseBattery),
+        (OpenDJI.MODULE_REMOTECONTROLLER, "StickLeftHorizontal", _stickParser("LH")),
+        (OpenDJI.MODULE_REMOTECONTROLLER, "StickLeftVertical", _stickParser("LV")),
+        (OpenDJI.MODULE_REMOTECONTROLLER, "StickRightHorizontal", _stickParser("RH")),
+        (OpenDJI.MODULE_REMOTECONTROLLER, "StickRightVertical", _stickParser("RV")),
+    ]
+
+    def __init__(self, color: tuple = (0, 255, 0)):
+        """
+        初始化 HUD，控件布局在第一次 apply() 时按照帧的尺寸生成。
+
+        Args:
+            color (tuple): HUD 的颜色 (B, G, R)。
+        """
+        self.color = color
+        self._lock = Lock()
+        self._values = {}
+        self._dirty = set()
+        self._size = None
+        self._widgets = []
+
+    ###### 数据 ######
+
+    def setValue(self, name: str, value) -> None:
+        """
+        更新一个值，下一次 apply() 时只重新绘制依赖它的控件。
+
+        Args:
+            name (str): 值的名称：'altitude'、'speed'、'battery'、'heading'、
+                'LH'、'LV'、'RH'、'RV'（摇杆为 -660 ~ 660 的整数，其他为文字）。
+            value: 新值。
+        """
+        with self._lock:
+            if self._values.get(name) != value:
+                self._values[name] = value
+                self._dirty.add(name)
+
+    def update(self, module: str, key: str, value: str) -> None:
+        """
+        用其他地方订阅的遥测更新 HUD（例如 DroneBridge.telemetry 信号）。
+        OpenDJI 每个键只有一个监听器，已经被其他组件订阅的键用这种方式传给 HUD。
+
+        Args:
+            module (str): 模块。
+            key (str): 键。
+            value (str): listen() 收到的值，不是 HUD 需要的键时忽略。
+        """
+        for sub_module, sub_key, parser in self.SUBSCRIPTIONS:
+            if sub_module == module and sub_key == key:
+                _HUDListener(self, parser).onValue(value)
+
+    def listen(self, drone: OpenDJI, exclude: tuple = ()) -> None:
+        """
+        订阅 HUD 需要的遥测键。
+
+        Args:
+            drone (OpenDJI): 无人机。
+            exclude (tuple): 不订阅的 (模块, 键)，这些键由调用者通过 update() 传入。
+        """
+        for module, key, parser in self.SUBSCRIPTIONS:
+            if (module, key) not in exclude:
+                drone.listen(module, key, _HUDListener(self, parser))
+
+    def unlisten(self, drone: OpenDJI, exclude: tuple = ()) -> None:
+        """ 取消 listen() 的订阅。 """
+        for module, key, _ in self.SUBSCRIPTIONS:
+            if (module, key) not in exclude:
+                drone.unlisten(module, key)
+
+    ###### 绘制 ######
+
+    def putText(self, color: np.ndarray, alpha: np.ndarray, text: str, origin: tuple) -> None:
+        """ 在颜色层和透明度层上绘制文字。 """
+        cv2.putText(color, text, origin, _FONT, self.font_scale, self.color, self.thickness, cv2.LINE_AA)
+        cv2.putText(alpha, text, origin, _FONT, self.font_scale, 255, self.thickness, cv2.LINE_AA)
+
+    def _layout(self, width: int, height: int) -> None:
+        """ 按照显示尺寸生成控件并绘制静态层。 """
+        s = height / 720
+        self.font_scale = 0.6 * s
+        self.thickness = max(1, round(1.5 * s))
+        self.pad = max(2, round(8 * s))
+
+        margin = round(16 * s)
+        panel_w, panel_h, gap = round(200 * s), round(32 * s), round(6 * s)
+        stick = round(110 * s)
+        cross = round(48 * s)
+
+        self._widgets = [
+            _TextWidget("altitude", "ALT", (margin, margin, panel_w, panel_h)),
+            _TextWidget("speed", "SPD", (margin, margin + (panel_h + gap), panel_w, panel_h)),
+            _TextWidget("battery", "BAT", (margin, margin + 2 * (panel_h + gap), panel_w, panel_h)),
+            _TextWidget("heading", "HDG", ((width - panel_w) // 2, margin, panel_w, panel_h)),
+            _StickWidget("LH", "LV", (margin, height - margin - stick, stick, stick)),
+            _StickWidget("RH", "RV", (width - margin - stick, height - margin - stick, stick, stick)),
+            _CrosshairWidget(((width - cross) // 2, (height - cross) // 2, cross, cross)),
+        ]
+
+        # 裁剪到帧内（非常小的显示尺寸）
+        for widget in self._widgets:
+            x, y, w, h = widget.rect
+            x, y = max(0, x), max(0, y)
+            widget.rect = (x, y, max(1, min(w, width - x)), max(1, min(h, height - y)))
+
+        # 每个控件的静态层，之后重新绘制时从这里开始
+        self._static = []
+        for widget in self._widgets:
+            w, h = widget.rect[2], widget.rect[3]
+            color = np.zeros((h, w, 3), dtype=np.uint8)
+            alpha = np.zeros((h, w), dtype=np.uint8)
+            widget.drawStatic(self, color, alpha)
+            self._static.append((color, alpha))
+
+        self._size = (height, width)
+
+    def _render(self, index: int, values: dict) -> None:
+        """ 重新绘制一个控件，并更新它的预乘颜色和反向透明度。 """
+        widget = self._widgets[index]
+        static_color, static_alpha = self._static[index]
+        color = static_color.copy()
+        alpha = static_alpha.copy()
+        widget.drawValue(self, color, alpha, values)
+
+        alpha3 = cv2.merge([alpha, alpha, alpha])
+        widget.pm = cv2.multiply(color, alpha3, scale=1 / 255)
+        widget.ia = 255 - alpha3
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """
+        将 HUD 原地叠加到帧上。
+
+        Args:
+            frame (np.ndarray): 显示尺寸的 BGR 帧 (uint8)，会被修改。
+
+        Return:
+            同一个帧。
+        """
+        height, width = frame.shape[:2]
+
+        with self._lock:
+            if self._size != (height, width):
+                self._layout(width, height)
+                dirty = None
+            else:
+                dirty = self._dirty
+            self._dirty = set()
+            values = dict(self._values)
+
+        # 只重新绘制值改变的控件
+        for index, widget in enumerate(self._widgets):
+            if dirty is None or widget.pm is None or not dirty.isdisjoint(widget.names):
+                self._render(index, values)
+
+        # 在每个控件的区域内混合：frame = frame * (255 - alpha) / 255 + color * alpha / 255
+        for widget in self._widgets:
+            x, y, w, h = widget.rect
+            roi = frame[y:y + h, x:x + w]
+            cv2.multiply(roi, widget.ia, dst=roi, scale=1 / 255)
+            cv2.add(roi, widget.pm, dst=roi)
+
+        return frame
@@ -0,0 +1,757 @@
+from OpenDJI import OpenDJI
+from OpenDJI import EventListener
+
+from SharedFrames import SharedFrameRing
+from MotionGate import MotionGate
+
+from functools import lru_cache
+from threading import Thread, Condition
+import multiprocessing
+import math
+import queue
+import time
+import os
+
+import cv2
+import numpy as np
+
+"""
+推理流水线 - 在后台线程中对 OpenDJI 的视频流运行目标检测。
+
+检测使用 "最新帧" 语义：如果推理比视频慢，中间的帧会被跳过，
+而不是排队等待。结果（检测框、类别、帧序号）通过 latest() 读取，
+或者通过 EventListener 推送，显示和解码线程都不会被阻塞。
+绘制检测框是一个独立的可选步骤 (drawDetections)。
+"""
+
+
+class Detections:
+    """
+    一帧的检测结果。
+
+    Attributes:
+        source (int): 视频源的索引（对应 InferenceStage 的 sources 列表）。
+        seq (int): 检测所用帧的序号（来自 OpenDJI.waitFrame）。
+        boxes (np.ndarray): (N, 4) 的 x1, y1, x2, y2 像素坐标。
+        scores (np.ndarray): (N,) 置信度。
+        classes (np.ndarray): (N,) 类别索引。
+        frame_shape (tuple): 检测所用帧的 (高, 宽)。
+        timestamp (float): 帧到达的时间 (time.monotonic)。
+        latency (float): 从帧到达到结果可用的时间（秒）。
+        ids (np.ndarray | None): (N,) 跟踪 ID（来自 Tracker），没有跟踪时为 None。
+        reused (bool): 画面没有变化 (MotionGate)，检测框复用自上一次检测。
+    """
+
+    def __init__(self, source: int, seq: int,
+                 boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray,
+                 frame_shape: tuple, timestamp: float, latency: float = 0.0,
+                 ids: np.ndarray | None = None, reused: bool = False):
+        self.source = source
+        self.seq = seq
+        self.boxes = boxes
+        self.scores = scores
+        self.classes = classes
+        self.frame_shape = frame_shape
+        self.timestamp = timestamp
+        self.latency = latency
+        self.ids = ids
+        self.reused = reused
+
+    def __len__(self):
+        return len(self.boxes)
+
+
+class YoloDetector:
+    """
+    ultralytics YOLO 模型的包装器，一次调用处理一批帧。
+    ultralytics 在构造时才导入，因此没有安装它也可以使用其他检测器。
+    """
+
+    def __init__(self, model_path: str, conf: float = 0.25, imgsz: int | None = None,
+                 device: str | None = None):
+        """
+        加载模型。
+
+        Args:
+            model_path (str): 模型路径（例如 'last.pt' 或 'yolo11n.pt'）。
+            conf (float): 置信度阈值。
+            imgsz (int | None): 推理图像尺寸，None 使用模型默认值。
+            device (str | None): 推理设备，例如 'cpu' 或 '0'。
+        """
+        from ultralytics import YOLO
+
+        self._model = YOLO(model_path)
+        self.names = self._model.names
+        self._kwargs = {"verbose": False, "conf": conf}
+        if imgsz is not None:
+            self._kwargs["imgsz"] = imgsz
+        if device is not None:
+            self._kwargs["device"] = device
+
+    def __call__(self, frames: list) -> list:
+        """
+        对一批帧运行检测。
+
+        Args:
+            frames (list): BGR 帧的列表。
+
+        Return:
+            每帧一个 (boxes, scores, classes) 元组的列表。
+        """
+        results = self._model(frames, **self._kwargs)
+
+        output = []
+        for result in results:
+            boxes = result.boxes
+            output.append((boxes.xyxy.cpu().numpy(),
+                           boxes.conf.cpu().numpy(),
+                           boxes.cls.cpu().numpy().astype(np.int32)))
+        return output
+
+
+def nonMaxSuppression(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray,
+                      threshold: float = 0.5, metric: str = "iou") -> np.ndarray:
+    """
+    按类别的非极大值抑制（向量化的贪心算法）。
+
+    Args:
+        boxes (np.ndarray): (N, 4) x1, y1, x2, y2。
+        scores (np.ndarray): (N,) 置信度。
+        classes (np.ndarray): (N,) 类别索引，不同类别之间不抑制。
+        threshold (float): 重叠超过此值的较低分数的框被抑制。
+        metric (str): 'iou' 交并比，或 'ios' 交集 / 较小的框的面积
+            （适合合并被图块边界切开的半个目标）。
+
+    Return:
+        保留的框的索引，按分数从高到低排列。
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.intp)
+    boxes = np.asarray(boxes, dtype=np.float32)
+
+    # 不同类别的框平移到互不重叠的位置，一次处理所有类别
+    offset = (np.asarray(classes, dtype=np.float32) * (boxes.max() + 1))[:, None]
+    shifted = boxes + offset
+    areas = (shifted[:, 2] - shifted[:, 0]) * (shifted[:, 3] - shifted[:, 1])
+
+    order = np.argsort(-np.asarray(scores))
+    keep = []
+    while len(order) > 0:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        x1 = np.maximum(shifted[best, 0], shifted[rest, 0])
+        y1 = np.maximum(shifted[best, 1], shifted[rest, 1])
+        x2 = np.minimum(shifted[best, 2], shifted[rest, 2])
+        y2 = np.minimum(shifted[best, 3], shifted[rest, 3])
+        intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        if metric == "ios":
+            overlap = intersection / np.maximum(np.minimum(areas[best], areas[rest]), 1e-9)
+        else:
+            overlap = intersection / np.maximum(areas[best] + areas[rest] - intersection, 1e-9)
+        order = rest[overlap <= threshold]
+    return np.array(keep, dtype=np.intp)
+
+
+@lru_cache(maxsize=32)
+def tileGrid(width: int, height: int, tile_width: int, tile_height: int,
+             overlap: float) -> np.ndarray:
+    """
+    覆盖整帧的重叠图块（按参数缓存，只读，不要修改）。
+    图块的大小相同，在每个方向上均匀分布，相邻图块至少重叠 overlap 比例。
+
+    Args:
+        width (int): 帧的宽度。
+        height (int): 帧的高度。
+        tile_width (int): 图块宽度，大于帧时使用帧的宽度。
+        tile_height (int): 图块高度，大于帧时使用帧的高度。
+        overlap (float): 最小的重叠比例 (0 - 1)。
+
+    Return:
+        (N, 4) 图块 x1, y1, x2, y2，按行排列。
+    """
+    def starts(size, tile):
+        tile = min(tile, size)
+        if tile == size:
+            return [0], tile
+        stride = max(1, int(tile * (1 - overlap)))
+        count = math.ceil((size - tile) / stride) + 1
+        return [round(i * (size - tile) / (count - 1)) for i in range(count)], tile
+
+    xs, tile_width = starts(width, tile_width)
+    ys, tile_height = starts(height, tile_height)
+    grid = np.array([(x, y, x + tile_width, y + tile_height) for y in ys for x in xs],
+                    dtype=np.intp)
+    grid.setflags(write=False)
+    return grid
+
+
+class TiledDetector:
+    """
+    分块推理 - 把高分辨率的帧切成重叠的图块，所有图块作为一批送入检测器，
+    检测框平移回帧的坐标后做全局的非极大值抑制。
+
+    检测器内部会把整帧缩小到推理尺寸（例如 4K -> 640），小目标只剩几个像素；
+    分块后每个图块以接近原始的分辨率推理。与其他检测器的接口相同，
+    可以直接传给 InferenceStage。
+
+    设置 gate 时，没有变化的图块不运行检测器，沿用该图块上一次的检测框。
+    门控保存画面的历史，因此这时一个 TiledDetector 只能用于一个视频源；
+    小目标需要更精细的亮度图，例如 MotionGate(width=640, block=4)。
+    """
+
+    def __init__(self, detector, tile: int | tuple[int, int] = 640, overlap: float = 0.2,
+                 nms_threshold: float = 0.5, metric: str = "ios", full_frame: bool = False,
+                 gate: MotionGate | None = None):
+        """
+        Args:
+            detector: 可调用对象，接收帧列表，返回 (boxes, scores, classes) 列表，
+                例如 YoloDetector（imgsz 最好等于图块大小）。
+            tile (int | tuple): 图块大小，正方形的边长或 (宽, 高)。
+            overlap (float): 相邻图块的最小重叠比例，应大于要检测的目标尺寸 / 图块尺寸。
+            nms_threshold (float): 全局非极大值抑制的阈值。
+            metric (str): 非极大值抑制的重叠度量，'iou' 或 'ios'（见 nonMaxSuppression）。
+            full_frame (bool): 是否把整帧也加入同一批（检测跨越多个图块的大目标）。
+            gate (MotionGate | None): 按图块的变化门控，None 表示每个图块都推理。
+        """
+        self._detector = detector
+        self.tile = (tile, tile) if isinstance(tile, int) else tuple(tile)
+        self.overlap = overlap
+        self.nms_threshold = nms_threshold
+        self.metric = metric
+        self.full_frame = full_frame
+        self._gate = gate
+        self.names = getattr(detector, "names", None)
+
+        # 图块的连续缓冲区：(帧的形状, 批中的位置) -> (图块数, 高, 宽, 通道)
+        self._buffers = {}
+        # 门控跳过的图块沿用的检测框（帧的坐标）：图块索引 -> (boxes, scores, classes)
+        self._tile_outputs = {}
+        self._shape = None
+
+        # 统计
+        self.frames = 0
+        self.tiles_run = 0
+        self.tiles_skipped = 0
+
+    def tiles(self, frame_shape: tuple) -> np.ndarray:
+        """ 这个尺寸的帧的图块 (N, 4) x1, y1, x2, y2。 """
+        return tileGrid(frame_shape[1], frame_shape[0], self.tile[0], self.tile[1], self.overlap)
+
+    def _buffer(self, frame_shape: tuple, position: int, count: int) -> np.ndarray:
+        key = (frame_shape, position)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            tile_width = min(self.tile[0], frame_shape[1])
+            tile_height = min(self.tile[1], frame_shape[0])
+            buffer = np.empty((count, tile_height, tile_width) + tuple(frame_shape[2:]), dtype=np.uint8)
+            self._buffers[key] = buffer
+        return buffer
+
+    def __call__(self, frames: list) -> list:
+        """
+        对一批帧运行分块检测。
+
+        Args:
+            frames (list): BGR 帧的列表。
+
+        Return:
+            每帧一个 (boxes, scores, classes) 元组的列表，坐标是帧的像素坐标。
+        """
+        images = []
+        # 每帧：(图块, 运行的图块的索引, 在 images 中的起始位置)
+        plans = []
+        for position, frame in enumerate(frames):
+            grid = self.tiles(frame.shape)
+            if self._gate is not None and frame.shape != self._shape:
+                # 分辨率改变：以前的检测框和参考图都不再适用
+                self._gate.reset()
+                self._tile_outputs = {}
+            self._shape = frame.shape
+
+            if self._gate is not None:
+                run = np.flatnonzero(self._gate.changedRegions(frame, grid))
+            else:
+                run = np.arange(len(grid))
+
+            # 图块复制到缓存的连续缓冲区（不分配新的内存）
+            buffer = self._buffer(frame.shape, position, len(grid))
+            start = len(images)
+            for i in run:
+                x1, y1, x2, y2 = grid[i]
+                np.copyto(buffer[i], frame[y1:y2, x1:x2])
+                images.append(buffer[i])
+            if self.full_frame:
+                images.append(frame)
+            plans.append((grid, run, start))
+
+            self.frames += 1
+            self.tiles_run += len(run)
+            self.tiles_skipped += len(grid) - len(run)
+
+        outputs = self._detector(images) if images else []
+
+        results = []
+        for (grid, run, start), frame in zip(plans, frames):
+            boxes, scores, classes = [], [], []
+            for k, i in enumerate(run):
+                tile_boxes, tile_scores, tile_classes = outputs[start + k]
+                x1, y1 = grid[i][:2]
+                tile_boxes = np.asarray(tile_boxes, dtype=np.float32).reshape(-1, 4) + \
+                    np.array([x1, y1, x1, y1], dtype=np.float32)
+                self._tile_outputs[i] = (tile_boxes, np.asarray(tile_scores), np.asarray(tile_classes))
+
+            # 运行过的图块使用新的检测框，跳过的图块沿用上一次的
+            for i in range(len(grid)):
+                if i in self._tile_outputs:
+                    tile_boxes, tile_scores, tile_classes = self._tile_outputs[i]
+                    boxes.append(tile_boxes)
+                    scores.append(tile_scores)
+                    classes.append(tile_classes)
+            if self.full_frame:
+                full_boxes, full_scores, full_classes = outputs[start + len(run)]
+                boxes.append(np.asarray(full_boxes, dtype=np.float32).reshape(-1, 4))
+                scores.append(np.asarray(full_scores))
+                classes.append(np.asarray(full_classes))
+
+            boxes = np.concatenate(boxes) if boxes else np.zeros((0, 4), dtype=np.float32)
+            scores = np.concatenate(scores).astype(np.float32) if scores else np.zeros(0, dtype=np.float32)
+            classes = np.concatenate(classes).astype(np.int32) if classes else np.zeros(0, dtype=np.int32)
+            keep = nonMaxSuppression(boxes, scores, classes, self.nms_threshold, self.metric)
+            results.append((boxes[keep], scores[keep], classes[keep]))
+        return results
+
+    def skippedRatio(self) -> float:
+        """ 门控跳过的图块所占的比例。 """
+        total = self.tiles_run + self.tiles_skipped
+        return self.tiles_skipped / total if total else 0.0
+
+
+class InferenceStage:
+    """
+    推理阶段 - 订阅一个或多个 OpenDJI 视频源，在后台线程中运行检测器。
+
+    每个视频源有一个轻量的接收线程，只保存最新的帧；
+    推理线程每次取出所有有新帧的视频源（最多 max_batch 个），
+    作为一批送入检测器（多架无人机的微批处理）。
+    设置 gate 时，画面没有变化的帧不送入检测器，直接复用上一次的结果。
+    """
+
+    def __init__(self, detector, sources: list[OpenDJI],
+                 max_batch: int | None = None,
+                 listener: EventListener | None = None,
+                 gate: MotionGate | None = None):
+        """
+        初始化推理阶段（不会立即启动，调用 start()）。
+
+        Args:
+            detector: 可调用对象，接收帧列表，返回 (boxes, scores, classes) 列表，
+                例如 YoloDetector。
+            sources (list[OpenDJI]): 视频源列表。
+            max_batch (int | None): 每批最多的帧数，None 表示所有视频源。
+            listener (EventListener | None): 每个新检测结果调用一次
+                listener.onValue(detections)，在推理线程中调用。
+            gate (MotionGate | None): 变化门控的模板，每个视频源使用一个副本，
+                None 表示每帧都运行检测器。
+        """
+        self._detector = detector
+        self._sources = sources
+        self._max_batch = max_batch or len(sources)
+        self._listener = listener
+
+        # 每个视频源的最新未处理帧：index -> (seq, frame, timestamp)
+        self._pending = {}
+        self._pending_cond = Condition()
+        # 下一批从哪个视频源开始，避免某个视频源饿死
+        self._next_source = 0
+
+        # 每个视频源的最新检测结果
+        self._latest = [None] * len(sources)
+
+        # 每个视频源的变化门控
+        self._gates = [gate.copy() for _ in sources] if gate is not None else None
+
+        # 统计
+        self._inferences = 0
+        self._frames = 0
+        self._reused = 0
+        self._started = 0.0
+
+        self._live = False
+        self._threads = []
+
+    ###### 对象处理方法 ######
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self) -> None:
+        """ 启动接收线程和推理线程。 """
+        self._live = True
+        self._started = time.monotonic()
+
+        for index, source in enumerate(self._sources):
+            thread = Thread(target=self.__Feed__, args=(index, source))
+            thread.daemon = True
+            self._threads.append(thread)
+
+        thread = Thread(target=self.__Infer__)
+        thread.daemon = True
+        self._threads.append(thread)
+
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        停止所有线程。
+
+        Args:
+            timeout (float | None): 每个线程的等待超时时间（秒）。
+        """
+        self._live = False
+        with self._pending_cond:
+            self._pending_cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    ###### 结果 ######
+
+    def latest(self, source: int = 0) -> Detections | None:
+        """
+        获取视频源的最新检测结果（非阻塞）。
+
+        Args:
+            source (int): 视频源的索引。
+        """
+        return self._latest[source]
+
+    def fps(self) -> float:
+        """ 自启动以来每秒处理的帧数。 """
+        elapsed = time.monotonic() - self._started
+        return self._frames / elapsed if elapsed > 0 else 0.0
+
+    def reusedRatio(self) -> float:
+        """ 复用上一次检测结果（没有运行检测器）的帧所占的比例。 """
+        return self._reused / self._frames if self._frames else 0.0
+
+    ###### 后台线程 ######
+
+    def __Feed__(self, index: int, source: OpenDJI):
+        """
+        等待视频源的新帧，只保留最新的一帧。
+        """
+        last_seq = 0
+        # 共享内存的帧在推理之前可能要等待很久，复制一份，不长时间占用解码进程的帧槽
+        copy = getattr(source, "shared_frames", False)
+        while self._live:
+            seq, frame = source.waitFrame(last_seq, timeout=0.5)
+            if seq == last_seq or frame is None:
+                continue
+            last_seq = seq
+            if copy:
+                frame = frame.copy()
+
+            with self._pending_cond:
+                self._pending[index] = (seq, frame, time.monotonic())
+                self._pending_cond.notify()
+
+    def _takeBatch(self, max_batch: int) -> list | None:
+        """
+        等待至少一个视频源有新帧，然后从 _next_source 开始轮流取出，
+        最多 max_batch 个 (index, seq, frame, timestamp)。
+        停止时返回 None。
+        """
+        with self._pending_cond:
+            self._pending_cond.wait_for(lambda: self._pending or not self._live)
+            if not self._live:
+                return None
+
+            count = len(self._sources)
+            order = [(self._next_source + i) % count for i in range(count)]
+            batch = []
+            for index in order:
+                if index in self._pending:
+                    batch.append((index, *self._pending.pop(index)))
+                    if len(batch) == max_batch:
+                        break
+            self._next_source = (batch[-1][0] + 1) % count
+            return batch
+
+    def _publish(self, index: int, seq: int, frame_shape: tuple, timestamp: float,
+                 boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray,
+                 reused: bool = False) -> None:
+        """ 保存检测结果并通知监听器。 """
+        detections = Detections(index, seq, boxes, scores, classes,
+                                frame_shape, timestamp, time.monotonic() - timestamp,
+                                reused=reused)
+        self._latest[index] = detections
+        self._frames += 1
+        if reused:
+            self._reused += 1
+
+        listener = self._listener
+        if listener:
+            listener.onValue(detections)
+
+    def _reuse(self, index: int, seq: int, frame: np.ndarray, timestamp: float) -> bool:
+        """
+        画面没有变化时复用上一次的检测结果并发布。
+
+        Return:
+            True 表示已经复用，这一帧不需要运行检测器。
+        """
+        if self._gates is None:
+            return False
+        gate = self._gates[index]
+        previous = self._latest[index]
+        if gate.changed(frame) or previous is None or previous.frame_shape != frame.shape[:2]:
+            return False
+        self._publish(index, seq, frame.shape[:2], timestamp,
+                      previous.boxes, previous.scores, previous.classes, reused=True)
+        return True
+
+    def __Infer__(self):
+        """
+        取出最新的帧组成一批，运行检测器并发布结果。
+        """
+        while self._live:
+
+            batch = self._takeBatch(self._max_batch)
+            if batch is None:
+                break
+
+            batch = [item for item in batch if not self._reuse(*item)]
+            if not batch:
+                continue
+
+            # 在锁外运行检测器，接收线程可以继续更新最新帧
+            try:
+                outputs = self._detector([item[2] for item in batch])
+            except Exception as e:
+                print(f"推理失败: {e}")
+                continue
+
+            self._inferences += 1
+            for (index, seq, frame, timestamp), output in zip(batch, outputs):
+                self._publish(index, seq, frame.shape[:2], timestamp, *output)
+
+
+def _inferenceWorker(ring_name: str, slots: int, max_shape: tuple,
+                     detector_factory, detector_args: tuple, threads: int | None,
+                     tasks, results):
+    """
+    推理工作进程：从任务队列中取出槽索引，直接在共享内存中的帧上运行检测器，
+    并把检测结果（很小的数组）放入结果队列。
+    """
+    # 限制每个进程的计算线程数，避免多个工作进程争抢同一批核心
+    if threads:
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+
+    ring = SharedFrameRing(slots, max_shape, name=ring_name, create=False)
+    detector = detector_factory(*detector_args)
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        slot, index, timestamp = task
+
+        seq, frame = ring.read(slot)
+        shape = frame.shape[:2]
+        try:
+            output = detector([frame])[0]
+        except Exception as e:
+            print(f"推理失败: {e}")
+            output = None
+
+        # 释放共享内存视图，之后槽就可以被重新写入
+        frame = None
+        results.put((slot, index, timestamp, seq, shape, output))
+
+    # 停止时父进程不再读取结果，不要等待队列清空
+    results.cancel_join_thread()
+    ring.close()
+
+
+class ProcessInferenceStage(InferenceStage):
+    """
+    多进程推理阶段 - 与 InferenceStage 相同的接口，但检测器运行在
+    独立的工作进程中，不与解码和显示争抢 GIL。
+
+    帧通过共享内存槽 (SharedFrameRing) 传给工作进程，每个工作进程一个槽，
+    只有槽的索引通过队列传递；结果通过另一个队列返回。
+    当有工作进程空闲时，分发线程取出当时最新的帧，因此仍然是 "最新帧" 语义。
+
+    工作进程使用 'spawn' 方式启动，因此主脚本必须有
+    if __name__ == '__main__': 保护，且检测器工厂必须可以被 pickle
+    （例如 YoloDetector 类本身）。
+    """
+
+    def __init__(self, detector_factory, detector_args: tuple, sources: list[OpenDJI],
+                 workers: int = 2, max_shape: tuple = (2160, 3840, 3),
+                 threads_per_worker: int | None = 1,
+                 listener: EventListener | None = None,
+                 gate: MotionGate | None = None):
+        """
+        初始化多进程推理阶段（不会立即启动，调用 start()）。
+
+        Args:
+            detector_factory: 在工作进程中创建检测器的可调用对象，例如 YoloDetector。
+            detector_args (tuple): 传给 detector_factory 的参数。
+            sources (list[OpenDJI]): 视频源列表。
+            workers (int): 工作进程数量。
+            max_shape (tuple): 最大帧尺寸 (高, 宽, 通道)，决定共享内存槽的大小。
+            threads_per_worker (int | None): 每个工作进程的计算线程数，None 不限制。
+            listener (EventListener | None): 每个新检测结果调用一次
+                listener.onValue(detections)，在结果线程中调用。
+            gate (MotionGate | None): 变化门控的模板（在分发线程中判断）。
+        """
+        super().__init__(None, sources, max_batch=1, listener=listener, gate=gate)
+
+        self._detector_factory = detector_factory
+        self._detector_args = detector_args
+        self._workers = workers
+        self._max_shape = max_shape
+        self._threads_per_worker = threads_per_worker
+
+        self._context = multiprocessing.get_context("spawn")
+        self._ring = None
+        self._free_slots = queue.Queue()
+        self._tasks = None
+        self._results = None
+        self._processes = []
+
+    def start(self) -> None:
+        """ 启动工作进程、接收线程、分发线程和结果线程。 """
+        self._ring = SharedFrameRing(self._workers, self._max_shape)
+        for slot in range(self._workers):
+            self._free_slots.put(slot)
+
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+
+        for _ in range(self._workers):
+            process = self._context.Process(
+                target=_inferenceWorker,
+                args=(self._ring.name, self._workers, self._max_shape,
+                      self._detector_factory, self._detector_args,
+                      self._threads_per_worker, self._tasks, self._results))
+            process.daemon = True
+            process.start()
+            self._processes.append(process)
+
+        super().start()
+
+        thread = Thread(target=self.__Collect__)
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        停止所有线程和工作进程。
+
+        Args:
+            timeout (float | None): 每个线程/进程的等待超时时间（秒）。
+        """
+        super().stop(timeout)
+
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+        self._ring.close()
+        self._ring = None
+
+    ###### 后台线程 ######
+
+    def __Infer__(self):
+        """
+        分发线程：等待空闲槽（即空闲的工作进程），
+        然后把当时最新的帧写入该槽并发送任务。
+        """
+        while self._live:
+            try:
+                slot = self._free_slots.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            batch = self._takeBatch(1)
+            if batch is None:
+                break
+            index, seq, frame, timestamp = batch[0]
+
+            if self._reuse(index, seq, frame, timestamp):
+                self._free_slots.put(slot)
+                continue
+
+            self._ring.write(slot, frame, seq)
+            self._tasks.put((slot, index, timestamp))
+
+    def __Collect__(self):
+        """
+        结果线程：接收工作进程的结果，释放槽并发布检测结果。
+        """
+        while self._live:
+            try:
+                slot, index, timestamp, seq, shape, output = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            self._free_slots.put(slot)
+            if output is None:
+                continue
+
+            self._inferences += 1
+            self._publish(index, seq, shape, timestamp, *output)
+
+
+def drawDetections(frame: np.ndarray, detections: Detections | None,
+                   names: dict | None = None,
+                   color: tuple = (0, 255, 0)) -> np.ndarray:
+    """
+    在帧上（原地）绘制检测框。帧可以是缩小后的显示帧，
+    检测框会按照帧尺寸自动缩放，因此只在小图上绘制。
+
+    Args:
+        frame (np.ndarray): 要绘制的 BGR 帧。
+        detections (Detections | None): 检测结果，None 时不绘制。
+        names (dict | None): 类别索引到名称的映射。
+        color (tuple): 检测框的 BGR 颜色。
+
+    Return:
+        绘制后的帧（与输入是同一个数组）。
+    """
+    if detections is None or len(detections) == 0:
+        return frame
+
+    height, width = detections.frame_shape
+    scale = np.array([frame.shape[1] / width, frame.shape[0] / height] * 2,
+                     dtype=np.float32)
+    boxes = (detections.boxes * scale).astype(np.int32).tolist()
+
+    for i, ((x1, y1, x2, y2), score, cls) in enumerate(
+            zip(boxes, detections.scores, detections.classes)):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        label = names[cls] if names else str(cls)
+        if detections.ids is not None:
+            label = f"#{detections.ids[i]} {label}"
+        cv2.putText(frame, f"{label} {score:.2f}", (x1, max(y1 - 4, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+    return frame
@@ -0,0 +1,427 @@
+from OpenDJI import OpenDJI
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+import os
+import re
+
+"""
+键目录 - 将 'help' 的响应解析为结构化的记录，并缓存在磁盘上。
+
+第一次连接某个型号/固件的无人机时，按 help -> help <模块> -> help <模块> <键>
+并行抓取所有键的信息（CanGet/CanSet/CanListen/CanAction、参数类型、枚举值），
+之后从缓存文件加载，启动时不再需要传输大量的 help 数据。
+目录还可以在发送之前检查 get / set / listen / action 请求。
+超时没有得到的模块/键记录在目录中（missing），下次加载时重新抓取，
+在此之前目录不检查它们。
+
+使用方法：
+    catalog = KeyCatalog.load(drone)
+    print(catalog.info("Battery", "Connection").parameter)
+    drone.useCatalog(catalog)   # 之后无效的请求在本地抛出 ValueError
+"""
+
+# 缓存文件的格式版本，格式改变时加一，旧的缓存会被重新抓取
+CATALOG_VERSION = 2
+
+# 默认的缓存目录（与本文件同目录）
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "key_cache")
+
+# 带引号的值在这里结束：引号之后是下一个字段 (name:) 或者结尾
+_QUOTED_END = re.compile(r"\s*(,\s*[A-Za-z_]\w*\s*:|$)")
+
+
+def parseHelpList(text: str) -> list[str]:
+    """
+    解析 'help' 或 'help <模块>' 的响应，例如 '{"Gimbal","Battery"}'。
+
+    Return:
+        名称列表。
+    """
+    text = (text or "").strip()
+    if not (text.startswith("{") and text.endswith("}")):
+        raise ValueError(f"不是 help 列表: {text[:80]}")
+    return [name.strip().strip('"') for name in text[1:-1].split(",") if name.strip()]
+
+
+def _helpList(drone: OpenDJI, timeout: float | None, *args) -> list[str] | None:
+    """ 请求模块或键的列表，超时返回 None，错误的响应返回空列表。 """
+    text = drone.help(*args, timeout=timeout)
+    if text is None:
+        return None
+    try:
+        return parseHelpList(text)
+    except ValueError:
+        return []
+
+
+def _scanBracket(body: str, start: int) -> int:
+    """ 返回与 body[start] 的括号匹配的位置之后的索引（跳过引号中的内容）。 """
+    depth = 0
+    quote = None
+    for i in range(start, len(body)):
+        ch = body[i]
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch in "[{":
+            depth += 1
+        elif ch in "]}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return len(body)
+
+
+def parseKeyInfo(text: str) -> dict:
+    """
+    解析 'help <模块> <键>' 的响应（类似 JSON，但名称和部分值没有引号），例如：
+        {module:'Battery', key:'Connection', CanGet:true, CanSet:false, CanListen:true,
+         CanAction:false, parameter:'java.lang.Boolean', example:"true"}
+
+    Return:
+        字段字典：true/false 转换为 bool，[...] 转换为列表，其他为字符串。
+    """
+    text = (text or "").strip()
+    if not (text.startswith("{") and text.endswith("}")):
+        raise ValueError(f"不是键信息: {text[:80]}")
+    body = text[1:-1]
+
+    fields = {}
+    i = 0
+    while i < len(body):
+        # 字段名
+        while i < len(body) and body[i] in " ,\r\n\t":
+            i += 1
+        colon = body.find(":", i)
+        if colon < 0:
+            break
+        name = body[i:colon].strip()
+        i = colon + 1
+        while i < len(body) and body[i] == " ":
+            i += 1
+        if i >= len(body):
+            fields[name] = ""
+            break
+
+        # 字段值
+        ch = body[i]
+        if ch in "'\"":
+            end = i + 1
+            while True:
+                end = body.find(ch, end)
+                if end < 0:
+                    end = len(body)
+                    break
+                if _QUOTED_END.match(body, end + 1):
+                    break
+                end += 1
+            value = body[i + 1:end]
+            i = end + 1
+
+        elif ch in "[{":
+            end = _scanBracket(body, i)
+            value = body[i:end]
+            if ch == "[":
+                value = [item.strip().strip("'\"") for item in value[1:-1].split(",") if item.strip()]
+            i = end
+
+        else:
+            end = body.find(",", i)
+            end = len(body) if end < 0 else end
+            value = body[i:end].strip()
+            if value in ("true", "false"):
+                value = value == "true"
+            i = end
+
+        fields[name] = value
+
+    return fields
+
+
+class KeyInfo:
+    """
+    一个键的信息。
+
+    Attributes:
+        module (str): 模块名称。
+        key (str): 键名称。
+        can_get (bool): 是否支持 get。
+        can_set (bool): 是否支持 set。
+        can_listen (bool): 是否支持 listen。
+        can_action (bool): 是否支持 action。
+        parameter (str | None): 参数类型，例如 'java.lang.Boolean'。
+        values (list | None): 枚举值，不是枚举时为 None。
+        example (str | None): 参数示例。
+        fields (dict): help 响应中的所有字段。
+    """
+
+    def __init__(self, module: str, key: str, fields: dict):
+        self.module = module
+        self.key = key
+        self.fields = fields
+        self.can_get = fields.get("CanGet") is True
+        self.can_set = fields.get("CanSet") is True
+        self.can_listen = fields.get("CanListen") is True
+        self.can_action = fields.get("CanAction") is True
+        self.parameter = fields.get("parameter")
+        self.values = fields.get("values") if isinstance(fields.get("values"), list) else None
+        self.example = fields.get("example")
+
+    def __repr__(self):
+        flags = "".join(flag for flag, ok in (("G", self.can_get), ("S", self.can_set),
+                                              ("L", self.can_listen), ("A", self.can_action)) if ok)
+        return f"KeyInfo({self.module} {self.key} [{flags}] {self.parameter})"
+
+
+class KeyCatalog:
+    """
+    一个无人机型号/固件的所有模块和键。
+    """
+
+    # 请求类型需要的能力
+    _VERB_FLAGS = {"get": "can_get", "set": "can_set", "listen": "can_listen",
+                   "unlisten": "can_listen", "action": "can_action"}
+
+    def __init__(self, modules: dict, product: str = "", firmware: str = "",
+                 missing: dict | None = None):
+        """
+        Args:
+            modules (dict): 模块名称 -> {键名称 -> KeyInfo}。
+            product (str): 产品型号。
+            firmware (str): 固件版本。
+            missing (dict | None): 抓取时超时的部分，模块名称 -> 键名称列表，
+                或 None（模块的键列表本身超时）。
+        """
+        self._modules = modules
+        self.product = product
+        self.firmware = firmware
+        self.missing = missing or {}
+
+    ###### 创建 ######
+
+    @classmethod
+    def load(cls, drone: OpenDJI, cache_dir: str = DEFAULT_CACHE_DIR,
+             workers: int = 8, refresh: bool = False, timeout: float = 10.0) -> "KeyCatalog":
+        """
+        加载当前无人机的目录：缓存存在时从文件读取，否则抓取并保存。
+        缓存中记录的超时部分会重新抓取。
+
+        Args:
+            drone (OpenDJI): 已连接的无人机。
+            cache_dir (str): 缓存目录。
+            workers (int): 并行抓取的线程数。
+            refresh (bool): True 忽略缓存，重新抓取。
+            timeout (float): 每个请求的超时时间（秒）。
+        """
+        product = drone.getValue(OpenDJI.MODULE_PRODUCT, "ProductType", timeout)
+        firmware = drone.getValue(OpenDJI.MODULE_PRODUCT, "FirmwareVersion", timeout)
+        if product is None or firmware is None:
+            raise TimeoutError("读取产品型号 / 固件版本超时")
+        path = cls.cachePath(cache_dir, product, firmware)
+
+        catalog = None
+        if not refresh and os.path.exists(path):
+            try:
+                catalog = cls.fromFile(path)
+            except (ValueError, KeyError, OSError) as e:
+                print(f"键目录缓存无效，重新抓取: {e}")
+
+        if catalog is None:
+            modules, missing = cls.crawl(drone, workers, timeout)
+            catalog = cls(modules, product, firmware, missing)
+        elif catalog.missing:
+            catalog.recrawl(drone, workers, timeout)
+        else:
+            return catalog
+
+        if catalog.missing:
+            print(f"键目录不完整，{catalog.missingCount()} 项超时，下次加载时重新抓取")
+        catalog.save(path)
+        return catalog
+
+    @staticmethod
+    def cachePath(cache_dir: str, product: str, firmware: str) -> str:
+        """ 型号/固件对应的缓存文件路径。 """
+        name = re.sub(r"[^A-Za-z0-9._-]+", "_", f"{product}_{firmware}").strip("_")
+        return os.path.join(cache_dir, (name or "unknown") + ".json")
+
+    @classmethod
+    def crawl(cls, drone: OpenDJI, workers: int = 8, timeout: float | None = 10.0) -> tuple[dict, dict]:
+        """
+        抓取所有模块和键的信息。
+
+        Args:
+            drone (OpenDJI): 已连接的无人机。
+            workers (int): 并行抓取的线程数。
+            timeout (float | None): 每个 help 请求的超时时间（秒）。
+
+        Return:
+            (modules, missing) - 模块名称 -> {键名称 -> KeyInfo}，
+            以及超时没有得到的部分（见 KeyCatalog 的 missing）。
+        """
+        modules = _helpList(drone, timeout)
+        if modules is None:
+            raise TimeoutError("help 请求超时")
+        return cls._fetch(drone, {module: None for module in modules}, workers, timeout)
+
+    @staticmethod
+    def _fetch(drone: OpenDJI, module_keys: dict, workers: int,
+               timeout: float | None) -> tuple[dict, dict]:
+        """
+        抓取指定的模块和键。
+
+        模块的键列表依次请求；键信息并行请求，每个响应按照它自己的
+        module / key 字段归类，因此不依赖响应到达的顺序。
+        超时的请求最后再依次请求一次，仍然超时的记录在 missing 中。
+        错误的响应（例如未知的键）是确定的结果，不记录。
+
+        Args:
+            module_keys (dict): 模块名称 -> 键名称列表，或 None 表示请求模块的所有键。
+
+        Return:
+            (modules, missing)
+        """
+        missing = {}
+        listed = {}
+        for module, keys in module_keys.items():
+            if keys is None:
+                keys = _helpList(drone, timeout, module)
+                if keys is None:
+                    keys = _helpList(drone, timeout, module)
+                if keys is None:
+                    missing[module] = None
+                    continue
+            listed[module] = keys
+
+        results = {}
+        timed_out = set()
+
+        def fetch(module_key):
+            text = drone.help(*module_key, timeout=timeout)
+            if text is None:
+                timed_out.add(module_key)
+                return
+            timed_out.discard(module_key)
+            try:
+                fields = parseKeyInfo(text)
+                results[(fields["module"], fields["key"])] = fields
+            except (ValueError, KeyError):
+                pass
+
+        requests = [(module, key) for module, keys in listed.items() for key in keys]
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(fetch, requests))
+
+        for module_key in requests:
+            if module_key in timed_out:
+                fetch(module_key)
+
+        for module, key in sorted(timed_out):
+            missing.setdefault(module, []).append(key)
+
+        modules = {module: {} for module in module_keys}
+        for (module, key), fields in results.items():
+            modules.setdefault(module, {})[key] = KeyInfo(module, key, fields)
+        return modules, missing
+
+    def recrawl(self, drone: OpenDJI, workers: int = 8, timeout: float | None = 10.0) -> None:
+        """ 重新抓取超时的部分，合并到目录中。 """
+        modules, self.missing = self._fetch(drone, self.missing, workers, timeout)
+        for module, keys in modules.items():
+            self._modules.setdefault(module, {}).update(keys)
+
+    def missingCount(self) -> int:
+        """ 超时没有得到的键数（键列表超时的模块算作一项）。 """
+        return sum(1 if keys is None else len(keys) for keys in self.missing.values())
+
+    @classmethod
+    def fromFile(cls, path: str) -> "KeyCatalog":
+        """ 从缓存文件读取目录。 """
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("version") != CATALOG_VERSION:
+            raise ValueError(f"缓存版本 {data.get('version')} != {CATALOG_VERSION}")
+
+        modules = {module: {key: KeyInfo(module, key, fields) for key, fields in keys.items()}
+                   for module, keys in data["modules"].items()}
+        return cls(modules, data.get("product", ""), data.get("firmware", ""), data.get("missing"))
+
+    def save(self, path: str) -> None:
+        """ 将目录写入缓存文件（先写临时文件，再替换）。 """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {
+            "version": CATALOG_VERSION,
+            "product": self.product,
+            "firmware": self.firmware,
+            "created": time.time(),
+            "modules": {module: {key: info.fields for key, info in keys.items()}
+                        for module, keys in self._modules.items()},
+            "missing": self.missing,
+        }
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    ###### 查询 ######
+
+    def modules(self) -> list[str]:
+        """ 所有模块名称。 """
+        return list(self._modules)
+
+    def keys(self, module: str) -> list[str]:
+        """ 模块中的所有键名称。 """
+        return list(self._modules.get(module, {}))
+
+    def info(self, module: str, key: str) -> KeyInfo | None:
+        """ 键的信息，不存在时返回 None。 """
+        return self._modules.get(module, {}).get(key)
+
+    def validate(self, verb: str, module: str, key: str, value: str | None = None) -> None:
+        """
+        检查请求是否有效，无效时抛出 ValueError。
+        抓取时超时的模块/键不检查。
+
+        Args:
+            verb (str): 'get'、'set'、'listen'、'unlisten' 或 'action'。
+            module (str): 模块名称。
+            key (str): 键名称。
+            value (str | None): set / action 的参数。
+        """
+        info = self.info(module, key)
+        if info is None:
+            if module in self.missing and (self.missing[module] is None or key in self.missing[module]):
+                return
+            if module not in self._modules:
+                raise ValueError(f"未知的模块: {module}")
+            raise ValueError(f"未知的键: {module} {key}")
+
+        flag = self._VERB_FLAGS.get(verb)
+        if flag is not None and not getattr(info, flag):
+            raise ValueError(f"{module} {key} 不支持 {verb}")
+
+        if value is None or verb not in ("set", "action"):
+            return
+
+        # 检查简单的参数类型
+        if info.values is not None and value not in info.values:
+            raise ValueError(f"{module} {key} 的值必须是 {info.values} 之一，而不是 {value}")
+
+        if info.parameter == "java.lang.Boolean" and value not in ("true", "false"):
+            raise ValueError(f"{module} {key} 的值必须是 true 或 false，而不是 {value}")
+
+        if info.parameter in ("java.lang.Integer", "java.lang.Long"):
+            try:
+                int(value)
+            except ValueError:
+                raise ValueError(f"{module} {key} 的值必须是整数，而不是 {value}") from None
+
+        if info.parameter in ("java.lang.Double", "java.lang.Float"):
+            try:
+                float(value)
+            except ValueError:
+                raise ValueError(f"{module} {key} 的值必须是数字，而不是 {value}") from None
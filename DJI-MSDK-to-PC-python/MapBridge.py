@@ -0,0 +1,269 @@
+import math
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+
+"""
+地图桥接 - 通过 QWebChannel 将飞行轨迹推送到 Leaflet 地图。
+
+每次飞行只有一条折线，新的点会批量追加（Python 端每个刷新周期一次推送，
+JS 端每个动画帧最多重绘一次）。较早的轨迹用 Douglas-Peucker 算法简化，
+顶点数量有上限，因此长时间飞行时内存和渲染时间保持不变。
+
+在页面中使用：
+    <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
+    <script> ... 创建 mymap 之后 ... MAP_BRIDGE_JS </script>
+"""
+
+# 地球半径
+EARTH_RADIUS = 6371e3  # 米
+
+
+def simplifyTrack(points: list, tolerance: float) -> list:
+    """
+    Douglas-Peucker 轨迹简化。
+
+    Args:
+        points (list): [latitude, longitude] 的列表。
+        tolerance (float): 允许的最大偏差（米）。
+
+    Return:
+        简化后的点列表（保留首尾两点）。
+    """
+    if len(points) < 3:
+        return list(points)
+
+    # 在第一个点附近投影为本地平面坐标（米）
+    scale_n = math.radians(1.0) * EARTH_RADIUS
+    scale_e = scale_n * math.cos(math.radians(points[0][0]))
+    xy = [((lon - points[0][1]) * scale_e, (lat - points[0][0]) * scale_n)
+          for lat, lon in points]
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+
+    # 使用栈代替递归，避免长轨迹的递归深度问题
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = xy[first]
+        x2, y2 = xy[last]
+        dx = x2 - x1
+        dy = y2 - y1
+        length = math.hypot(dx, dy)
+
+        max_distance = -1.0
+        max_index = first
+        for i in range(first + 1, last):
+            x, y = xy[i]
+            if length == 0.0:
+                distance = math.hypot(x - x1, y - y1)
+            else:
+                distance = abs(dy * (x - x1) - dx * (y - y1)) / length
+            if distance > max_distance:
+                max_distance = distance
+                max_index = i
+
+        if max_distance > tolerance:
+            keep[max_index] = True
+            stack.append((first, max_index))
+            stack.append((max_index, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+class MapBridge(QObject):
+    """
+    注册到 QWebChannel 的对象，页面中的 MAP_BRIDGE_JS 连接它的信号。
+
+    Signals:
+        pointsAdded(points): 追加到当前轨迹的新点。
+        trackReset(points): 用这些点替换当前轨迹（轨迹被简化后发出）。
+        positionChanged(latitude, longitude): 当前位置。
+        flightStarted(): 开始新的飞行（新的折线）。
+    """
+
+    pointsAdded = pyqtSignal('QVariantList')
+    trackReset = pyqtSignal('QVariantList')
+    positionChanged = pyqtSignal(float, float)
+    flightStarted = pyqtSignal()
+
+    def __init__(self, parent: QObject | None = None, flush_interval: int = 100,
+                 tail_size: int = 200, max_vertices: int = 2000, tolerance: float = 1.0):
+        """
+        初始化地图桥接。
+
+        Args:
+            parent (QObject | None): 父对象。
+            flush_interval (int): 向页面推送的间隔（毫秒）。
+            tail_size (int): 最近多少个点保持原样，超过后简化并入历史轨迹。
+            max_vertices (int): 历史轨迹的最大顶点数，超过后加大简化容差。
+            tolerance (float): 初始的简化容差（米）。
+        """
+        super(MapBridge, self).__init__(parent)
+        self._tail_size = tail_size
+        self._max_vertices = max_vertices
+        self._tolerance = tolerance
+        self._initial_tolerance = tolerance
+
+        self._history = []   # 已简化的轨迹
+        self._tail = []      # 已推送、尚未简化的点
+        self._pending = []   # 尚未推送的点
+        self._position = None
+        self._position_changed = False
+        self._reset = False
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start(flush_interval)
+
+    def addPoint(self, latitude: float, longitude: float) -> None:
+        """
+        添加新的位置（只保存，下一次刷新时推送）。
+
+        Args:
+            latitude (float): 纬度。
+            longitude (float): 经度。
+        """
+        self._pending.append([latitude, longitude])
+        self._position = (latitude, longitude)
+        self._position_changed = True
+
+    def newFlight(self) -> None:
+        """ 开始新的飞行：之前的轨迹保留在地图上，新的点画在新的折线中。 """
+        self.flush()
+        self._history = []
+        self._tail = []
+        self._tolerance = self._initial_tolerance
+        self.flightStarted.emit()
+
+    @pyqtSlot()
+    def requestTrack(self) -> None:
+        """ 页面初始化完成后调用，重新发送完整的轨迹和当前位置。 """
+        self._reset = True
+        self._position_changed = self._position is not None
+        self.flush()
+
+    def flush(self) -> None:
+        """ 将累积的更新作为一条消息推送到页面。 """
+        if self._pending:
+            self._tail.extend(self._pending)
+
+            # 最近的点太多时，简化并入历史轨迹（之后发送完整轨迹）
+            if len(self._tail) > self._tail_size:
+                self._compact()
+
+            if not self._reset:
+                self.pointsAdded.emit(self._pending)
+            self._pending = []
+
+        if self._reset:
+            self._reset = False
+            self.trackReset.emit(self._history + self._tail)
+
+        if self._position_changed:
+            self._position_changed = False
+            self.positionChanged.emit(*self._position)
+
+    def _compact(self) -> None:
+        """ 简化最近的点并入历史轨迹，必要时加大容差重新简化历史轨迹。 """
+        joint = self._history[-1:]
+        simplified = simplifyTrack(joint + self._tail, self._tolerance)
+        self._history.extend(simplified[len(joint):])
+        self._tail = []
+
+        while len(self._history) > self._max_vertices:
+            self._tolerance *= 2
+            self._history = simplifyTrack(self._history, self._tolerance)
+
+        self._reset = True
+
+
+# 页面端脚本：连接 MapBridge 的信号，每个动画帧最多更新一次折线。
+# 需要在创建 'mymap'、'newMarkerIcon' 之后执行。
+MAP_BRIDGE_JS = """
+var track = L.polyline([], {color: 'red'}).addTo(mymap);
+var trackPoints = [];
+var pendingPoints = [];
+var pendingReset = null;
+var pendingPosition = null;
+var frameRequested = false;
+var positionMarker = null;
+var positionLabel = null;
+
+function scheduleFrame() {
+    if (!frameRequested) {
+        frameRequested = true;
+        requestAnimationFrame(applyUpdates);
+    }
+}
+
+function applyUpdates() {
+    frameRequested = false;
+
+    if (pendingReset !== null || pendingPoints.length) {
+        if (pendingReset !== null) {
+            trackPoints = pendingReset;
+            pendingReset = null;
+        }
+        for (var i = 0; i < pendingPoints.length; i++) {
+            trackPoints.push(pendingPoints[i]);
+        }
+        pendingPoints = [];
+        track.setLatLngs(trackPoints);
+    }
+
+    if (pendingPosition !== null) {
+        var latlng = L.latLng(pendingPosition[0], pendingPosition[1]);
+        var text = 'Lat: ' + pendingPosition[0].toFixed(7) + ' Lng: ' + pendingPosition[1].toFixed(7);
+        pendingPosition = null;
+
+        if (positionMarker === null) {
+            positionMarker = L.marker(latlng, { icon: newMarkerIcon }).addTo(mymap);
+            positionLabel = L.marker(latlng, { icon: L.divIcon({ className: 'label', html: '' }) }).addTo(mymap);
+        } else {
+            positionMarker.setLatLng(latlng);
+            positionLabel.setLatLng(latlng);
+        }
+        positionLabel.getElement().innerHTML =
+            '<div style="white-space: nowrap; margin-left: 1em;">' + text + '</div>';
+
+        if (!mymap.firstPanDone) {
+            mymap.setView(latlng, 17);
+            mymap.firstPanDone = true;
+        } else {
+            mymap.panTo(latlng, { animate: false });
+        }
+    }
+}
+
+new QWebChannel(qt.webChannelTransport, function (channel) {
+    var bridge = channel.objects.mapBridge;
+
+    bridge.pointsAdded.connect(function (points) {
+        for (var i = 0; i < points.length; i++) {
+            pendingPoints.push(points[i]);
+        }
+        scheduleFrame();
+    });
+
+    bridge.trackReset.connect(function (points) {
+        pendingReset = points;
+        pendingPoints = [];
+        scheduleFrame();
+    });
+
+    bridge.positionChanged.connect(function (lat, lng) {
+        pendingPosition = [lat, lng];
+        scheduleFrame();
+    });
+
+    bridge.flightStarted.connect(function () {
+        track = L.polyline([], {color: 'red'}).addTo(mymap);
+        trackPoints = [];
+        pendingPoints = [];
+        pendingReset = null;
+    });
+
+    bridge.requestTrack();
+});
+"""
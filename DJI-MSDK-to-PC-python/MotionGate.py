@@ -0,0 +1,179 @@
+import time
+
+import cv2
+import numpy as np
+
+"""
+变化门控 - 在运行检测器之前，用很小的代价判断画面是否发生了变化。
+
+悬停巡检的画面大部分时间是静止的，没有必要每帧都运行检测器。
+门控把帧缩小为很小的亮度图（BGR 帧直接取绿色通道作为亮度的近似，
+灰度帧（例如解码器的 Y 平面）直接使用，都不需要颜色转换），
+与上一次运行检测器时的参考图逐块比较平均绝对差 (block SAD)。
+只有足够多的块超过阈值，或者距离上一次检测超过 max_interval 时才运行检测器，
+其他帧复用上一次的检测结果。4K 帧的判断不到 0.5 ms。
+changedRegions() 对帧的多个区域（分块推理的图块）分别做同样的判断。
+
+使用方法：
+    stage = InferenceStage(detector, [drone], gate=MotionGate(threshold=6.0))
+"""
+
+
+class MotionGate:
+    """
+    一个视频源的变化门控（保存参考图，不是线程安全的）。
+    """
+
+    def __init__(self, threshold: float = 6.0, min_blocks: int = 1, width: int = 160,
+                 block: int = 8, max_interval: float | None = 2.0):
+        """
+        Args:
+            threshold (float): 块的平均绝对差（亮度 0 - 255）超过此值时视为变化。
+            min_blocks (int): 至少多少个块变化时运行检测器。
+            width (int): 缩小后亮度图的宽度（像素）。
+            block (int): 块的边长（缩小后的像素）。
+            max_interval (float | None): 距离上一次检测的最长时间（秒），
+                None 表示画面不变时永远不重新检测。
+        """
+        self.threshold = threshold
+        self.min_blocks = min_blocks
+        self.width = width
+        self.block = block
+        self.max_interval = max_interval
+
+        self._reference = None
+        self._reference_time = 0.0
+
+        # 按区域判断 (changedRegions) 的参考图和每个区域上一次检测的时间
+        self._region_reference = None
+        self._region_times = None
+
+        # 统计
+        self.checks = 0
+        self.triggers = 0
+
+    def copy(self) -> "MotionGate":
+        """ 相同参数的新门控（没有参考图），每个视频源使用一个。 """
+        return MotionGate(self.threshold, self.min_blocks, self.width, self.block,
+                          self.max_interval)
+
+    def reset(self) -> None:
+        """ 丢弃参考图，下一帧一定运行检测器。 """
+        self._reference = None
+        self._region_reference = None
+
+    ###### 变化 ######
+
+    def luma(self, frame: np.ndarray) -> np.ndarray:
+        """
+        缩小的亮度图 (uint8)。
+
+        Args:
+            frame (np.ndarray): BGR 帧 (高, 宽, 3)，或灰度 / Y 平面 (高, 宽)。
+        """
+        # 先隔行隔列取样到约两倍的目标宽度，再用区域插值平均（抑制压缩噪声）
+        step = max(1, frame.shape[1] // (2 * self.width))
+        if frame.ndim == 3:
+            plane = frame[::step, ::step, 1]
+        else:
+            plane = frame[::step, ::step]
+        height = max(self.block, round(plane.shape[0] * self.width / plane.shape[1]))
+        return cv2.resize(plane, (self.width, height), interpolation=cv2.INTER_AREA)
+
+    def blockScores(self, frame: np.ndarray) -> np.ndarray | None:
+        """
+        每个块与参考图的平均绝对差，没有参考图（或分辨率改变）时返回 None。
+
+        Return:
+            (块的行数, 块的列数) float32 数组。
+        """
+        return self._blockScores(self.luma(frame))
+
+    def _blockScores(self, small: np.ndarray) -> np.ndarray | None:
+        if self._reference is None or self._reference.shape != small.shape:
+            return None
+        diff = cv2.absdiff(small, self._reference)
+        rows, cols = small.shape[0] // self.block, small.shape[1] // self.block
+        diff = diff[:rows * self.block, :cols * self.block].astype(np.float32)
+        return cv2.resize(diff, (cols, rows), interpolation=cv2.INTER_AREA)
+
+    def changed(self, frame: np.ndarray, now: float | None = None) -> bool:
+        """
+        判断是否需要对这一帧运行检测器。返回 True 时这一帧成为新的参考图。
+
+        Args:
+            frame (np.ndarray): BGR 帧，或灰度 / Y 平面。
+            now (float | None): 当前时间 (time.monotonic)，None 使用当前时间。
+
+        Return:
+            True 表示画面变化（或超过最长间隔），应该运行检测器。
+        """
+        if now is None:
+            now = time.monotonic()
+        self.checks += 1
+
+        small = self.luma(frame)
+        scores = self._blockScores(small)
+        trigger = scores is None \
+            or np.count_nonzero(scores > self.threshold) >= self.min_blocks \
+            or (self.max_interval is not None and now - self._reference_time >= self.max_interval)
+
+        if trigger:
+            self._reference = small
+            self._reference_time = now
+            self.triggers += 1
+        return trigger
+
+    def changedRegions(self, frame: np.ndarray, regions: np.ndarray,
+                       now: float | None = None) -> np.ndarray:
+        """
+        分别判断帧的多个区域（例如分块推理的图块）是否需要运行检测器。
+        每个区域与它上一次运行检测器时的画面比较，返回 True 的区域更新参考图。
+
+        Args:
+            frame (np.ndarray): BGR 帧，或灰度 / Y 平面。
+            regions (np.ndarray): (N, 4) 区域 x1, y1, x2, y2（帧的像素坐标），每次调用相同。
+            now (float | None): 当前时间 (time.monotonic)，None 使用当前时间。
+
+        Return:
+            (N,) bool 数组。
+        """
+        if now is None:
+            now = time.monotonic()
+        regions = np.asarray(regions)
+        self.checks += len(regions)
+
+        small = self.luma(frame)
+        if self._region_reference is None or self._region_reference.shape != small.shape \
+                or len(self._region_times) != len(regions):
+            self._region_reference = small
+            self._region_times = np.full(len(regions), now)
+            self.triggers += len(regions)
+            return np.ones(len(regions), dtype=bool)
+
+        # 区域在亮度图中的范围
+        scale = small.shape[1] / frame.shape[1]
+        scaled = np.round(regions * scale).astype(np.intp)
+        diff = cv2.absdiff(small, self._region_reference)
+
+        changed = np.zeros(len(regions), dtype=bool)
+        if self.max_interval is not None:
+            changed |= now - self._region_times >= self.max_interval
+        for i, (x1, y1, x2, y2) in enumerate(scaled):
+            if changed[i]:
+                continue
+            area = diff[y1:y2, x1:x2]
+            rows, cols = max(1, area.shape[0] // self.block), max(1, area.shape[1] // self.block)
+            scores = cv2.resize(area.astype(np.float32), (cols, rows), interpolation=cv2.INTER_AREA)
+            changed[i] = np.count_nonzero(scores > self.threshold) >= self.min_blocks
+
+        # 先判断所有区域，再更新参考图（重叠的部分对相邻的区域都可见）
+        for x1, y1, x2, y2 in scaled[changed]:
+            self._region_reference[y1:y2, x1:x2] = small[y1:y2, x1:x2]
+        self._region_times[changed] = now
+        self.triggers += int(np.count_nonzero(changed))
+        return changed
+
+    def triggerRatio(self) -> float:
+        """ 运行检测器的帧占检查的帧的比例。 """
+        return self.triggers / self.checks if self.checks else 0.0
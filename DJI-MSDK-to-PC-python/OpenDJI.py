@@ -1,9 +1,9 @@
 import socket
-from threading import Thread, Lock, Event
+from threading import Thread, Lock, Event, Condition, current_thread
+from collections import deque
 import queue
-
-import av
-import av.codec
+import time
+import re
 
 
 class EventListener:
@@ -18,6 +18,61 @@ class EventListener:
         raise NotImplementedError("onValue 未实现")
 
 
+class BatchListener:
+    """
+    批量监听器 - 一次接收多个键的更新（结构为数组的形式）。
+
+    同一次接收（recv）中解析出的所有更新，以及监听器忙碌期间积累的更新，
+    合并为一次调用，适合写入 NumPy 列或仪表板等每秒处理大量更新的使用者。
+    """
+
+    def onBatch(self, keys: list[str], values: list[str], timestamps: list[float]):
+        """
+        每当有一批更新时调用。三个列表的长度相同，按接收顺序排列。
+
+        Args:
+            keys (list[str]): 每个更新的 "模块 键"。
+            values (list[str]): 每个更新的值。
+            timestamps (list[float]): 每个更新的接收时间 (time.monotonic()，与 OpenDJI.frameTime() 相同的时钟)。
+        """
+        raise NotImplementedError("onBatch 未实现")
+
+
+class DeliveryPolicy:
+    """
+    监听器的投递策略 - 控制 listen() 的新值如何交给 EventListener。
+
+    所有监听器都在独立的分发线程中调用（接收线程从不等待用户代码），
+    分发线程轮流处理有新值的键，因此高频的键不会让低频的键等待。
+
+    Attributes:
+        max_rate (float | None): 每秒最多调用几次，None 表示不限制。
+        latest_only (bool): True 只保留最新的值（来不及投递的旧值被合并），
+            False 依次投递所有的值（最多积压 max_pending 个，超过后丢弃最旧的）。
+        deadband (float | None): 消息中的数值与上一次接受的值相差都小于此阈值时
+            忽略这条消息，None 表示不过滤。
+        max_pending (int): latest_only 为 False 时最多积压的值。
+    """
+
+    def __init__(self, max_rate: float | None = None, latest_only: bool = False,
+                 deadband: float | None = None, max_pending: int = 1000):
+        self.max_rate = max_rate
+        self.latest_only = latest_only
+        self.deadband = deadband
+        self.max_pending = max_pending
+
+
+class _ClosedChannel:
+    """ 没有打开的通道：使用它时抛出 RuntimeError。 """
+
+    def __init__(self, channel: str):
+        self._channel = channel
+
+    def __getattr__(self, name):
+        raise RuntimeError(f"通道 '{self._channel}' 没有打开，"
+                           f"请在 OpenDJI(host, channels=...) 中包含它")
+
+
 class OpenDJI:
     """
     OpenDJI - MSDK Remote 应用程序的类包装器。
@@ -40,42 +95,89 @@ class OpenDJI:
     PORT_CONTROL = 9998
     PORT_QUERY = 9997
 
-    def __init__(self, host: str):
+    # 通信通道
+    CHANNEL_VIDEO = "video"
+    CHANNEL_CONTROL = "control"
+    CHANNEL_QUERY = "query"
+    ALL_CHANNELS = frozenset((CHANNEL_VIDEO, CHANNEL_CONTROL, CHANNEL_QUERY))
+
+    def __init__(self, host: str, channels=ALL_CHANNELS, video_process: bool = False):
         """
         将此类连接到无人机。给定 'host' IP 地址，构造函数
-        会连接到应用程序的所有数据端口。
+        会连接到应用程序的数据端口。
         IP 可以从应用程序窗口获取。
 
+        只打开需要的通道可以加快启动：没有视频通道时不导入 PyAV，
+        不创建解码器，也不接收视频数据。使用没有打开的通道会抛出 RuntimeError。
+
         Args:
             host (str): 打开了 MSDK Remote 的手机的 IP 地址。
+            channels: 要打开的通道，"video"、"control" 和 "query" 的集合，
+                默认打开全部。
+            video_process (bool): True 在独立的子进程中接收和解码视频（见 VideoProcess），
+                解码不占用本进程的 GIL，帧通过共享内存传递。
         """
 
         self.host_address = host
+        self.channels = frozenset(channels)
+        # 帧是否是共享内存的视图（进程解码），长时间保存帧的消费者应该复制
+        self.shared_frames = video_process and self.CHANNEL_VIDEO in self.channels
+        unknown = self.channels - self.ALL_CHANNELS
+        if unknown:
+            raise ValueError(f"未知的通道: {sorted(unknown)}")
 
         # 建立网络连接
-        self._socket_video = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._socket_control = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._socket_query = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        ports = {self.CHANNEL_VIDEO: self.PORT_VIDEO,
+                 self.CHANNEL_CONTROL: self.PORT_CONTROL,
+                 self.CHANNEL_QUERY: self.PORT_QUERY}
+        sockets = {}
 
         try:
-            # 尝试连接所有端口
-            self._socket_video.connect((self.host_address, self.PORT_VIDEO))
-            self._socket_control.connect((self.host_address, self.PORT_CONTROL))
-            self._socket_query.connect((self.host_address, self.PORT_QUERY))
+            # 尝试连接需要的端口（进程解码时由子进程连接视频端口）
+            for channel, port in ports.items():
+                if channel in self.channels and not (channel == self.CHANNEL_VIDEO and video_process):
+                    sockets[channel] = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    sockets[channel].connect((self.host_address, port))
 
         except Exception as e:
             # 出现异常时，关闭所有端口
-            self._socket_video.close()
-            self._socket_control.close()
-            self._socket_query.close()
+            for sock in sockets.values():
+                sock.close()
             raise
 
         # 此时 - 所有网络均已设置。
+        self._socket_video = sockets.get(self.CHANNEL_VIDEO, _ClosedChannel(self.CHANNEL_VIDEO))
+        self._socket_control = sockets.get(self.CHANNEL_CONTROL, _ClosedChannel(self.CHANNEL_CONTROL))
+        self._socket_query = sockets.get(self.CHANNEL_QUERY, _ClosedChannel(self.CHANNEL_QUERY))
+        self._sockets = list(sockets.values())
 
         # 设置后台线程
-        self._background_frames = BackgroundVideoCodec(self._socket_video)
-        self._background_control_messages = BackgroundCommandsQueue(self._socket_control)
-        self._background_query_messages = BackgroundCommandListener(self._socket_query)
+        self._background_frames = _ClosedChannel(self.CHANNEL_VIDEO)
+        self._background_control_messages = _ClosedChannel(self.CHANNEL_CONTROL)
+        self._background_query_messages = _ClosedChannel(self.CHANNEL_QUERY)
+        self._backgrounds = []
+
+        if self.CHANNEL_VIDEO in self.channels and video_process:
+            from VideoProcess import ProcessVideoCodec
+            try:
+                self._background_frames = ProcessVideoCodec(self.host_address, self.PORT_VIDEO)
+            except Exception:
+                for sock in self._sockets:
+                    sock.close()
+                raise
+            self._backgrounds.append(self._background_frames)
+        elif self.CHANNEL_VIDEO in self.channels:
+            self._background_frames = BackgroundVideoCodec(self._socket_video)
+            self._backgrounds.append(self._background_frames)
+        if self.CHANNEL_CONTROL in self.channels:
+            self._background_control_messages = BackgroundCommandsQueue(self._socket_control)
+            self._backgrounds.append(self._background_control_messages)
+        if self.CHANNEL_QUERY in self.channels:
+            self._background_query_messages = BackgroundCommandListener(self._socket_query)
+            self._backgrounds.append(self._background_query_messages)
+
+        # 键目录（可选），设置后在发送之前检查查询请求
+        self._catalog = None
 
     ###### 对象处理方法 ######
 
@@ -91,13 +193,16 @@ class OpenDJI:
         """
         清理对象，关闭所有通信和线程。
         """
-        self._socket_video.close()
-        self._socket_control.close()
-        self._socket_query.close()
+        for sock in self._sockets:
+            # 先 shutdown：只 close 不会唤醒正在 recv 的后台线程
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
 
-        self._background_frames.stop()
-        self._background_control_messages.stop()
-        self._background_query_messages.stop()
+        for background in self._backgrounds:
+            background.stop()
 
     ###### 视频方法 ######
 
@@ -107,6 +212,23 @@ class OpenDJI:
         """
         return self._background_frames.read()
 
+    def waitFrame(self, last_seq: int = 0, timeout: float | None = None):
+        """
+        等待比 'last_seq' 更新的帧，并返回最新的帧及其序号。
+        适合只关心最新帧的消费者（例如推理线程），
+        它们不需要处理每一帧，也不会阻塞解码线程。
+
+        Args:
+            last_seq (int): 调用者已经处理过的最后一个帧序号。
+            timeout (float | None): 等待的超时时间（秒），
+                或 None 表示无限期等待。
+
+        Return:
+            (seq, frame) - 帧序号和帧。如果超时，序号等于 'last_seq'，
+            如果视频流已关闭，帧为 None。
+        """
+        return self._background_frames.wait(last_seq, timeout)
+
     def frameListener(self, eventHandler: EventListener):
         """
         设置帧监听器 - 一个 EventListener 类，
@@ -124,6 +246,36 @@ class OpenDJI:
         """
         self._background_frames.unregisterListener()
 
+    def packetListener(self, eventHandler: EventListener):
+        """
+        添加数据包监听器 - 在解码之前，每个原始 H264 数据包 (bytes) 调用一次
+        eventHandler.onValue(packet)，例如用于录制 (Recorder)。
+        进程解码模式 (video_process=True) 不支持。
+
+        Args:
+            eventHandler (EventListener): 数据包监听器。
+        """
+        self._background_frames.registerPacketListener(eventHandler)
+
+    def removePacketListener(self, eventHandler: EventListener | None = None):
+        """
+        移除通过 packetListener(listener) 添加的数据包监听器，None 表示移除全部。
+        """
+        self._background_frames.unregisterPacketListener(eventHandler)
+
+    def frameTime(self, seq: int) -> float | None:
+        """
+        帧到达的时间，与 listenBatch() 的时间戳使用同一个时钟 (time.monotonic)。
+        只保留最近的帧。
+
+        Args:
+            seq (int): waitFrame() 返回的帧序号。
+
+        Return:
+            到达时间（秒），帧太旧或不存在时返回 None。
+        """
+        return self._background_frames.frameTime(seq)
+
     ###### 控制方法 ######
 
     def send_command(self, sock: socket.socket, command: str) -> None:
@@ -136,7 +288,8 @@ class OpenDJI:
         """
         sock.send(bytes(command + '\r\n', 'utf-8'))
 
-    def move(self, rcw: float, du: float, lr: float, bf: float, get_result: bool = False) -> str | None:
+    def move(self, rcw: float, du: float, lr: float, bf: float, get_result: bool = False,
+             timeout: float | None = None) -> str | None:
         """
         设置无人机移动的作用力 - 参数等同于控制杆的移动。
         所有值都是 -1.0 到 1.0 之间的实数，其中 0.0 是不移动。
@@ -147,9 +300,11 @@ class OpenDJI:
             lr (float): 向左移动 (-1.0) 或向右移动 (1.0)。
             bf (float): 向后移动 (-1.0) 或向前移动 (1.0)。
             get_result (bool): 标记是否等待服务器的响应。
+            timeout (float | None): 等待响应的超时时间（秒），或 None 表示无限期等待。
 
         Return:
             如果 get_result 为 true，则返回服务器的消息 (str)，否则返回 None。
+            如果等待超时，返回 None。
         """
 
         def clip1(value):
@@ -167,11 +322,11 @@ class OpenDJI:
 
         # 返回结果：
         if get_result:
-            return self._background_control_messages.read()
+            return self._background_control_messages.read(timeout=timeout)
         else:
             self._background_control_messages.disposeNext()
 
-    def enableControl(self, get_result: bool = False) -> str | None:
+    def enableControl(self, get_result: bool = False, timeout: float | None = None) -> str | None:
         """
         启用控制。此命令在进行移动之前至关重要，
         因为此命令会从遥控器获取控制权并将
@@ -179,19 +334,21 @@ class OpenDJI:
 
         Args:
             get_result (bool): 标记是否等待服务器的响应。
+            timeout (float | None): 等待响应的超时时间（秒），或 None 表示无限期等待。
 
         Return:
             如果 get_result 为 true，则返回服务器的消息 (str)，否则返回 None。
+            如果等待超时，返回 None。
         """
         self.send_command(self._socket_control, "enable")
 
         # 返回结果：
         if get_result:
-            return self._background_control_messages.read()
+            return self._background_control_messages.read(timeout=timeout)
         else:
             self._background_control_messages.disposeNext()
 
-    def disableControl(self, get_result: bool = False) -> str | None:
+    def disableControl(self, get_result: bool = False, timeout: float | None = None) -> str | None:
         """
         禁用控制。此命令在控制无人机后至关重要，
         因为此命令会从程序中移除控制权，
@@ -199,57 +356,79 @@ class OpenDJI:
 
         Args:
             get_result (bool): 标记是否等待服务器的响应。
+            timeout (float | None): 等待响应的超时时间（秒），或 None 表示无限期等待。
 
         Return:
             如果 get_result 为 true，则返回服务器的消息 (str)，否则返回 None。
+            如果等待超时，返回 None。
         """
         self.send_command(self._socket_control, "disable")
 
         # 返回结果：
         if get_result:
-            return self._background_control_messages.read()
+            return self._background_control_messages.read(timeout=timeout)
         else:
             self._background_control_messages.disposeNext()
 
-    def takeoff(self, get_result: bool = False) -> str | None:
+    def takeoff(self, get_result: bool = False, timeout: float | None = None) -> str | None:
         """
         无人机起飞。
 
         Args:
             get_result (bool): 标记是否等待服务器的响应。
+            timeout (float | None): 等待响应的超时时间（秒），或 None 表示无限期等待。
 
         Return:
             如果 get_result 为 true，则返回服务器的消息 (str)，否则返回 None。
+            如果等待超时，返回 None。
         """
         self.send_command(self._socket_control, "takeoff")
 
         # 返回结果：
         if get_result:
-            return self._background_control_messages.read()
+            return self._background_control_messages.read(timeout=timeout)
         else:
             self._background_control_messages.disposeNext()
 
-    def land(self, get_result: bool = False) -> str | None:
+    def land(self, get_result: bool = False, timeout: float | None = None) -> str | None:
         """
         无人机降落。
 
         Args:
             get_result (bool): 标记是否等待服务器的响应。
+            timeout (float | None): 等待响应的超时时间（秒），或 None 表示无限期等待。
 
         Return:
             如果 get_result 为 true，则返回服务器的消息 (str)，否则返回 None。
+            如果等待超时，返回 None。
         """
         self.send_command(self._socket_control, "land")
 
         # 返回结果：
         if get_result:
-            return self._background_control_messages.read()
+            return self._background_control_messages.read(timeout=timeout)
         else:
             self._background_control_messages.disposeNext()
 
     ###### 键值(Key-Value)方法 ######
 
-    def getValue(self, module: str, key: str) -> str:
+    def useCatalog(self, catalog) -> None:
+        """
+        设置键目录（KeyCatalog），之后 get / set / listen / unlisten / action
+        在发送之前检查模块、键、能力和简单的参数类型，无效时抛出 ValueError。
+
+        Args:
+            catalog (KeyCatalog | None): 键目录，None 表示不检查。
+        """
+        self._catalog = catalog
+
+    def _validate(self, verb: str, module: str, key: str, value: str | None = None) -> None:
+        """ 如果设置了键目录，检查请求。 """
+        catalog = self._catalog
+        if catalog is not None:
+            catalog.validate(verb, module, key, value)
+
+    def getValue(self, module: str, key: str, timeout: float | None = None) -> str | None:
         """
         获取特定键的值。
         此方法是阻塞的，会等待结果。
@@ -257,14 +436,22 @@ class OpenDJI:
         Args:
             module (str): 键所在的模块。
             key (str): 要发送 get 查询的键。
+            timeout (float | None): 等待响应的超时时间（秒），或 None 表示无限期等待。
+
+        Return:
+            键的值，如果等待超时，返回 None。
         """
+        self._validate("get", module, key)
+
         # 发送 'get' 命令并等待结果。
         return self._background_query_messages.readOnce(
             f"{module} {key}",
-            f"get {module} {key}"
+            f"get {module} {key}",
+            timeout
         )
 
-    def listen(self, module: str, key: str, eventHandler: EventListener) -> None:
+    def listen(self, module: str, key: str, eventHandler: EventListener,
+               policy: DeliveryPolicy | None = None) -> None:
         """
         在特定键的值上设置监听器。
         此方法是非阻塞的，一旦设置了监听器，
@@ -275,18 +462,49 @@ class OpenDJI:
             key (str): 要发送 get 查询的键。
             eventHandler (EventListener): 在此监听器的新值上调用的监听器。
                 必须实现 "onValue(self, value)" ！
+            policy (DeliveryPolicy | None): 投递策略（最大频率、只保留最新值、死区），
+                None 表示依次投递所有的值。
         """
+        self._validate("listen", module, key)
+
         # 设置监听器。
         self._background_query_messages.setListener(
             f"{module} {key}",
-            eventHandler
+            eventHandler,
+            policy
         )
         # 发送命令以 'listen' (监听) 该值。
         self._background_query_messages.send_command(
             f"listen {module} {key}"
         )
 
-    def unlisten(self, module: str, key: str) -> None:
+    def listenBatch(self, module_keys: list[tuple[str, str]], listener: BatchListener,
+                    max_rate: float | None = None, max_pending: int = 100000) -> None:
+        """
+        在多个键上设置同一个批量监听器。
+        此方法是非阻塞的，一旦设置了监听器，
+        它就会返回。使用 unlisten() 逐个移除键。
+
+        Args:
+            module_keys (list[tuple[str, str]]): (模块, 键) 的列表。
+            listener (BatchListener): 批量监听器，必须实现 "onBatch(self, keys, values, timestamps)" ！
+            max_rate (float | None): 每秒最多调用几次（期间的更新合并到下一批），
+                None 表示不限制。
+            max_pending (int): 最多积压的更新，超过后丢弃最旧的。
+        """
+        for module, key in module_keys:
+            self._validate("listen", module, key)
+
+        self._background_query_messages.setBatchListener(
+            [f"{module} {key}" for module, key in module_keys],
+            listener, max_rate, max_pending
+        )
+        for module, key in module_keys:
+            self._background_query_messages.send_command(
+                f"listen {module} {key}"
+            )
+
+    def unlisten(self, module: str, key: str, timeout: float | None = None) -> str | None:
         """
         从特定键中移除监听器。
         此方法是阻塞的，会等待远程端对请求的响应。
@@ -294,11 +512,19 @@ class OpenDJI:
         Args:
             module (str): 键所在的模块。
             key (str): 要发送 get 查询的键。
+            timeout (float | None): 等待响应的超时时间（秒），或 None 表示无限期等待。
+                超时时监听器仍然从本地移除。
+
+        Return:
+            响应，如果等待超时，返回 None。
         """
+        self._validate("unlisten", module, key)
+
         # 首先在该方法上取消监听，
         result = self._background_query_messages.readOnce(
             f"{module} {key}",
-            f"unlisten {module} {key}"
+            f"unlisten {module} {key}",
+            timeout
         )
         # 然后从内部字典中移除监听器
         self._background_query_messages.removeListener(
@@ -316,6 +542,8 @@ class OpenDJI:
             key (str): 要发送 get 查询的键。
             value (str): 要在所需键上设置的值。
         """
+        self._validate("set", module, key, value)
+
         # 发送 set 请求并等待结果。
         return self._background_query_messages.readOnce(
             f"{module} {key}",
@@ -334,6 +562,8 @@ class OpenDJI:
             key (str): 要发送 get 查询的键。
             value (str): 要在所需键上设置的值。
         """
+        self._validate("action", module, key, value)
+
         # 如果此动作没有值：
         if value is None:
             # 发送 action 请求并等待结果。
@@ -350,7 +580,8 @@ class OpenDJI:
                 f"action {module} {key} {value}"
             )
 
-    def help(self, module: str | None = None, key: str | None = None) -> str:
+    def help(self, module: str | None = None, key: str | None = None,
+             timeout: float | None = 10.0) -> str | None:
         """
         发送 'help' (帮助) 命令，可以带或不带模块名称和键。
 
@@ -359,32 +590,52 @@ class OpenDJI:
                 或者 None（如果你想检索可用的模块）。
             key (str | None): 需要帮助的键，
                 或者 None 以获取模块的键（如果模块不是 None）。
+            timeout (float | None): 等待响应的超时时间（秒），或 None 表示无限期等待。
+
+        Return:
+            帮助信息，如果等待超时，返回 None。
         """
         # 如果没有模块 - 检索可用的模块。
         if module is None:
             return self._background_query_messages.readUnbound(
-                "help"
+                "help", timeout
             )
 
         # 如果没有键但有模块 - 检索模块可用的键。
         if key is None:
             return self._background_query_messages.readUnbound(
-                f"help {module}"
+                f"help {module}", timeout
             )
 
         # 如果有键和模块 - 检索特定键的信息。
         else:
             return self._background_query_messages.readUnbound(
-                f"help {module} {key}"
+                f"help {module} {key}", timeout
             )
 
-    def getModules(self) -> str:
+    def unsolicitedListener(self, eventHandler: EventListener) -> None:
+        """
+        设置未请求消息的监听器 - 查询通道上无法对应到任何请求的消息
+        （例如 listen 失败时的错误消息，或者超时请求迟到的响应）。
+        没有设置监听器时，这些消息被丢弃。
+        与键的监听器一样在分发线程中调用，慢的监听器不会阻塞接收。
+
+        Args:
+            eventHandler (EventListener): 在每条未请求的消息上调用的监听器。
+        """
+        self._background_query_messages.setUnsolicitedListener(eventHandler)
+
+    def removeUnsolicitedListener(self) -> None:
+        """ 移除未请求消息的监听器。 """
+        self._background_query_messages.setUnsolicitedListener(None)
+
+    def getModules(self) -> str | None:
         """
         获取可用的模块。
         """
         return self.help()
 
-    def getModuleKeys(self, module: str) -> str:
+    def getModuleKeys(self, module: str) -> str | None:
         """
         获取模块内可用的键。
 
@@ -393,7 +644,7 @@ class OpenDJI:
         """
         return self.help(module)
 
-    def getKeyInfo(self, module: str, key: str) -> str:
+    def getKeyInfo(self, module: str, key: str) -> str | None:
         """
         获取特定键的信息。
 
@@ -404,13 +655,112 @@ class OpenDJI:
         return self.help(module, key)
 
 
+class _UnboundRequest:
+    """ 等待未绑定响应（例如 help）的请求。 """
+
+    def __init__(self, command: str, timeout: float | None):
+        self.command = command
+        self.arguments = command.split(" ")[1:]
+        self.key_info = command.startswith("help ") and command.count(" ") == 2
+        self.event = Event()
+        self.result = None
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+
+
+class _Subscription:
+    """ 一个键的监听器、投递策略和等待投递的值。 """
+
+    # 提取消息中的数值（用于死区过滤）
+    _NUMBER_PATTERN = re.compile(r"[-+]?\d+\.?\d*(?:[eE][-+]?\d+)?")
+
+    def __init__(self, listener: EventListener, policy: DeliveryPolicy):
+        self.listener = listener
+        self.policy = policy
+        self.pending = deque(maxlen=1 if policy.latest_only else policy.max_pending)
+        self.queued = False
+        self.active = True
+        self.next_time = 0.0
+        self._reference = None
+
+    def offer(self, unique_key: str, value: str, timestamp: float) -> bool:
+        """ 保存新值（调用者持有分发锁），返回 True 表示有值等待投递。 """
+        deadband = self.policy.deadband
+        if deadband is not None:
+            numbers = [float(n) for n in self._NUMBER_PATTERN.findall(value)]
+            reference = self._reference
+            if numbers and reference is not None and len(numbers) == len(reference) and \
+                    all(abs(a - b) < deadband for a, b in zip(numbers, reference)):
+                return bool(self.pending)
+            self._reference = numbers
+
+        self.pending.append(value)
+        return True
+
+    def take(self):
+        """ 取出下一个要投递的值（调用者持有分发锁）。 """
+        return self.pending.popleft()
+
+    def deliver(self, value: str) -> None:
+        """ 调用监听器（不持有锁）。 """
+        self.listener.onValue(value)
+
+
+class _BatchSubscription:
+    """ 多个键共享的批量监听器，以及等待投递的更新（结构为数组）。 """
+
+    def __init__(self, listener: BatchListener, max_rate: float | None, max_pending: int):
+        self.listener = listener
+        self.policy = DeliveryPolicy(max_rate=max_rate)
+        self.max_pending = max_pending
+        self.pending = []
+        self._values = []
+        self._timestamps = []
+        self.queued = False
+        self.active = True
+        self.next_time = 0.0
+
+    def offer(self, unique_key: str, value: str, timestamp: float) -> bool:
+        """ 将更新加入当前批次（调用者持有分发锁）。 """
+        self.pending.append(unique_key)
+        self._values.append(value)
+        self._timestamps.append(timestamp)
+        if len(self.pending) > self.max_pending:
+            drop = len(self.pending) - self.max_pending
+            del self.pending[:drop], self._values[:drop], self._timestamps[:drop]
+        return True
+
+    def take(self):
+        """ 取出当前批次（调用者持有分发锁）。 """
+        batch = (self.pending, self._values, self._timestamps)
+        self.pending, self._values, self._timestamps = [], [], []
+        return batch
+
+    def deliver(self, batch: tuple) -> None:
+        """ 调用批量监听器（不持有锁）。 """
+        self.listener.onBatch(*batch)
+
+
 class BackgroundCommandListener:
     """
     管理来自应用程序的所有查询。
     帮助设置监听器，一次性获取值，从帮助命令获取消息，
     支持同步和异步。
+
+    未绑定的响应（没有 "模块 键" 前缀的 '{...}' 消息，例如 help 的响应）
+    按照请求发送的顺序对应到请求；键信息的响应带有模块和键，
+    直接对应到相同的请求。help 的错误响应（"Unknown module 模块" 或
+    "Unknown key 键"）对应到这个模块或键所在位置的参数相同的请求。
+    超时的请求保留一段时间（orphan_timeout），以便接收它迟到的响应，
+    不会让之后的请求错位。
+    无法对应到请求的消息交给未请求消息的监听器。
     """
 
+    # 键信息响应的开头，例如 "{module:'Battery', key:'Connection', ..."
+    _KEY_INFO_PATTERN = re.compile(r"\{module:'([^']*)',\s*key:'([^']*)'")
+
+    # help 的错误响应，例如 "Unknown module Bogus" 或 "Unknown key Bogus"
+    _HELP_ERROR_PATTERN = re.compile(r"Unknown (module|key) (\S+)")
+
     def __init__(self, sock: socket.socket):
         """
         初始化来自命令管理器的后台消息接收器。
@@ -423,17 +773,25 @@ class BackgroundCommandListener:
         self._sock = sock
         self._live = True
 
-        # 监听器字典
+        # 监听器字典 (unique_key -> _Subscription 或 _BatchSubscription)，
+        #  修改时复制整个字典，接收线程读取时不需要加锁
         self._listeners = {}
         self._listeners_lock = Lock()
 
+        # 有新值等待投递的订阅（分发线程轮流处理）
+        self._ready = deque()
+        self._dispatch_cond = Condition()
+
         # 一次性消息事件的字典。
         self._listeners_onces_event = {}
         self._listeners_onces_result = {}
         self._listeners_onces_lock = Lock()
 
-        # 没有监听器的消息队列
-        self._unbound_messages = queue.Queue()
+        # 等待未绑定响应的请求（按发送顺序），以及未请求消息的订阅（由分发线程投递）
+        self._unbound_requests = deque()
+        self._unbound_lock = Lock()
+        self._unsolicited = None
+        self.orphan_timeout = 30.0
         self._message = ""
 
         # 启动后台线程
@@ -441,6 +799,11 @@ class BackgroundCommandListener:
         self._thread.daemon = True
         self._thread.start()
 
+        # 启动分发线程（调用监听器）
+        self._dispatch_thread = Thread(target=self.__Dispatch__)
+        self._dispatch_thread.daemon = True
+        self._dispatch_thread.start()
+
     def __ReadMessages__(self):
         """
         在后台读取消息
@@ -464,6 +827,11 @@ class BackgroundCommandListener:
             # 将所有可用的完整消息添加到队列中
             messages_list = self._message.split("\r\n")
 
+            # 这一块数据中监听器的更新，最后一次性交给分发线程
+            timestamp = time.monotonic()
+            listeners = self._listeners
+            updates = []
+
             # 添加剩余的消息以供读取。
             for message in messages_list[:-1]:  # 不包括最后一个。
 
@@ -471,7 +839,7 @@ class BackgroundCommandListener:
                 # 并且如果它的空格少于两个，则无法提取键，
                 # 在这两种情况下，此消息更可能是通用的
                 if message.startswith("{") or message.count(" ") < 2:
-                    self._unbound_messages.put(message)
+                    self._onUnbound(message)
                     continue
 
                 # 将消息拆分为 unique_key 和消息本身。
@@ -488,16 +856,18 @@ class BackgroundCommandListener:
                         del self._listeners_onces_event[unique_key]
                         continue
 
-                # 检查是否在 unique_key 上注册了监听器
-                with self._listeners_lock:
-                    if unique_key in self._listeners:
-                        # 调用事件监听器
-                        listener: EventListener = self._listeners[unique_key]
-                        listener.onValue(message_trimed)
-                        continue
+                # 检查是否在 unique_key 上注册了监听器，
+                #  新值交给分发线程，这里不调用用户代码
+                subscription = listeners.get(unique_key)
+                if subscription is not None:
+                    updates.append((subscription, unique_key, message_trimed))
+                    continue
 
-                # 否则，将其注册为未绑定的消息
-                self._unbound_messages.put(message)
+                # 否则，这是一条未请求的消息
+                self._onUnbound(message)
+
+            if updates:
+                self._enqueue(updates, timestamp)
 
             # 最后一条消息没有以 '\r\n' 结尾，
             # 如果是，那么 message_list[-1] = ""。
@@ -513,13 +883,18 @@ class BackgroundCommandListener:
         with self._send_lock:
             self._sock.send(bytes(command + '\r\n', 'utf-8'))
 
-    def readOnce(self, unique_key: str, command: str) -> str:
+    def readOnce(self, unique_key: str, command: str,
+                 timeout: float | None = None) -> str | None:
         """
         发送命令并等待 unique_key 上的响应
 
         Args:
             unique_key (str): 要等待事件的键。
             command (str): 等待时要发送的命令。
+            timeout (float | None): 等待响应的超时时间（秒），或 None 表示无限期等待。
+
+        Return:
+            响应，如果等待超时，返回 None。
         """
         event = Event()
 
@@ -533,30 +908,219 @@ class BackgroundCommandListener:
                 self._listeners_onces_event[unique_key] = event
                 self.send_command(command)
 
-        # 等待事件发生
-        event.wait()
+        # 等待事件发生。超时时取消登记，否则之后同一个键的请求只会等待
+        #  这个事件而不再发送命令（迟到的响应交给监听器或未请求消息的监听器）
+        if not event.wait(timeout):
+            with self._listeners_onces_lock:
+                if self._listeners_onces_event.get(unique_key) is event:
+                    del self._listeners_onces_event[unique_key]
+            return None
         return self._listeners_onces_result[unique_key]
 
-    def readUnbound(self, command: str) -> str:
+    def _onUnbound(self, message: str) -> None:
+        """
+        处理未绑定的消息：'{...}' 消息和 help 的错误消息交给等待的请求，
+        其他消息（或者没有请求在等待时）交给未请求消息的监听器。
+        """
+        if message.startswith("{"):
+            request = self._takeUnboundRequest(message)
+        else:
+            request = self._takeErrorRequest(message)
+        if request is not None:
+            request.result = message
+            request.event.set()
+            return
+
+        # 与其他监听器一样交给分发线程，接收线程中不调用用户代码
+        subscription = self._unsolicited
+        if subscription is not None:
+            self._enqueue([(subscription, "", message)], time.monotonic())
+
+    def _takeUnboundRequest(self, message: str) -> _UnboundRequest | None:
+        """ 取出与响应对应的请求。 """
+        with self._unbound_lock:
+            self._pruneOrphans()
+            if not self._unbound_requests:
+                return None
+
+            # 键信息的响应直接对应到相同的请求（否则对应到最早的键信息请求），
+            #  其他响应对应到最早的、不是键信息的请求。
+            match = self._KEY_INFO_PATTERN.match(message)
+            if match:
+                command = f"help {match.group(1)} {match.group(2)}"
+                candidates = [r for r in self._unbound_requests if r.command == command] or \
+                             [r for r in self._unbound_requests if r.key_info]
+            else:
+                candidates = [r for r in self._unbound_requests if not r.key_info]
+
+            request = candidates[0] if candidates else self._unbound_requests[0]
+            self._unbound_requests.remove(request)
+            return request
+
+    def _takeErrorRequest(self, message: str) -> _UnboundRequest | None:
+        """
+        取出与 help 错误响应对应的请求："Unknown module 模块" 对应到第一个参数
+        是这个模块的最早的请求，"Unknown key 键" 对应到第二个参数是这个键的
+        最早的键信息请求。其他消息（例如 listen 的错误）不对应到任何请求。
+        """
+        match = self._HELP_ERROR_PATTERN.fullmatch(message)
+        if match is None:
+            return None
+        kind, name = match.groups()
+
+        with self._unbound_lock:
+            self._pruneOrphans()
+            for request in self._unbound_requests:
+                if not request.command.startswith("help "):
+                    continue
+                arguments = request.arguments
+                if (kind == "module" and arguments[0] == name) or \
+                        (kind == "key" and request.key_info and arguments[1] == name):
+                    self._unbound_requests.remove(request)
+                    return request
+            return None
+
+    def _pruneOrphans(self) -> None:
+        """ 丢弃超时太久、不再等待响应的请求（调用者持有锁）。 """
+        now = time.monotonic()
+        self._unbound_requests = deque(
+            request for request in self._unbound_requests
+            if request.deadline is None or now < request.deadline + self.orphan_timeout)
+
+    def readUnbound(self, command: str, timeout: float | None = None) -> str | None:
         """
-        读取未绑定的消息，但带有一个命令。
+        发送命令并等待它的未绑定响应（例如 help）。
+        可以在多个线程中同时调用，每个调用者得到自己请求的响应。
 
         Args:
-            command (str): 等待时要发送的命令。
+            command (str): 要发送的命令。
+            timeout (float | None): 等待响应的超时时间（秒），或 None 表示无限期等待。
+
+        Return:
+            响应，如果等待超时，返回 None。
+        """
+        request = _UnboundRequest(command, timeout)
+
+        # 在同一个锁中登记和发送，使请求的顺序与发送的顺序相同
+        with self._unbound_lock:
+            self._unbound_requests.append(request)
+            self.send_command(command)
+
+        if not request.event.wait(timeout):
+            # 请求保留在队列中（直到 orphan_timeout）：迟到的响应由它接收，
+            #  而不是交给之后的请求，使所有请求错位
+            return None
+        return request.result
+
+    def setUnsolicitedListener(self, listener: EventListener | None) -> None:
+        """
+        设置未请求消息的监听器（None 表示移除）。
+        监听器在分发线程中被调用，依次收到所有的消息。
+
+        Args:
+            listener (EventListener | None): 在每条未请求的消息上调用的监听器。
+        """
+        previous = self._unsolicited
+        self._unsolicited = _Subscription(listener, DeliveryPolicy()) if listener else None
+        if previous is not None:
+            previous.active = False
+
+    def _enqueue(self, updates: list[tuple], timestamp: float) -> None:
+        """
+        保存一块数据中的所有新值，并在需要时唤醒分发线程。
+
+        Args:
+            updates (list[tuple]): (订阅, unique_key, 值) 的列表。
+            timestamp (float): 接收时间。
+        """
+        with self._dispatch_cond:
+            for subscription, unique_key, value in updates:
+                if subscription.offer(unique_key, value, timestamp) and not subscription.queued:
+                    subscription.queued = True
+                    self._ready.append(subscription)
+            self._dispatch_cond.notify()
+
+    def __Dispatch__(self):
         """
-        self.send_command(command)
-        return self._unbound_messages.get()
+        在后台调用监听器：轮流从每个有新值的订阅中取出一个值，
+        遵守每个订阅的最大频率，调用监听器时不持有任何锁。
+        """
+        while self._live:
+            with self._dispatch_cond:
+                subscription = None
+                wait = None
+                now = time.monotonic()
+
+                # 轮流查找可以投递的订阅
+                for _ in range(len(self._ready)):
+                    candidate = self._ready.popleft()
+                    if not candidate.active or not candidate.pending:
+                        candidate.queued = False
+                        continue
+                    if candidate.next_time <= now:
+                        subscription = candidate
+                        break
+                    self._ready.append(candidate)
+                    delay = candidate.next_time - now
+                    wait = delay if wait is None else min(wait, delay)
+
+                if subscription is None:
+                    self._dispatch_cond.wait(wait)
+                    continue
+
+                # 取出一个值（或一批），还有值时排到队尾
+                value = subscription.take()
+                if subscription.pending:
+                    self._ready.append(subscription)
+                else:
+                    subscription.queued = False
 
-    def setListener(self, unique_key: str, listener: EventListener) -> None:
+                if subscription.policy.max_rate:
+                    subscription.next_time = now + 1.0 / subscription.policy.max_rate
+
+            # 调用事件监听器
+            if subscription.active:
+                subscription.deliver(value)
+
+    def setListener(self, unique_key: str, listener: EventListener,
+                    policy: DeliveryPolicy | None = None) -> None:
         """
         为 unique_key 注册一个监听器
 
         Args:
             unique_key (str): 要监听的键。
             listener (EventListener): 要注册的监听器。
+            policy (DeliveryPolicy | None): 投递策略，None 表示依次投递所有的值。
+        """
+        self._replaceListeners([unique_key], _Subscription(listener, policy or DeliveryPolicy()))
+
+    def setBatchListener(self, unique_keys: list[str], listener: BatchListener,
+                         max_rate: float | None = None, max_pending: int = 100000) -> None:
+        """
+        为多个 unique_key 注册同一个批量监听器。
+
+        Args:
+            unique_keys (list[str]): 要监听的键。
+            listener (BatchListener): 要注册的批量监听器。
+            max_rate (float | None): 每秒最多调用几次，None 表示不限制。
+            max_pending (int): 最多积压的更新。
         """
+        self._replaceListeners(unique_keys, _BatchSubscription(listener, max_rate, max_pending))
+
+    def _replaceListeners(self, unique_keys: list[str], subscription) -> None:
+        """ 将 unique_keys 指向 subscription（None 表示移除），复制字典后替换。 """
         with self._listeners_lock:
-            self._listeners[unique_key] = listener
+            listeners = dict(self._listeners)
+            replaced = [listeners.pop(unique_key) for unique_key in unique_keys if unique_key in listeners]
+            if subscription is not None:
+                listeners.update(dict.fromkeys(unique_keys, subscription))
+            self._listeners = listeners
+
+            # 不再有任何键的订阅停止投递（批量订阅可能还有其他键）
+            remaining = set(map(id, listeners.values()))
+            for previous in replaced:
+                if id(previous) not in remaining:
+                    previous.active = False
 
     def removeListener(self, unique_key: str) -> None:
         """
@@ -565,9 +1129,7 @@ class BackgroundCommandListener:
         Args:
             unique_key (str): 要移除监听器的键。
         """
-        with self._listeners_lock:
-            if unique_key in self._listeners:
-                del self._listeners[unique_key]
+        self._replaceListeners([unique_key], None)
 
     def stop(self, timeout: float | None = None):
         """
@@ -581,6 +1143,12 @@ class BackgroundCommandListener:
         self._sock.close()
         self._thread.join(timeout)
 
+        # 唤醒分发线程
+        with self._dispatch_cond:
+            self._dispatch_cond.notify_all()
+        if self._dispatch_thread is not current_thread():
+            self._dispatch_thread.join(timeout)
+
 
 class BackgroundCommandsQueue:
     """
@@ -673,7 +1241,7 @@ class BackgroundCommandsQueue:
             最后一条消息的字符串（如果可用），否则为 None。
         """
         try:
-            return self._queue.get(block)
+            return self._queue.get(block, timeout)
         except queue.Empty:
             self.disposeNext()
         return None
@@ -696,6 +1264,24 @@ class BackgroundCommandsQueue:
         self._thread.join(timeout)
 
 
+class _FrameTimes:
+    """ 最近的帧序号 -> 到达时间 (time.monotonic)，只保留最近 capacity 帧。 """
+
+    def __init__(self, capacity: int = 512):
+        self._capacity = capacity
+        self._times = {}
+        self._order = deque()
+
+    def add(self, seq: int, timestamp: float) -> None:
+        self._times[seq] = timestamp
+        self._order.append(seq)
+        if len(self._order) > self._capacity:
+            self._times.pop(self._order.popleft(), None)
+
+    def get(self, seq: int) -> float | None:
+        return self._times.get(seq)
+
+
 class BackgroundVideoCodec:
     """
     在后台捕获帧，
@@ -720,9 +1306,22 @@ class BackgroundVideoCodec:
         # 内部变量
         self._sock = sock
         self._frame = None
+        # 只有使用视频时才导入 PyAV（导入和创建解码器需要较长时间）
+        import av.codec
+
         self._codec = av.codec.context.CodecContext.create('h264', 'r')
         self._live = True
         self._listener = None
+        # 数据包监听器（元组，修改时替换，接收线程读取时不需要加锁）
+        self._packet_listeners = ()
+
+        # 帧序号，每解码一帧加一，用于 wait() 的 "最新帧" 语义
+        self._frame_seq = 0
+        self._frame_cond = Condition()
+        self._closed = False
+
+        # 每一帧的到达时间
+        self._frame_times = _FrameTimes()
 
         # 启动后台线程
         self._thread = Thread(target=self.__ReadFrames__)
@@ -745,12 +1344,30 @@ class BackgroundVideoCodec:
             except ConnectionAbortedError:
                 break
 
+            # 这块数据中的帧的到达时间（不包括解码的时间）
+            timestamp = time.monotonic()
+
             # 遍历数据中的数据包，
             # 并从数据包中解码帧。
             for packet in self._codec.parse(data):
+
+                # 解码之前，将原始的 H264 数据包交给数据包监听器（例如转发、录制）
+                packet_listeners = self._packet_listeners
+                if packet_listeners:
+                    packet_data = bytes(packet)
+                    for packet_listener in packet_listeners:
+                        packet_listener.onValue(packet_data)
+
                 for frame in self._codec.decode(packet):
 
-                    self._frame = frame.to_ndarray(format='bgr24')
+                    image = frame.to_ndarray(format='bgr24')
+
+                    # 更新帧和序号，并唤醒等待新帧的线程
+                    with self._frame_cond:
+                        self._frame = image
+                        self._frame_seq += 1
+                        self._frame_times.add(self._frame_seq, timestamp)
+                        self._frame_cond.notify_all()
 
                     # 使用新帧调用监听器
                     #  将监听器保存在新变量中以避免
@@ -758,15 +1375,39 @@ class BackgroundVideoCodec:
                     listener: EventListener = self._listener
 
                     if listener:
-                        listener.onValue(self._frame)
+                        listener.onValue(image)
 
         # 如果连接/线程中断，则将帧设置为 None。
-        self._frame = None
+        with self._frame_cond:
+            self._frame = None
+            self._closed = True
+            self._frame_cond.notify_all()
 
     def read(self):
         """ 从此视频流中获取最后可用的帧。 """
         return self._frame
 
+    def wait(self, last_seq: int = 0, timeout: float | None = None):
+        """
+        等待序号大于 'last_seq' 的帧。
+
+        Args:
+            last_seq (int): 已经处理过的最后一个帧序号。
+            timeout (float | None): 超时时间（秒），或 None 表示无限期等待。
+
+        Return:
+            (seq, frame) - 最新的帧序号和帧。
+        """
+        with self._frame_cond:
+            self._frame_cond.wait_for(
+                lambda: self._frame_seq != last_seq or self._closed, timeout)
+            return self._frame_seq, self._frame
+
+    def frameTime(self, seq: int) -> float | None:
+        """ 帧的到达时间 (time.monotonic)，帧太旧时返回 None。 """
+        with self._frame_cond:
+            return self._frame_times.get(seq)
+
     def stop(self, timeout: float | None = None):
         """
         停止线程。（也关闭套接字）
@@ -785,4 +1426,15 @@ class BackgroundVideoCodec:
 
     def unregisterListener(self):
         """ 移除帧监听器 """
-        self._listener = None
\ No newline at end of file
+        self._listener = None
+
+    def registerPacketListener(self, listener: EventListener):
+        """ 添加数据包监听器，每个原始 H264 数据包 (bytes) 调用一次 """
+        self._packet_listeners = self._packet_listeners + (listener,)
+
+    def unregisterPacketListener(self, listener: EventListener | None = None):
+        """ 移除数据包监听器，None 表示移除全部 """
+        if listener is None:
+            self._packet_listeners = ()
+        else:
+            self._packet_listeners = tuple(l for l in self._packet_listeners if l is not listener)
\ No newline at end of file
@@ -0,0 +1,161 @@
+from OpenDJI import OpenDJI
+from OpenDJI import EventListener
+
+import itertools
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+"""
+Qt 桥接 - 让 Qt 界面使用 OpenDJI，而不在 GUI 线程中进行任何阻塞的网络操作。
+
+    遥测：通过 listen() 订阅，每个新值作为 Qt 信号发出，
+          Qt 会自动将其排队到接收者所在的（GUI）线程。
+    命令：在独立的 QThread 中执行（例如 takeoff(True)），
+          结果作为信号返回，GUI 线程永远不会等待网络。
+"""
+
+
+class _SignalListener(EventListener):
+    """ 将 listen() 的新值转为 DroneBridge.telemetry 信号（在网络线程中调用）。 """
+
+    def __init__(self, bridge, module: str, key: str):
+        self._bridge = bridge
+        self._module = module
+        self._key = key
+
+    def onValue(self, value):
+        self._bridge.telemetry.emit(self._module, self._key, value)
+
+
+class _CommandWorker(QObject):
+    """ 在工作线程中依次执行 OpenDJI 的方法。 """
+
+    finished = pyqtSignal(int, str, object)
+    failed = pyqtSignal(int, str, str)
+
+    def __init__(self, drone: OpenDJI):
+        super(_CommandWorker, self).__init__()
+        self._drone = drone
+
+    @pyqtSlot(int, str, tuple, dict)
+    def run(self, request_id: int, name: str, args: tuple, kwargs: dict):
+        try:
+            result = getattr(self._drone, name)(*args, **kwargs)
+        except Exception as e:
+            self.failed.emit(request_id, name, str(e))
+            return
+        self.finished.emit(request_id, name, result)
+
+
+class DroneBridge(QObject):
+    """
+    OpenDJI 的 Qt 包装器。
+
+    Signals:
+        telemetry(module, key, value): 订阅的键有新值时发出。
+        commandFinished(request_id, name, result): 命令执行完成时发出。
+        commandFailed(request_id, name, error): 命令抛出异常时发出。
+    """
+
+    telemetry = pyqtSignal(str, str, str)
+    commandFinished = pyqtSignal(int, str, object)
+    commandFailed = pyqtSignal(int, str, str)
+
+    # 内部信号：将命令排队到工作线程
+    _request = pyqtSignal(int, str, tuple, dict)
+
+    def __init__(self, drone: OpenDJI, parent: QObject | None = None,
+                 command_timeout: float | None = 10.0):
+        """
+        初始化桥接并启动命令线程。
+
+        Args:
+            drone (OpenDJI): 已连接的无人机。
+            parent (QObject | None): 父对象。
+            command_timeout (float | None): 控制命令等待响应的超时时间（秒），
+                超时后命令结果为 None，工作线程可以继续执行下一个命令。
+        """
+        super(DroneBridge, self).__init__(parent)
+        self._drone = drone
+        self._command_timeout = command_timeout
+        self._subscriptions = set()
+        self._request_ids = itertools.count(1)
+
+        # 命令工作线程
+        self._thread = QThread(self)
+        self._worker = _CommandWorker(drone)
+        self._worker.moveToThread(self._thread)
+        self._request.connect(self._worker.run)
+        self._worker.finished.connect(self.commandFinished)
+        self._worker.failed.connect(self.commandFailed)
+        self._thread.start()
+
+    ###### 遥测 ######
+
+    def subscribe(self, module: str, key: str) -> None:
+        """
+        订阅一个键，之后每个新值都会发出 telemetry 信号。
+        listen() 是非阻塞的，可以在 GUI 线程中调用。
+
+        Args:
+            module (str): 键所在的模块。
+            key (str): 要监听的键。
+        """
+        if (module, key) in self._subscriptions:
+            return
+        self._subscriptions.add((module, key))
+        self._drone.listen(module, key, _SignalListener(self, module, key))
+
+    def unsubscribe(self, module: str, key: str) -> int:
+        """
+        取消订阅。unlisten() 会等待远程端的响应，因此在命令线程中执行。
+
+        Return:
+            请求 ID，结果通过 commandFinished 信号返回。
+        """
+        self._subscriptions.discard((module, key))
+        return self.call("unlisten", module, key)
+
+    ###### 命令 ######
+
+    def call(self, name: str, *args, **kwargs) -> int:
+        """
+        在命令线程中调用 OpenDJI 的方法（非阻塞）。
+
+        Args:
+            name (str): 方法名称，例如 "takeoff" 或 "getValue"。
+            *args: 方法的参数。
+            **kwargs: 方法的关键字参数。
+
+        Return:
+            请求 ID，与 commandFinished / commandFailed 信号中的 ID 对应。
+        """
+        request_id = next(self._request_ids)
+        self._request.emit(request_id, name, args, kwargs)
+        return request_id
+
+    def takeoff(self) -> int:
+        """ 起飞（非阻塞），返回请求 ID。 """
+        return self.call("takeoff", True, timeout=self._command_timeout)
+
+    def land(self) -> int:
+        """ 降落（非阻塞），返回请求 ID。 """
+        return self.call("land", True, timeout=self._command_timeout)
+
+    def enableControl(self) -> int:
+        """ 启用应用程序控制（非阻塞），返回请求 ID。 """
+        return self.call("enableControl", True, timeout=self._command_timeout)
+
+    def disableControl(self) -> int:
+        """ 禁用应用程序控制（非阻塞），返回请求 ID。 """
+        return self.call("disableControl", True, timeout=self._command_timeout)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """
+        停止命令线程，最多等待当前命令 'timeout' 秒。
+
+        Args:
+            timeout (float): 等待的超时时间（秒）。
+        """
+        self._thread.quit()
+        self._thread.wait(int(timeout * 1000))
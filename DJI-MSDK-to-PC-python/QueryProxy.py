@@ -0,0 +1,412 @@
+from OpenDJI import OpenDJI
+from OpenDJI import EventListener
+from OpenDJI import BackgroundCommandListener, BackgroundCommandsQueue
+
+from concurrent.futures import ThreadPoolExecutor, Future
+from threading import Thread, Lock
+from collections import deque
+import argparse
+import socket
+import queue
+import time
+
+"""
+查询/控制代理 - 保持唯一的一个到无人机查询端口和控制端口的连接，
+让本机上的多个进程同时使用遥测和控制。
+
+代理使用与手机应用相同的文本协议（默认监听 127.0.0.1:9997 和 127.0.0.1:9998），
+因此客户端可以直接使用 OpenDJI("127.0.0.1")（视频由 VideoRelay 在 9999 上转发）。
+
+    listen   - 按键计数：第一个订阅者才向上游发送 listen，
+               最后一个订阅者离开时才发送 unlisten，新值分发给所有订阅者。
+               上游的监听流量只与不同键的数量有关，与客户端数量无关。
+    get      - 同一个键并发的 get 共享一次上游请求。
+    set / action - 同一个键的请求依次执行，每个客户端得到自己请求的响应。
+               上游的响应只带有键，因此同一个键上的 get / set / action 都按键串行，
+               不会把一个请求的响应交给另一个请求。
+    help     - 并发执行，响应由 readUnbound 按请求对应。
+    控制命令 - 按到达顺序转发，上游的响应按顺序返回给发送命令的客户端。
+
+命令行：
+    python QueryProxy.py 10.0.0.6
+"""
+
+
+class _ProxyClient:
+    """ 一个本地客户端：发送队列和独立的发送线程，慢的客户端不会阻塞其他客户端。 """
+
+    def __init__(self, sock: socket.socket, address, max_queue: int):
+        self._sock = sock
+        self.address = address
+        self._queue = queue.Queue(max_queue)
+        self.subscriptions = set()
+        self.live = True
+
+        self._thread = Thread(target=self.__Send__)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def send(self, message: str) -> None:
+        """ 排队一条消息（不阻塞），积压太多时断开客户端。 """
+        if not self.live:
+            return
+        try:
+            self._queue.put_nowait(bytes(message + '\r\n', 'utf-8'))
+        except queue.Full:
+            print(f"客户端 {self.address} 太慢，断开连接")
+            self.close()
+
+    def lines(self):
+        """ 逐行读取客户端的命令，直到连接关闭。 """
+        buffer = ""
+        while self.live:
+            try:
+                data = self._sock.recv(1 << 16)
+                if len(data) == 0:
+                    break
+            except OSError:
+                break
+
+            buffer += data.decode("utf-8")
+            messages_list = buffer.split("\r\n")
+            for message in messages_list[:-1]:
+                if message:
+                    yield message
+            buffer = messages_list[-1]
+
+    def __Send__(self):
+        while self.live:
+            data = self._queue.get()
+            if data is None:
+                break
+            try:
+                self._sock.sendall(data)
+            except OSError:
+                break
+        self.close()
+
+    def close(self) -> None:
+        if not self.live:
+            return
+        self.live = False
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+class _FanOutListener(EventListener):
+    """ 上游监听器：将一个键的新值分发给所有订阅者（在上游读取线程中调用）。 """
+
+    def __init__(self, proxy, unique_key: str):
+        self._proxy = proxy
+        self._unique_key = unique_key
+
+    def onValue(self, value):
+        message = f"{self._unique_key} {value}"
+        for client in self._proxy._subscribers(self._unique_key):
+            client.send(message)
+
+
+class QueryProxy:
+    """
+    查询和控制通道的多路复用代理。
+
+    创建后立即连接无人机并开始服务，stop() 或 'with' 作用域结束时关闭。
+    """
+
+    def __init__(self, host: str, listen_host: str = "127.0.0.1",
+                 query_port: int = OpenDJI.PORT_QUERY, control_port: int = OpenDJI.PORT_CONTROL,
+                 workers: int = 8, client_queue: int = 10000, request_timeout: float = 30.0):
+        """
+        启动代理。
+
+        Args:
+            host (str): 打开了 MSDK Remote 的手机的 IP 地址。
+            listen_host (str): 本地监听地址。
+            query_port (int): 本地查询端口。
+            control_port (int): 本地控制端口。
+            workers (int): 执行阻塞请求（get / set / action / help）的线程数。
+            client_queue (int): 每个客户端最多积压的消息数量。
+            request_timeout (float): 请求等待上游响应的超时时间（秒），
+                超时的请求不返回响应。
+        """
+        self._client_queue = client_queue
+        self._live = True
+
+        # 订阅：键 -> 订阅的客户端。_fanout 是只读的副本，
+        #  上游读取线程在持有监听器锁时读取它，因此不能再加锁。
+        self._subscriptions = {}
+        self._subscriptions_lock = Lock()
+        self._fanout = {}
+
+        # get / set / action / unlisten 按键串行（help 的响应由 readUnbound 按请求对应），
+        #  正在进行的 get：键 -> Future，并发的 get 共享它的结果
+        self._key_locks = {}
+        self._key_locks_lock = Lock()
+        self._gets = {}
+        self._request_timeout = request_timeout
+
+        # 控制命令：等待响应的客户端，按发送顺序
+        self._control_pending = deque()
+        self._control_lock = Lock()
+
+        self._executor = ThreadPoolExecutor(workers)
+        self._clients = []
+        self._clients_lock = Lock()
+
+        # 本地监听的套接字
+        self._servers = []
+        try:
+            for port, handler in ((query_port, self.__QueryClient__),
+                                  (control_port, self.__ControlClient__)):
+                server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                server.bind((listen_host, port))
+                self._servers.append((server, handler))
+
+            # 唯一的上游连接
+            self._upstream_query = socket.create_connection((host, OpenDJI.PORT_QUERY))
+            try:
+                self._upstream_control = socket.create_connection((host, OpenDJI.PORT_CONTROL))
+            except Exception:
+                self._upstream_query.close()
+                raise
+
+        except Exception:
+            for server, _ in self._servers:
+                server.close()
+            raise
+
+        self._query = BackgroundCommandListener(self._upstream_query)
+        self._control = BackgroundCommandsQueue(self._upstream_control)
+
+        self._control_thread = Thread(target=self.__ControlResponses__)
+        self._control_thread.daemon = True
+        self._control_thread.start()
+
+        for server, handler in self._servers:
+            server.listen()
+            thread = Thread(target=self.__Accept__, args=(server, handler))
+            thread.daemon = True
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __Accept__(self, server: socket.socket, handler):
+        """ 接受新的客户端，每个客户端一个读取线程 """
+        while self._live:
+            try:
+                sock, address = server.accept()
+            except OSError:
+                break
+            client = _ProxyClient(sock, address, self._client_queue)
+            with self._clients_lock:
+                self._clients = [c for c in self._clients if c.live]
+                self._clients.append(client)
+
+            thread = Thread(target=handler, args=(client,))
+            thread.daemon = True
+            thread.start()
+
+    ###### 查询通道 ######
+
+    def __QueryClient__(self, client: _ProxyClient):
+        """ 读取客户端的查询命令并分派 """
+        for command in client.lines():
+            parts = command.split(" ", 3)
+            verb = parts[0]
+
+            if verb in ("listen", "unlisten", "get", "set", "action") and len(parts) >= 3:
+                unique_key = parts[1] + " " + parts[2]
+
+                # listen 不阻塞，直接在读取线程中处理，保证与后续命令的顺序
+                if verb == "listen":
+                    self._subscribe(client, unique_key)
+                else:
+                    self._executor.submit(self._request, client, verb, unique_key, command)
+            else:
+                self._executor.submit(self._unbound, client, command)
+
+        # 客户端断开：释放它的所有订阅
+        client.close()
+        for unique_key in list(client.subscriptions):
+            self._executor.submit(self._unsubscribe, client, unique_key, False)
+
+    def _subscribers(self, unique_key: str) -> tuple:
+        return self._fanout.get(unique_key, ())
+
+    def _updateFanout(self, unique_key: str) -> None:
+        """ 更新键的订阅者副本（调用者持有 _subscriptions_lock） """
+        self._fanout[unique_key] = tuple(self._subscriptions.get(unique_key, ()))
+
+    def _keyLock(self, unique_key: str) -> Lock:
+        with self._key_locks_lock:
+            if unique_key not in self._key_locks:
+                self._key_locks[unique_key] = Lock()
+            return self._key_locks[unique_key]
+
+    def _subscribe(self, client: _ProxyClient, unique_key: str) -> None:
+        """ 添加订阅者，第一个订阅者向上游发送 listen """
+        with self._subscriptions_lock:
+            subscribers = self._subscriptions.setdefault(unique_key, set())
+            first = len(subscribers) == 0
+            subscribers.add(client)
+            client.subscriptions.add(unique_key)
+            self._updateFanout(unique_key)
+
+            if first:
+                self._query.setListener(unique_key, _FanOutListener(self, unique_key))
+                self._query.send_command(f"listen {unique_key}")
+
+    def _unsubscribe(self, client: _ProxyClient, unique_key: str, reply: bool) -> None:
+        """ 移除订阅者，最后一个订阅者离开时向上游发送 unlisten """
+        with self._subscriptions_lock:
+            subscribers = self._subscriptions.get(unique_key, set())
+            subscribers.discard(client)
+            client.subscriptions.discard(unique_key)
+            self._updateFanout(unique_key)
+            last = len(subscribers) == 0
+
+        if not last:
+            # 其他客户端还在监听：只在本地取消
+            if reply:
+                client.send(f"{unique_key} unlistened")
+            return
+
+        with self._keyLock(unique_key):
+            result = self._query.readOnce(unique_key, f"unlisten {unique_key}",
+                                          self._request_timeout)
+
+            # 等待响应期间可能有新的订阅者
+            with self._subscriptions_lock:
+                if len(self._subscriptions.get(unique_key, ())) == 0:
+                    self._subscriptions.pop(unique_key, None)
+                    self._query.removeListener(unique_key)
+                else:
+                    self._query.send_command(f"listen {unique_key}")
+
+        if reply:
+            client.send(f"{unique_key} {result}")
+
+    def _request(self, client: _ProxyClient, verb: str, unique_key: str, command: str) -> None:
+        """ 执行 get / set / action / unlisten，并将响应发送给请求的客户端 """
+        if verb == "unlisten":
+            self._unsubscribe(client, unique_key, True)
+            return
+
+        if verb == "get":
+            result = self._get(unique_key, command)
+        else:
+            with self._keyLock(unique_key):
+                result = self._query.readOnce(unique_key, command, self._request_timeout)
+
+        if result is not None:
+            client.send(f"{unique_key} {result}")
+
+    def _get(self, unique_key: str, command: str) -> str | None:
+        """ 并发的 get 共享同一个上游请求，请求本身与同一个键的 set / action 串行 """
+        with self._key_locks_lock:
+            shared = self._gets.get(unique_key)
+            owner = shared is None
+            if owner:
+                shared = self._gets[unique_key] = Future()
+        if not owner:
+            return shared.result()
+
+        result = None
+        try:
+            with self._keyLock(unique_key):
+                result = self._query.readOnce(unique_key, command, self._request_timeout)
+        finally:
+            with self._key_locks_lock:
+                del self._gets[unique_key]
+            shared.set_result(result)
+        return result
+
+    def _unbound(self, client: _ProxyClient, command: str) -> None:
+        """ 执行没有键的请求（例如 help），超时的请求不返回响应 """
+        result = self._query.readUnbound(command, self._request_timeout)
+        if result is not None:
+            client.send(result)
+
+    ###### 控制通道 ######
+
+    def __ControlClient__(self, client: _ProxyClient):
+        """ 转发客户端的控制命令，记录等待响应的客户端 """
+        for command in client.lines():
+            with self._control_lock:
+                self._control_pending.append(client)
+                self._upstream_control.send(bytes(command + '\r\n', 'utf-8'))
+        client.close()
+
+    def __ControlResponses__(self):
+        """ 上游的每个控制响应按顺序返回给发送命令的客户端 """
+        while self._live:
+            message = self._control.read()
+            if message is None or not self._live:
+                continue
+            with self._control_lock:
+                client = self._control_pending.popleft() if self._control_pending else None
+            if client is not None:
+                client.send(message)
+
+    ###### 状态 ######
+
+    def subscriptions(self) -> dict:
+        """ 当前的上游订阅：键 -> 本地订阅者数量。 """
+        with self._subscriptions_lock:
+            return {key: len(clients) for key, clients in self._subscriptions.items() if clients}
+
+    def clients(self) -> list:
+        """ 当前连接的客户端地址。 """
+        with self._clients_lock:
+            return [client.address for client in self._clients if client.live]
+
+    def stop(self) -> None:
+        """ 关闭所有客户端和上游连接。 """
+        self._live = False
+
+        # shutdown 会唤醒阻塞在 recv / accept 中的线程（仅 close 不会）
+        for sock in [self._upstream_query, self._upstream_control] + [s for s, _ in self._servers]:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for server, _ in self._servers:
+            server.close()
+
+        with self._clients_lock:
+            for client in self._clients:
+                client.close()
+            self._clients = []
+
+        self._query.stop()
+        self._control.stop()
+        self._executor.shutdown(wait=False)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="无人机查询/控制代理")
+    parser.add_argument("host", help="打开了 MSDK Remote 的手机的 IP 地址")
+    arguments = parser.parse_args()
+
+    with QueryProxy(arguments.host) as proxy:
+        print(f"正在代理 {arguments.host} 的查询和控制，按 Ctrl+C 退出")
+        try:
+            while True:
+                time.sleep(5)
+                print(f"客户端: {len(proxy.clients())}  上游订阅: {len(proxy.subscriptions())}",
+                      end='\t\t\r')
+        except KeyboardInterrupt:
+            pass
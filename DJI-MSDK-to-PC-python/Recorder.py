@@ -0,0 +1,378 @@
+from OpenDJI import OpenDJI
+from OpenDJI import EventListener
+
+from VideoRelay import splitNals, NAL_IDR, NAL_SPS, NAL_PPS, START_CODE
+
+from fractions import Fraction
+from threading import Thread
+import argparse
+import datetime
+import queue
+import socket
+import time
+import os
+
+"""
+视频录制 - 将无人机的原始 H264 流直接封装为分段的 MP4 / MKV 文件，不解码也不重新编码。
+
+数据包来自已有的 codec.parse()（OpenDJI.packetListener），或者独立的录制进程
+（python Recorder.py <IP>，只解析不解码）。时间戳来自数据包到达时的墙上时钟，
+文件按时间或大小在关键帧处分段，写入在后台 I/O 线程中进行。
+
+MP4 使用分片格式 (frag_keyframe + empty_moov)，MKV 本身就是流式的：
+程序崩溃或断电时，已写入的部分仍然可以播放。
+
+使用方法：
+    recorder = Recorder("recordings")
+    recorder.attach(drone)
+    ...
+    recorder.stop()
+"""
+
+# 时间戳的时间基 (90 kHz，与 MPEG 相同)
+TIME_BASE = Fraction(1, 90000)
+
+# 各容器的格式和选项
+_CONTAINERS = {
+    "mp4": ("mp4", {"movflags": "frag_keyframe+empty_moov+default_base_moof"}),
+    "mkv": ("matroska", {}),
+}
+
+
+class _BitReader:
+    """ 按位读取 RBSP（已去除防竞争字节）。 """
+
+    def __init__(self, data: bytes):
+        self._value = int.from_bytes(data, "big")
+        self._left = len(data) * 8
+
+    def read(self, bits: int) -> int:
+        if bits > self._left:
+            raise ValueError("SPS 数据不完整")
+        self._left -= bits
+        return (self._value >> self._left) & ((1 << bits) - 1)
+
+    def ue(self) -> int:
+        """ 无符号指数哥伦布码 """
+        zeros = 0
+        while self.read(1) == 0:
+            zeros += 1
+        return (1 << zeros) - 1 + self.read(zeros)
+
+    def se(self) -> int:
+        """ 有符号指数哥伦布码 """
+        value = self.ue()
+        return (value + 1) // 2 if value % 2 else -(value // 2)
+
+
+def parseSpsSize(sps: bytes) -> tuple[int, int]:
+    """
+    从 H264 SPS（不含起始码，包括 NAL 头）中读取图像尺寸（已裁剪）。
+
+    Return:
+        (宽, 高)
+    """
+    # 去除防竞争字节 00 00 03
+    rbsp = bytearray()
+    zeros = 0
+    for byte in sps[1:]:
+        if zeros >= 2 and byte == 3:
+            zeros = 0
+            continue
+        rbsp.append(byte)
+        zeros = zeros + 1 if byte == 0 else 0
+
+    r = _BitReader(bytes(rbsp))
+    profile_idc = r.read(8)
+    r.read(16)  # constraint_set 标志和 level_idc
+    r.ue()      # seq_parameter_set_id
+
+    chroma_format_idc = 1
+    if profile_idc in (100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135):
+        chroma_format_idc = r.ue()
+        if chroma_format_idc == 3:
+            r.read(1)  # separate_colour_plane_flag
+        r.ue()  # bit_depth_luma_minus8
+        r.ue()  # bit_depth_chroma_minus8
+        r.read(1)  # qpprime_y_zero_transform_bypass_flag
+        if r.read(1):  # seq_scaling_matrix_present_flag
+            for i in range(8 if chroma_format_idc != 3 else 12):
+                if r.read(1):
+                    last, next_scale = 8, 8
+                    for _ in range(16 if i < 6 else 64):
+                        if next_scale != 0:
+                            next_scale = (last + r.se() + 256) % 256
+                        last = last if next_scale == 0 else next_scale
+
+    r.ue()  # log2_max_frame_num_minus4
+    pic_order_cnt_type = r.ue()
+    if pic_order_cnt_type == 0:
+        r.ue()  # log2_max_pic_order_cnt_lsb_minus4
+    elif pic_order_cnt_type == 1:
+        r.read(1)
+        r.se()
+        r.se()
+        for _ in range(r.ue()):
+            r.se()
+
+    r.ue()  # max_num_ref_frames
+    r.read(1)  # gaps_in_frame_num_value_allowed_flag
+    width_mbs = r.ue() + 1
+    height_map_units = r.ue() + 1
+    frame_mbs_only = r.read(1)
+    if not frame_mbs_only:
+        r.read(1)  # mb_adaptive_frame_field_flag
+    r.read(1)  # direct_8x8_inference_flag
+
+    width = width_mbs * 16
+    height = (2 - frame_mbs_only) * height_map_units * 16
+
+    if r.read(1):  # frame_cropping_flag
+        left, right, top, bottom = r.ue(), r.ue(), r.ue(), r.ue()
+        crop_x = {0: 1, 1: 2, 2: 2, 3: 1}[chroma_format_idc]
+        crop_y = {0: 1, 1: 2, 2: 1, 3: 1}[chroma_format_idc] * (2 - frame_mbs_only)
+        width -= (left + right) * crop_x
+        height -= (top + bottom) * crop_y
+
+    return width, height
+
+
+class _Segment:
+    """ 一个正在写入的文件。 """
+
+    def __init__(self, path: str, container: str, sps: bytes, pps: bytes, start: float):
+        import av
+
+        format_name, options = _CONTAINERS[container]
+        self.path = path
+        self.start = start
+        self.bytes = 0
+        self.last_pts = -1
+
+        self._output = av.open(path, "w", format=format_name, options=options)
+        self._output.metadata["creation_time"] = \
+            datetime.datetime.fromtimestamp(start, datetime.timezone.utc).isoformat()
+
+        # 只用于封装的流：参数来自 SPS / PPS（Annex B 格式，复用器会转换为 avcC）
+        width, height = parseSpsSize(sps)
+        self._stream = self._output.add_stream("h264")
+        self._stream.width = width
+        self._stream.height = height
+        self._stream.time_base = TIME_BASE
+        self._stream.codec_context.extradata = START_CODE + sps + START_CODE + pps
+
+    def write(self, data: bytes, wallclock: float, keyframe: bool) -> None:
+        import av
+
+        # 时间戳：相对于分段开始的墙上时钟，保证严格递增
+        pts = max(round((wallclock - self.start) / TIME_BASE), self.last_pts + 1)
+        self.last_pts = pts
+
+        packet = av.Packet(data)
+        packet.stream = self._stream
+        packet.time_base = TIME_BASE
+        packet.pts = packet.dts = pts
+        packet.is_keyframe = keyframe
+        self._output.mux(packet)
+        self.bytes += len(data)
+
+    def close(self) -> None:
+        self._output.close()
+
+
+class _RecorderListener(EventListener):
+    def __init__(self, recorder):
+        self._recorder = recorder
+
+    def onValue(self, packet):
+        self._recorder.onPacket(packet)
+
+
+class Recorder:
+    """
+    分段录制原始 H264 数据包。
+
+    onPacket() 在接收线程中调用，只记录到达时间并放入队列；
+    分段、封装和写入都在 I/O 线程中进行。
+    """
+
+    def __init__(self, directory: str, container: str = "mp4", prefix: str = "flight",
+                 segment_seconds: float | None = 300.0, segment_bytes: int | None = None,
+                 max_queue: int = 2000):
+        """
+        创建录制器并启动 I/O 线程。
+
+        Args:
+            directory (str): 输出目录。
+            container (str): "mp4"（分片 MP4）或 "mkv"。
+            prefix (str): 文件名前缀，文件名为 <prefix>_<开始时间>.<container>。
+            segment_seconds (float | None): 每段的最长时间（秒），None 表示不限。
+            segment_bytes (int | None): 每段的最大字节数，None 表示不限。
+            max_queue (int): 等待写入的最大数据包数，I/O 跟不上时丢弃新的数据包。
+        """
+        if container not in _CONTAINERS:
+            raise ValueError(f"不支持的容器: {container}")
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.container = container
+        self.prefix = prefix
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+
+        self._queue = queue.Queue(max_queue)
+        self._listener = _RecorderListener(self)
+        self._drone = None
+        self._dropped = 0
+        self._segments = []
+
+        self._thread = Thread(target=self.__Write__)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    ###### 数据来源 ######
+
+    def attach(self, drone: OpenDJI) -> None:
+        """ 录制无人机的视频（使用 OpenDJI 已经解析的数据包）。 """
+        self._drone = drone
+        drone.packetListener(self._listener)
+
+    def onPacket(self, packet: bytes) -> None:
+        """ 提交一个 H264 数据包（线程安全，不阻塞）。 """
+        try:
+            self._queue.put_nowait((packet, time.time()))
+        except queue.Full:
+            self._dropped += 1
+
+    ###### I/O 线程 ######
+
+    def _rotate(self, segment: _Segment | None, wallclock: float) -> bool:
+        """ 关键帧处是否需要开始新的分段。 """
+        if segment is None:
+            return True
+        if self.segment_seconds is not None and wallclock - segment.start >= self.segment_seconds:
+            return True
+        if self.segment_bytes is not None and segment.bytes >= self.segment_bytes:
+            return True
+        return False
+
+    def _open(self, sps: bytes, pps: bytes, wallclock: float) -> _Segment | None:
+        stamp = datetime.datetime.fromtimestamp(wallclock).strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"{self.prefix}_{stamp}.{self.container}")
+        index = 1
+        while os.path.exists(path):
+            index += 1
+            path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{index}.{self.container}")
+        try:
+            segment = _Segment(path, self.container, sps, pps, wallclock)
+        except Exception as e:
+            print(f"无法创建录制文件 {path}: {e}")
+            return None
+        self._segments.append(path)
+        return segment
+
+    def __Write__(self):
+        """
+        在后台写入：缓存 SPS / PPS，在关键帧处开始新的分段，
+        分段之前的数据包（没有关键帧）被丢弃。
+        """
+        segment = None
+        sps = pps = None
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            data, wallclock = item
+
+            keyframe = False
+            for nal_type, payload in splitNals(data):
+                if nal_type == NAL_SPS:
+                    sps = payload
+                elif nal_type == NAL_PPS:
+                    pps = payload
+                elif nal_type == NAL_IDR:
+                    keyframe = True
+
+            if keyframe and sps is not None and pps is not None and self._rotate(segment, wallclock):
+                if segment is not None:
+                    segment.close()
+                segment = self._open(sps, pps, wallclock)
+
+            if segment is None:
+                continue
+
+            try:
+                segment.write(data, wallclock, keyframe)
+            except Exception as e:
+                print(f"录制写入失败: {e}")
+                segment.close()
+                segment = None
+
+        if segment is not None:
+            segment.close()
+
+    ###### 状态 ######
+
+    def segments(self) -> list[str]:
+        """ 已创建的文件。 """
+        return list(self._segments)
+
+    def dropped(self) -> int:
+        """ 因为 I/O 跟不上而丢弃的数据包数。 """
+        return self._dropped
+
+    def stop(self, timeout: float | None = None) -> None:
+        """ 停止录制，写完队列中的数据包并关闭文件。 """
+        if self._drone is not None:
+            self._drone.removePacketListener(self._listener)
+            self._drone = None
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+def recordStream(host: str, port: int, recorder: Recorder) -> None:
+    """
+    直接从视频端口（或 VideoRelay）录制：只解析数据包，不解码。
+    阻塞直到连接关闭。
+    """
+    import av.codec
+
+    codec = av.codec.context.CodecContext.create('h264', 'r')
+    sock = socket.create_connection((host, port))
+    try:
+        while True:
+            data = sock.recv(1 << 20)
+            if len(data) == 0:
+                break
+            for packet in codec.parse(data):
+                recorder.onPacket(bytes(packet))
+    finally:
+        sock.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="录制无人机视频（不解码）")
+    parser.add_argument("host", help="手机的 IP 地址，或 VideoRelay 的地址")
+    parser.add_argument("--port", type=int, default=OpenDJI.PORT_VIDEO)
+    parser.add_argument("--dir", default="recordings", help="输出目录")
+    parser.add_argument("--container", choices=sorted(_CONTAINERS), default="mp4")
+    parser.add_argument("--segment-seconds", type=float, default=300.0)
+    parser.add_argument("--segment-mb", type=float, default=None)
+    args = parser.parse_args()
+
+    segment_bytes = None if args.segment_mb is None else int(args.segment_mb * 1e6)
+    with Recorder(args.dir, args.container, segment_seconds=args.segment_seconds,
+                  segment_bytes=segment_bytes) as recorder:
+        print(f"正在录制 {args.host}:{args.port} -> {args.dir}（Ctrl+C 停止）")
+        try:
+            recordStream(args.host, args.port, recorder)
+        except KeyboardInterrupt:
+            pass
+    print("已保存:", *recorder.segments(), sep="\n    ")
@@ -0,0 +1,189 @@
+from multiprocessing import shared_memory, resource_tracker
+from threading import Lock
+import multiprocessing
+import weakref
+
+import numpy as np
+
+"""
+共享内存帧环 - 在进程之间传递帧，而不需要对 ndarray 进行 pickle。
+
+内存布局：
+    [头部: slots x HEADER_FIELDS 个 int64] [槽 0] [槽 1] ...
+
+每个槽的大小为 max_shape 对应的字节数，头部保存该槽中帧的
+序号和实际尺寸。写入方复制一次帧数据，读取方直接得到
+指向共享内存的 ndarray 视图（不复制）。
+
+每个进程记录自己 read() 返回的、仍然存在的视图数量（按槽计数），
+最后一个视图被释放时调用 on_release(槽)，使用者可以据此解除对槽的固定；
+close() 在视图全部释放之后才真正关闭共享内存。
+"""
+
+# 头部中每个槽的字段：序号、高、宽、通道数
+HEADER_FIELDS = 4
+
+
+class SharedFrameRing:
+    """
+    固定数量的帧槽，位于一块命名共享内存中。
+    由一个进程创建 (create=True)，其他进程通过名称连接。
+
+    槽的分配（哪个槽可以写入）由使用者负责，
+    例如通过队列传递空闲槽的索引。
+    """
+
+    def __init__(self, slots: int, max_shape: tuple = (2160, 3840, 3),
+                 name: str | None = None, create: bool = True, on_release=None):
+        """
+        创建或连接共享内存帧环。
+
+        Args:
+            slots (int): 槽的数量。
+            max_shape (tuple): 单个槽能容纳的最大帧尺寸 (高, 宽, 通道)。
+            name (str | None): 共享内存的名称，连接时必须提供。
+            create (bool): True 创建新的共享内存，False 连接已有的。
+            on_release: 可调用对象，某个槽在本进程中的最后一个视图被释放时
+                调用 on_release(槽)（在释放视图的线程中调用），None 表示不通知。
+        """
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        self.slot_size = int(np.prod(self.max_shape))
+
+        header_size = slots * HEADER_FIELDS * 8
+        size = header_size + slots * self.slot_size
+
+        if create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # 连接方不负责释放共享内存。由 multiprocessing 启动的子进程
+            #  与父进程共享 resource_tracker，而独立的进程需要取消登记，
+            #  否则它退出时 resource_tracker 会删除共享内存。
+            if multiprocessing.parent_process() is None:
+                resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._owner = create
+
+        # 头部和数据区的视图
+        self._header = np.ndarray((slots, HEADER_FIELDS), dtype=np.int64,
+                                  buffer=self._shm.buf[:header_size])
+        self._data = np.ndarray((slots, self.slot_size), dtype=np.uint8,
+                                buffer=self._shm.buf[header_size:])
+        self._data_offset = header_size
+        if create:
+            self._header[:] = 0
+
+        # 本进程中每个槽仍然存在的视图数量
+        self._views = [0] * slots
+        self._views_lock = Lock()
+        self._on_release = on_release
+        self._closing = False
+
+    @property
+    def name(self) -> str:
+        """ 共享内存的名称，其他进程用它来连接。 """
+        return self._shm.name
+
+    def views(self, slot: int | None = None) -> int:
+        """ 本进程中仍然存在的视图数量（某个槽，或 None 表示所有槽）。 """
+        with self._views_lock:
+            return sum(self._views) if slot is None else self._views[slot]
+
+    def invalidate(self, slot: int) -> None:
+        """
+        将槽标记为正在写入（序号 -1），之后读取方的 read() 不会认为它完整。
+        写入方在检查槽是否被固定之前调用，见 VideoProcess。
+        """
+        self._header[slot, 0] = -1
+
+    def write(self, slot: int, frame: np.ndarray, seq: int) -> None:
+        """
+        将帧复制到槽中。
+
+        Args:
+            slot (int): 槽的索引。
+            frame (np.ndarray): uint8 帧，(高, 宽) 或 (高, 宽, 通道)。
+            seq (int): 帧的序号。
+        """
+        if frame.size > self.slot_size:
+            raise ValueError(f"帧 {frame.shape} 大于槽的最大尺寸 {self.max_shape}")
+
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+
+        # 写入期间序号为 -1，不通过队列分配槽的读取方可以据此发现不完整的帧
+        self._header[slot, 0] = -1
+        self._data[slot, :frame.size].reshape(frame.shape)[...] = frame
+        self._header[slot] = (seq, height, width, channels)
+
+    def read(self, slot: int) -> tuple[int, np.ndarray]:
+        """
+        读取槽中的帧（共享内存视图，不复制）。
+        在写入方重新使用该槽之前，视图中的数据有效。
+        视图（以及从它得到的切片）被释放时，该槽的视图计数减一。
+
+        Args:
+            slot (int): 槽的索引。
+
+        Return:
+            (seq, frame)
+        """
+        if self._closing:
+            raise ValueError("帧环已经关闭")
+        seq, height, width, channels = (int(v) for v in self._header[slot])
+        size = height * width * channels
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        # 每个视图直接包装一段共享内存（而不是 self._data 的切片），
+        #  这样从它得到的切片都以它为 base，它在所有切片释放之后才被回收
+        offset = self._data_offset + slot * self.slot_size
+        view = np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf[offset:offset + size])
+
+        with self._views_lock:
+            self._views[slot] += 1
+        # 退出解释器时不需要调用（共享内存由进程退出释放）
+        weakref.finalize(view, self._release, slot).atexit = False
+        return seq, view
+
+    def _release(self, slot: int) -> None:
+        """ 一个视图被释放（垃圾回收时调用）。 """
+        with self._views_lock:
+            self._views[slot] -= 1
+            last = self._views[slot] == 0
+            close = self._closing and sum(self._views) == 0
+        if last and self._on_release is not None and not self._closing:
+            self._on_release(slot)
+        if close:
+            self._close()
+
+    def close(self) -> bool:
+        """
+        关闭共享内存。创建者还会立即释放（unlink）它的名称。
+        如果本进程中还有 read() 返回的视图，关闭推迟到最后一个视图被释放时，
+        在此之前视图仍然有效（但不会再被写入方更新）。
+
+        Return:
+            True 表示已经关闭，False 表示推迟。
+        """
+        with self._views_lock:
+            if self._closing:
+                return self._data is None
+            self._closing = True
+            deferred = sum(self._views) > 0
+        if self._owner:
+            self._shm.unlink()
+        if deferred:
+            return False
+        self._close()
+        return True
+
+    def _close(self) -> None:
+        # 先释放头部和数据区的视图，否则共享内存无法关闭
+        self._header = None
+        self._data = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # 在最后一个视图的回收回调中，它可能还持有缓冲区：
+            #  交给 mmap 对象在它释放之后解除映射
+            self._shm._mmap = None
+            self._shm.close()
@@ -0,0 +1,418 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock
+import urllib.request
+import argparse
+import sqlite3
+import math
+import time
+import os
+
+"""
+离线地图瓦片缓存 - 本地的 MBTiles (SQLite) 瓦片库和本地瓦片服务器。
+
+    TileCache  - MBTiles 格式的瓦片库，超过容量时按照最近最少使用 (LRU) 删除。
+    TileServer - 本地 HTTP 服务器，提供缓存的瓦片和 Leaflet 静态文件，
+                 缓存中没有时（如果有网络）从上游下载并保存。
+    seed()     - 预先下载一个区域、一组缩放级别内的所有瓦片。
+
+Leaflet 静态文件不随仓库提供：第一次使用时（有网络）从 unpkg 下载到 leaflet/ 目录，
+需要在没有网络的电脑上使用地图时，先在有网络时运行一次 assets 命令。
+
+命令行：
+    python TileCache.py seed --bbox 32.10 34.78 32.16 34.84 --zoom 12 18
+    python TileCache.py assets
+"""
+
+# 默认的上游瓦片地址和 Leaflet 静态文件地址
+OSM_TILE_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+LEAFLET_URL = "https://unpkg.com/leaflet@1.7.1/dist/"
+LEAFLET_FILES = ["leaflet.js", "leaflet.css",
+                 "images/marker-icon.png", "images/marker-icon-2x.png",
+                 "images/marker-shadow.png", "images/layers.png", "images/layers-2x.png"]
+
+# 默认的缓存位置（与本文件同目录）
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tiles.mbtiles")
+DEFAULT_ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "leaflet")
+
+# OSM 的使用政策要求提供可识别的 User-Agent
+USER_AGENT = "OpenDJI-TileCache/1.0"
+
+
+class TileCache:
+    """
+    MBTiles 瓦片库。
+
+    tiles 表遵循 MBTiles 规范（TMS 的行号，y 轴向上），
+    因此文件也可以被其他 MBTiles 工具读取；
+    额外的 tile_access 表记录最近访问时间，用于 LRU 删除。
+    访问时间先记录在内存中，批量写入数据库。
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE, max_tiles: int = 200000):
+        """
+        打开（或创建）瓦片库。
+
+        Args:
+            path (str): MBTiles 文件路径。
+            max_tiles (int): 最多保存的瓦片数量，超过后删除最久未使用的瓦片。
+        """
+        self.path = path
+        self.max_tiles = max_tiles
+
+        # 所有线程共用一个连接，由锁保护
+        self._lock = Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS tiles ("
+                         "zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB, "
+                         "PRIMARY KEY (zoom_level, tile_column, tile_row))")
+        self._db.execute("CREATE TABLE IF NOT EXISTS tile_access ("
+                         "zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, last_access REAL, "
+                         "PRIMARY KEY (zoom_level, tile_column, tile_row))")
+        self._db.execute("CREATE INDEX IF NOT EXISTS tile_access_time ON tile_access (last_access)")
+        self._db.executemany("INSERT OR IGNORE INTO metadata VALUES (?, ?)",
+                             [("name", "OpenDJI tile cache"), ("format", "png")])
+        self._db.commit()
+
+        self._count = self._db.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+        self._accessed = {}
+
+    @staticmethod
+    def _key(z: int, x: int, y: int) -> tuple[int, int, int]:
+        """ XYZ (y 轴向下) 转换为 MBTiles 的 TMS 行号 (y 轴向上)。 """
+        return (z, x, (1 << z) - 1 - y)
+
+    def get(self, z: int, x: int, y: int) -> bytes | None:
+        """
+        读取瓦片。
+
+        Args:
+            z (int): 缩放级别。
+            x (int): 列号。
+            y (int): 行号（XYZ / OSM 的编号方式）。
+
+        Return:
+            瓦片数据，缓存中没有时为 None。
+        """
+        key = self._key(z, x, y)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                key).fetchone()
+            if row is None:
+                return None
+
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= 256:
+                self._flushAccess()
+            return row[0]
+
+    def contains(self, z: int, x: int, y: int) -> bool:
+        """ 瓦片是否已经在缓存中（不更新访问时间）。 """
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                self._key(z, x, y)).fetchone() is not None
+
+    def put(self, z: int, x: int, y: int, data: bytes) -> None:
+        """
+        保存瓦片，必要时删除最久未使用的瓦片。
+
+        Args:
+            z (int): 缩放级别。
+            x (int): 列号。
+            y (int): 行号（XYZ / OSM 的编号方式）。
+            data (bytes): 瓦片数据。
+        """
+        key = self._key(z, x, y)
+        with self._lock:
+            exists = self._db.execute(
+                "SELECT 1 FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                key).fetchone() is not None
+            self._db.execute("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", (*key, data))
+            self._db.execute("INSERT OR REPLACE INTO tile_access VALUES (?, ?, ?, ?)", (*key, time.time()))
+            if not exists:
+                self._count += 1
+
+            if self._count > self.max_tiles:
+                self._evict()
+            self._db.commit()
+
+    def _flushAccess(self) -> None:
+        """ 将内存中的访问时间写入数据库（调用者持有锁）。 """
+        self._db.executemany("UPDATE tile_access SET last_access=? "
+                             "WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                             [(t, *key) for key, t in self._accessed.items()])
+        self._db.commit()
+        self._accessed = {}
+
+    def _evict(self) -> None:
+        """ 删除最久未使用的瓦片，直到低于容量的 90%（调用者持有锁）。 """
+        self._flushAccess()
+        excess = self._count - int(self.max_tiles * 0.9)
+        victims = self._db.execute(
+            "SELECT zoom_level, tile_column, tile_row FROM tile_access "
+            "ORDER BY last_access LIMIT ?", (excess,)).fetchall()
+        self._db.executemany("DELETE FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?", victims)
+        self._db.executemany("DELETE FROM tile_access WHERE zoom_level=? AND tile_column=? AND tile_row=?", victims)
+        self._count = self._db.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+
+    def close(self) -> None:
+        """ 保存访问时间并关闭数据库。 """
+        with self._lock:
+            self._flushAccess()
+            self._db.close()
+
+
+def fetchUrl(url: str, timeout: float = 10.0) -> bytes | None:
+    """
+    下载 URL 的内容。
+
+    Return:
+        内容，失败时（例如没有网络）为 None。
+    """
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.read()
+    except Exception:
+        return None
+
+
+class TileServer:
+    """
+    本地瓦片服务器，在后台线程中运行。
+
+        /tiles/{z}/{x}/{y}.png - 瓦片（缓存优先，必要时从上游下载）
+        /assets/{path}         - Leaflet 静态文件（本地优先，必要时从 unpkg 下载）
+    """
+
+    CONTENT_TYPES = {".js": "application/javascript", ".css": "text/css", ".png": "image/png"}
+
+    def __init__(self, cache: TileCache, port: int = 0, assets_dir: str = DEFAULT_ASSETS,
+                 upstream: str | None = OSM_TILE_URL):
+        """
+        启动服务器。
+
+        Args:
+            cache (TileCache): 瓦片库。
+            port (int): 监听端口，0 表示自动选择。
+            assets_dir (str): Leaflet 静态文件目录。
+            upstream (str | None): 上游瓦片地址模板，None 表示完全离线。
+        """
+        self.cache = cache
+        self.assets_dir = assets_dir
+        self.upstream = upstream
+
+        missing = missingAssets(assets_dir)
+        if missing:
+            print(f"缺少 Leaflet 静态文件 {missing}，将从 unpkg 下载；"
+                  f"没有网络时地图无法加载，请先运行 'python TileCache.py assets'")
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+
+        self._thread = Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        """ 服务器的基础地址，例如 'http://127.0.0.1:8000'。 """
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def tileUrl(self) -> str:
+        """ Leaflet tileLayer 使用的地址模板。 """
+        return self.url + "/tiles/{z}/{x}/{y}.png"
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> None:
+        path = request.path.split("?", 1)[0]
+        data = None
+        content_type = "application/octet-stream"
+
+        if path.startswith("/tiles/"):
+            data = self._tile(path)
+            content_type = "image/png"
+
+        elif path.startswith("/assets/"):
+            name = os.path.normpath(path[len("/assets/"):]).replace("\\", "/")
+            if name in LEAFLET_FILES:
+                data = self._asset(name)
+                content_type = self.CONTENT_TYPES.get(os.path.splitext(name)[1], content_type)
+
+        if data is None:
+            request.send_error(404)
+            return
+
+        request.send_response(200)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(data)))
+        request.send_header("Cache-Control", "max-age=86400")
+        request.end_headers()
+        request.wfile.write(data)
+
+    def _tile(self, path: str) -> bytes | None:
+        try:
+            z, x, y = path[len("/tiles/"):].rsplit(".", 1)[0].split("/")
+            z, x, y = int(z), int(x), int(y)
+        except ValueError:
+            return None
+
+        data = self.cache.get(z, x, y)
+        if data is None and self.upstream:
+            data = fetchUrl(self.upstream.format(z=z, x=x, y=y))
+            if data is not None:
+                self.cache.put(z, x, y, data)
+        return data
+
+    def _asset(self, name: str) -> bytes | None:
+        local = os.path.join(self.assets_dir, name)
+        if os.path.exists(local):
+            with open(local, "rb") as file:
+                return file.read()
+
+        data = fetchUrl(LEAFLET_URL + name)
+        if data is None:
+            print(f"无法下载 Leaflet 静态文件 {name}，请在有网络时运行 'python TileCache.py assets'")
+            return None
+        os.makedirs(os.path.dirname(local), exist_ok=True)
+        with open(local, "wb") as file:
+            file.write(data)
+        return data
+
+    def stop(self) -> None:
+        """ 停止服务器。 """
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def tileRange(bbox: tuple, zoom: int) -> tuple[int, int, int, int]:
+    """
+    计算区域在某个缩放级别下覆盖的瓦片范围。
+
+    Args:
+        bbox (tuple): (最小纬度, 最小经度, 最大纬度, 最大经度)。
+        zoom (int): 缩放级别。
+
+    Return:
+        (x_min, y_min, x_max, y_max)，包含两端。
+    """
+    def tile(latitude, longitude):
+        n = 1 << zoom
+        x = int((longitude + 180.0) / 360.0 * n)
+        latitude = math.radians(latitude)
+        y = int((1.0 - math.asinh(math.tan(latitude)) / math.pi) / 2.0 * n)
+        return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+    min_lat, min_lon, max_lat, max_lon = bbox
+    x1, y1 = tile(max_lat, min_lon)
+    x2, y2 = tile(min_lat, max_lon)
+    return x1, y1, x2, y2
+
+
+def seed(cache: TileCache, bbox: tuple, min_zoom: int, max_zoom: int,
+         upstream: str = OSM_TILE_URL, workers: int = 4) -> tuple[int, int]:
+    """
+    预先下载区域内的所有瓦片（已经缓存的瓦片跳过）。
+
+    Args:
+        cache (TileCache): 瓦片库。
+        bbox (tuple): (最小纬度, 最小经度, 最大纬度, 最大经度)。
+        min_zoom (int): 最小缩放级别。
+        max_zoom (int): 最大缩放级别。
+        upstream (str): 上游瓦片地址模板。
+        workers (int): 并行下载的线程数（请遵守瓦片服务器的使用政策）。
+
+    Return:
+        (下载成功的数量, 失败的数量)
+    """
+    tiles = []
+    for zoom in range(min_zoom, max_zoom + 1):
+        x1, y1, x2, y2 = tileRange(bbox, zoom)
+        tiles += [(zoom, x, y) for x in range(x1, x2 + 1) for y in range(y1, y2 + 1)
+                  if not cache.contains(zoom, x, y)]
+
+    if len(tiles) > cache.max_tiles:
+        raise ValueError(f"区域需要 {len(tiles)} 个瓦片，超过缓存容量 {cache.max_tiles}")
+
+    def download(tile):
+        z, x, y = tile
+        data = fetchUrl(upstream.format(z=z, x=x, y=y))
+        if data is not None:
+            cache.put(z, x, y, data)
+        return data is not None
+
+    with ThreadPoolExecutor(workers) as executor:
+        results = list(executor.map(download, tiles))
+
+    done = sum(results)
+    return done, len(results) - done
+
+
+def missingAssets(assets_dir: str = DEFAULT_ASSETS) -> list[str]:
+    """ 本地还没有的 Leaflet 静态文件。 """
+    return [name for name in LEAFLET_FILES if not os.path.exists(os.path.join(assets_dir, name))]
+
+
+def downloadAssets(assets_dir: str = DEFAULT_ASSETS) -> bool:
+    """
+    下载 Leaflet 静态文件，之后地图可以完全离线使用。
+
+    Return:
+        True 表示所有文件都已下载。
+    """
+    ok = True
+    for name in LEAFLET_FILES:
+        data = fetchUrl(LEAFLET_URL + name)
+        if data is None:
+            print(f"下载失败: {name}")
+            ok = False
+            continue
+        local = os.path.join(assets_dir, name)
+        os.makedirs(os.path.dirname(local), exist_ok=True)
+        with open(local, "wb") as file:
+            file.write(data)
+    return ok
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="离线地图瓦片缓存工具")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="预先下载区域内的瓦片")
+    seed_parser.add_argument("--bbox", type=float, nargs=4, required=True,
+                             metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"))
+    seed_parser.add_argument("--zoom", type=int, nargs=2, required=True, metavar=("MIN", "MAX"))
+    seed_parser.add_argument("--cache", default=DEFAULT_CACHE)
+    seed_parser.add_argument("--workers", type=int, default=4)
+
+    assets_parser = commands.add_parser("assets", help="下载 Leaflet 静态文件")
+    assets_parser.add_argument("--dir", default=DEFAULT_ASSETS)
+
+    arguments = parser.parse_args()
+
+    if arguments.command == "seed":
+        tile_cache = TileCache(arguments.cache)
+        done, failed = seed(tile_cache, tuple(arguments.bbox), *arguments.zoom,
+                            workers=arguments.workers)
+        tile_cache.close()
+        print(f"下载了 {done} 个瓦片，失败 {failed} 个")
+
+    elif arguments.command == "assets":
+        if downloadAssets(arguments.dir):
+            print(f"Leaflet 静态文件已保存到 {arguments.dir}")
@@ -0,0 +1,274 @@
+from OpenDJI import OpenDJI
+from OpenDJI import BatchListener
+
+from threading import Lock
+import json
+
+import numpy as np
+
+"""
+时间同步 - 将视频帧与同一时刻的遥测数据对应起来。
+
+帧 (OpenDJI.frameTime) 和 listen() 的数据 (listenBatch 的时间戳) 使用同一个
+单调时钟 (time.monotonic)。每个遥测流保存一个固定容量的历史记录，
+查询时按时间插值（二分查找，O(log n)），一次可以查询多个时间点。
+
+两端的延迟不同：视频经过编码和传输，通常比遥测晚到。
+setLatency() 设置每个流（包括 "video"）从事件发生到到达的延迟，
+对齐时使用事件发生的时间。
+
+使用方法：
+    sync = TimeSync(drone)
+    seq, frame = drone.waitFrame(seq)
+    state = sync.atFrame(seq)     # {"position": {"latitude": ...}, "attitude": {...}, ...}
+"""
+
+
+class History:
+    """
+    一个遥测流的历史记录：时间和数值列，按时间排序，容量固定。
+
+    数据保存在两倍容量的数组中，满了之后把最新的一半移到开头，
+    因此有效数据总是连续的（可以直接二分查找），追加的均摊复杂度为 O(1)。
+    """
+
+    def __init__(self, fields: list[str], capacity: int = 2048, angles: tuple = ()):
+        """
+        Args:
+            fields (list[str]): 数值列的名称。
+            capacity (int): 最多保存的样本数。
+            angles (tuple): 角度列（度），插值时处理 -180/180 的跳变。
+        """
+        self.fields = list(fields)
+        self.capacity = capacity
+        self._times = np.empty(2 * capacity, dtype=np.float64)
+        self._values = np.empty((2 * capacity, len(fields)), dtype=np.float64)
+        self._start = 0
+        self._end = 0
+        self._angles = [self.fields.index(name) for name in angles]
+        self._lock = Lock()
+
+    def __len__(self):
+        return self._end - self._start
+
+    def append(self, timestamp: float, values) -> None:
+        """
+        追加一个样本。时间早于最后一个样本的样本被忽略。
+
+        Args:
+            timestamp (float): 样本时间 (time.monotonic)。
+            values: 与 fields 对应的数值。
+        """
+        values = np.asarray(values, dtype=np.float64)
+        with self._lock:
+            if self._end > self._start:
+                if timestamp < self._times[self._end - 1]:
+                    return
+                # 角度展开：与上一个样本的差不超过 180 度，插值时不会绕远路
+                previous = self._values[self._end - 1]
+                for column in self._angles:
+                    values[column] += 360.0 * np.round((previous[column] - values[column]) / 360.0)
+
+            if self._end == len(self._times):
+                # 把最新的 capacity - 1 个样本移到开头
+                keep = self.capacity - 1
+                self._times[:keep] = self._times[self._end - keep:self._end]
+                self._values[:keep] = self._values[self._end - keep:self._end]
+                self._start, self._end = 0, keep
+            elif self._end - self._start >= self.capacity:
+                self._start += 1
+
+            self._times[self._end] = timestamp
+            self._values[self._end] = values
+            self._end += 1
+
+    def interpolate(self, times, max_hold: float = 0.5) -> np.ndarray:
+        """
+        在多个时间点上线性插值。
+
+        Args:
+            times: 查询的时间点（标量或数组）。
+            max_hold (float): 查询时间晚于最后一个样本不超过此值时使用最后的值，
+                否则（以及早于第一个样本时）结果为 NaN。
+
+        Return:
+            (N, len(fields)) 数组，角度列在 (-180, 180] 范围内。
+        """
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        result = np.full((len(times), len(self.fields)), np.nan)
+
+        with self._lock:
+            sample_times = self._times[self._start:self._end]
+            if len(sample_times) == 0:
+                return result
+
+            # 二分查找，线性插值
+            index = np.clip(np.searchsorted(sample_times, times), 1, max(1, len(sample_times) - 1))
+            if len(sample_times) == 1:
+                weight = np.zeros(len(times))
+                before = after = self._values[self._start:self._end][[0] * len(times)]
+            else:
+                t0 = sample_times[index - 1]
+                t1 = sample_times[index]
+                weight = np.clip((times - t0) / np.maximum(t1 - t0, 1e-9), 0.0, 1.0)
+                before = self._values[self._start + index - 1]
+                after = self._values[self._start + index]
+            result = before + (after - before) * weight[:, None]
+
+            valid = (times >= sample_times[0]) & (times <= sample_times[-1] + max_hold)
+
+        result[~valid] = np.nan
+        for column in self._angles:
+            result[:, column] = 180.0 - np.mod(180.0 - result[:, column], 360.0)
+        return result
+
+
+def _parseLocation(value: str) -> list[float]:
+    location = json.loads(value)
+    return [float(location["latitude"]), float(location["longitude"]), float(location["altitude"])]
+
+
+def _parseAttitude(value: str) -> list[float]:
+    attitude = json.loads(value)
+    return [float(attitude["pitch"]), float(attitude["roll"]), float(attitude["yaw"])]
+
+
+class _SyncListener(BatchListener):
+    """ 将 listenBatch 的更新写入各个流的历史记录 """
+
+    def __init__(self, sync):
+        self._sync = sync
+
+    def onBatch(self, keys, values, timestamps):
+        self._sync._onBatch(keys, values, timestamps)
+
+
+class TimeSync:
+    """
+    保存遥测的历史记录，并按帧的时间插值。
+    """
+
+    # 同步的遥测流：名称 -> (模块, 键, 解析函数, 数值列, 角度列)
+    STREAMS = {
+        "position": (OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftLocation3D", _parseLocation,
+                     ("latitude", "longitude", "altitude"), ()),
+        "attitude": (OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftAttitude", _parseAttitude,
+                     ("pitch", "roll", "yaw"), ("roll", "yaw")),
+        "gimbal": (OpenDJI.MODULE_GIMBAL, "GimbalAttitude", _parseAttitude,
+                   ("pitch", "roll", "yaw"), ("roll", "yaw")),
+    }
+
+    def __init__(self, drone: OpenDJI, capacity: int = 2048, max_hold: float = 0.5,
+                 streams: dict | None = None):
+        """
+        订阅遥测流（listenBatch），开始记录历史。
+
+        Args:
+            drone (OpenDJI): 无人机（需要查询通道，atFrame 还需要视频通道）。
+            capacity (int): 每个流最多保存的样本数（约 capacity / 频率 秒）。
+            max_hold (float): 查询时间晚于最后一个样本多久之内仍然使用最后的值（秒）。
+            streams (dict | None): 要同步的流，格式与 STREAMS 相同，None 使用 STREAMS。
+        """
+        self._drone = drone
+        self.max_hold = max_hold
+        self._streams = dict(self.STREAMS if streams is None else streams)
+        self._latency = {"video": 0.0}
+
+        self._histories = {}
+        self._by_key = {}
+        for name, (module, key, parser, fields, angles) in self._streams.items():
+            self._histories[name] = History(fields, capacity, angles)
+            self._by_key[f"{module} {key}"] = (name, parser)
+            self._latency[name] = 0.0
+
+        drone.listenBatch([(module, key) for module, key, *_ in self._streams.values()],
+                          _SyncListener(self))
+
+    def stop(self) -> None:
+        """ 取消遥测订阅。 """
+        for module, key, *_ in self._streams.values():
+            self._drone.unlisten(module, key)
+
+    ###### 延迟校准 ######
+
+    def setLatency(self, name: str, seconds: float) -> None:
+        """
+        设置一个流从事件发生到到达 PC 的延迟。
+
+        Args:
+            name (str): 流的名称（STREAMS 中的名称，或 "video"）。
+            seconds (float): 延迟（秒）。
+        """
+        if name not in self._latency:
+            raise KeyError(f"未知的流: {name}")
+        self._latency[name] = float(seconds)
+
+    def latency(self, name: str) -> float:
+        """ 流的延迟（秒）。 """
+        return self._latency[name]
+
+    ###### 记录 ######
+
+    def _onBatch(self, keys: list[str], values: list[str], timestamps: list[float]) -> None:
+        for unique_key, value, timestamp in zip(keys, values, timestamps):
+            stream = self._by_key.get(unique_key)
+            if stream is None:
+                continue
+            name, parser = stream
+            try:
+                sample = parser(value)
+            except (ValueError, TypeError, KeyError):
+                continue
+            self._histories[name].append(timestamp - self._latency[name], sample)
+
+    def history(self, name: str) -> History:
+        """ 流的历史记录。 """
+        return self._histories[name]
+
+    ###### 查询 ######
+
+    def sample(self, times, names: list[str] | None = None) -> dict:
+        """
+        在多个时间点（事件发生的时间，time.monotonic）上插值所有的流。
+
+        Args:
+            times: 时间点（标量或数组）。
+            names (list[str] | None): 要查询的流，None 表示全部。
+
+        Return:
+            流的名称 -> (N, 列数) 数组，没有数据的位置为 NaN。
+        """
+        names = self._histories if names is None else names
+        return {name: self._histories[name].interpolate(times, self.max_hold) for name in names}
+
+    def frameTimes(self, seqs) -> np.ndarray:
+        """
+        帧的发生时间（到达时间减去视频延迟），帧太旧时为 NaN。
+
+        Args:
+            seqs: 帧序号（来自 waitFrame）。
+        """
+        arrivals = [self._drone.frameTime(int(seq)) for seq in np.atleast_1d(seqs)]
+        return np.array([np.nan if t is None else t - self._latency["video"] for t in arrivals])
+
+    def atFrames(self, seqs, names: list[str] | None = None) -> dict:
+        """
+        多个帧时刻的遥测（向量化）。
+
+        Return:
+            流的名称 -> (帧数, 列数) 数组。
+        """
+        return self.sample(self.frameTimes(seqs), names)
+
+    def atFrame(self, seq: int, names: list[str] | None = None) -> dict | None:
+        """
+        一帧时刻的遥测。
+
+        Return:
+            流的名称 -> {列名 -> 数值}，帧太旧时返回 None。
+        """
+        times = self.frameTimes(seq)
+        if np.isnan(times[0]):
+            return None
+        return {name: dict(zip(self._histories[name].fields, values[0].tolist()))
+                for name, values in self.sample(times, names).items()}
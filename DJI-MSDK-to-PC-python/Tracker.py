@@ -0,0 +1,385 @@
+from OpenDJI import OpenDJI
+from OpenDJI import EventListener
+from Inference import Detections
+
+from threading import Thread
+import time
+
+import cv2
+import numpy as np
+
+"""
+检测驱动的跟踪 - 每 N 帧（或者跟踪置信度下降时）才运行一次检测器，
+中间的帧使用光流 (Lucas-Kanade) 或匀速模型传播检测框。
+
+每个目标都有一个持久的跟踪 ID，检测结果通过 IoU 与已有的跟踪关联。
+每一帧都会输出检测框，而检测器的调用次数减少为 1/N 左右。
+"""
+
+
+def iouMatrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    计算两组检测框之间的 IoU 矩阵。
+
+    Args:
+        boxes_a (np.ndarray): (N, 4) 的 x1, y1, x2, y2。
+        boxes_b (np.ndarray): (M, 4) 的 x1, y1, x2, y2。
+
+    Return:
+        (N, M) 的 IoU 矩阵。
+    """
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+
+    return intersection / np.maximum(union, 1e-6)
+
+
+class Tracker:
+    """
+    多目标跟踪器 - 保存所有跟踪的状态（数组形式），
+    在检测帧上关联检测结果，在其他帧上传播检测框。
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_misses: int = 2,
+                 confidence_decay: float = 0.95, velocity_smoothing: float = 0.5):
+        """
+        初始化跟踪器。
+
+        Args:
+            iou_threshold (float): 检测与跟踪关联所需的最小 IoU。
+            max_misses (int): 连续多少次检测没有匹配后删除跟踪。
+            confidence_decay (float): 每传播一帧，跟踪置信度乘以的系数。
+            velocity_smoothing (float): 速度更新的平滑系数 (0 - 1)，越大越信任新的测量。
+        """
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.confidence_decay = confidence_decay
+        self.velocity_smoothing = velocity_smoothing
+
+        # 跟踪状态，每行一个跟踪
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.anchors = np.zeros((0, 4), dtype=np.float32)  # 上次检测时的检测框
+        self.velocities = np.zeros((0, 4), dtype=np.float32)  # 每帧的位移
+        self.scores = np.zeros(0, dtype=np.float32)
+        self.confidences = np.zeros(0, dtype=np.float32)
+        self.classes = np.zeros(0, dtype=np.int32)
+        self.misses = np.zeros(0, dtype=np.int32)
+
+        self._next_id = 1
+        # 上次检测以来传播的帧数
+        self._frames_since_update = 0
+
+        # 光流使用的上一帧（缩小后的灰度图）
+        self._previous_gray = None
+        self._gray_scale = 1.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def minConfidence(self) -> float:
+        """ 所有跟踪中最低的置信度，没有跟踪时为 1.0。 """
+        return float(self.confidences.min()) if len(self.confidences) else 1.0
+
+    def minConfidenceRatio(self) -> float:
+        """
+        所有跟踪中，跟踪置信度与上次检测时分数之比的最小值，没有跟踪时为 1.0。
+        与检测器的分数范围无关：只反映传播以来的衰减和光流失败。
+        """
+        if len(self.confidences) == 0:
+            return 1.0
+        return float((self.confidences / np.maximum(self.scores, 1e-6)).min())
+
+    ###### 检测帧 ######
+
+    def update(self, boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray) -> None:
+        """
+        用新的检测结果更新跟踪：按照 IoU 贪心匹配（只匹配相同类别），
+        匹配上的跟踪更新位置和速度，没有匹配的检测创建新跟踪，
+        连续多次没有匹配的跟踪被删除。
+
+        Args:
+            boxes (np.ndarray): (N, 4) 检测框。
+            scores (np.ndarray): (N,) 置信度。
+            classes (np.ndarray): (N,) 类别。
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        scores = np.asarray(scores, dtype=np.float32)
+        classes = np.asarray(classes, dtype=np.int32)
+
+        matched_tracks = np.full(len(boxes), -1, dtype=np.int64)
+
+        if len(self.ids) and len(boxes):
+            iou = iouMatrix(self.boxes, boxes)
+            iou[self.classes[:, None] != classes[None, :]] = 0.0
+
+            # 贪心匹配：从最大的 IoU 开始
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                track, detection = np.unravel_index(flat, iou.shape)
+                if iou[track, detection] < self.iou_threshold:
+                    break
+                if matched_tracks[detection] >= 0 or track in matched_tracks:
+                    continue
+                matched_tracks[detection] = track
+
+        # 更新匹配的跟踪
+        is_matched = np.zeros(len(self.ids), dtype=bool)
+        for detection, track in enumerate(matched_tracks):
+            if track < 0:
+                continue
+            is_matched[track] = True
+
+            # 用两次检测之间的位移估计速度（每帧）：检测帧本身也是一帧，
+            #  两次检测之间的帧数是传播的帧数加一
+            frames = self._frames_since_update + 1
+            measured = (boxes[detection] - self.anchors[track]) / frames
+            a = self.velocity_smoothing
+            self.velocities[track] = a * measured + (1 - a) * self.velocities[track]
+
+            self.boxes[track] = boxes[detection]
+            self.anchors[track] = boxes[detection]
+            self.scores[track] = scores[detection]
+            self.confidences[track] = scores[detection]
+            self.misses[track] = 0
+
+        # 没有匹配的跟踪，过多次后删除
+        self.misses[~is_matched] += 1
+        keep = self.misses <= self.max_misses
+        self._select(keep)
+
+        # 没有匹配的检测创建新跟踪
+        new = matched_tracks < 0
+        count = int(new.sum())
+        if count:
+            self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + count)])
+            self._next_id += count
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.anchors = np.concatenate([self.anchors, boxes[new]])
+            self.velocities = np.concatenate([self.velocities, np.zeros((count, 4), np.float32)])
+            self.scores = np.concatenate([self.scores, scores[new]])
+            self.confidences = np.concatenate([self.confidences, scores[new]])
+            self.classes = np.concatenate([self.classes, classes[new]])
+            self.misses = np.concatenate([self.misses, np.zeros(count, np.int32)])
+
+        self._frames_since_update = 0
+
+    def _select(self, keep: np.ndarray) -> None:
+        """ 只保留 keep 为 True 的跟踪。 """
+        self.ids = self.ids[keep]
+        self.boxes = self.boxes[keep]
+        self.anchors = self.anchors[keep]
+        self.velocities = self.velocities[keep]
+        self.scores = self.scores[keep]
+        self.confidences = self.confidences[keep]
+        self.classes = self.classes[keep]
+        self.misses = self.misses[keep]
+
+    ###### 传播帧 ######
+
+    def setFrame(self, frame: np.ndarray, width: int = 640) -> None:
+        """
+        保存用于光流的帧（缩小并转换为灰度）。
+        在检测帧和传播帧上都要调用，使光流总是与上一帧比较。
+
+        Args:
+            frame (np.ndarray): BGR 帧。
+            width (int): 光流计算使用的图像宽度。
+        """
+        self._gray_scale = min(1.0, width / frame.shape[1])
+        small = cv2.resize(frame, None, fx=self._gray_scale, fy=self._gray_scale,
+                           interpolation=cv2.INTER_AREA)
+        self._previous_gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def predict(self, frame: np.ndarray | None = None) -> None:
+        """
+        将所有跟踪传播到下一帧。如果提供了帧，使用光流（每个跟踪内
+        3x3 个点的中值位移）；光流失败的跟踪和没有帧时使用匀速模型。
+
+        Args:
+            frame (np.ndarray | None): 新的 BGR 帧。
+        """
+        self._frames_since_update += 1
+        self.confidences *= self.confidence_decay
+
+        if len(self.ids) == 0:
+            if frame is not None:
+                self.setFrame(frame)
+            return
+
+        # 默认使用匀速模型
+        shifts = self.velocities.copy()
+
+        if frame is not None and self._previous_gray is not None:
+            previous_gray = self._previous_gray
+            self.setFrame(frame)
+
+            # 在每个跟踪的内部 50% 区域取 3x3 个点
+            grid = np.array([0.25, 0.5, 0.75], dtype=np.float32)
+            gx, gy = np.meshgrid(grid, grid)
+            gx = gx.ravel()
+            gy = gy.ravel()
+            b = self.boxes * self._gray_scale
+            xs = b[:, None, 0] + gx[None, :] * (b[:, None, 2] - b[:, None, 0])
+            ys = b[:, None, 1] + gy[None, :] * (b[:, None, 3] - b[:, None, 1])
+            points = np.stack([xs, ys], axis=-1).reshape(-1, 1, 2).astype(np.float32)
+
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(
+                previous_gray, self._previous_gray, points, None,
+                winSize=(15, 15), maxLevel=2)
+
+            delta = (moved - points).reshape(len(self.ids), -1, 2) / self._gray_scale
+            valid = status.reshape(len(self.ids), -1).astype(bool)
+            delta[~valid] = np.nan
+
+            # 至少一半的点成功才使用光流（取成功点的中值位移），
+            #  否则继续使用匀速模型，并将该跟踪的置信度减半
+            good = valid.sum(axis=1) >= valid.shape[1] // 2
+            if good.any():
+                median = np.nanmedian(delta[good], axis=1)
+                shifts[good] = np.concatenate([median, median], axis=1)
+            self.confidences[~good] *= 0.5
+
+        elif frame is not None:
+            self.setFrame(frame)
+
+        self.boxes += shifts
+
+
+class TrackingStage:
+    """
+    跟踪阶段 - 在后台线程中处理 OpenDJI 视频源的每个最新帧：
+    每 detect_interval 帧运行一次检测器，或者当某个跟踪的置信度
+    相对于它上次检测时的分数下降到 min_confidence_ratio 以下时
+    （例如光流失败）提前运行；其他帧用 Tracker 传播检测框。
+
+    与 InferenceStage 具有相同的结果接口 (latest / listener)，
+    发布的 Detections 带有跟踪 ID。
+    """
+
+    def __init__(self, detector, source: OpenDJI, detect_interval: int = 5,
+                 min_confidence_ratio: float = 0.5, tracker: Tracker | None = None,
+                 listener: EventListener | None = None):
+        """
+        初始化跟踪阶段（不会立即启动，调用 start()）。
+
+        Args:
+            detector: 可调用对象，接收帧列表，返回 (boxes, scores, classes) 列表。
+            source (OpenDJI): 视频源。
+            detect_interval (int): 每隔多少帧运行一次检测器。
+            min_confidence_ratio (float): 跟踪置信度与上次检测时分数之比低于此值时
+                立即运行检测器。默认值下一次光流失败（置信度减半）就会触发，
+                只有衰减时约 13 帧后才触发。
+            tracker (Tracker | None): 使用的跟踪器，None 使用默认参数。
+            listener (EventListener | None): 每帧调用一次 listener.onValue(detections)。
+        """
+        self._detector = detector
+        self._source = source
+        self.detect_interval = detect_interval
+        self.min_confidence_ratio = min_confidence_ratio
+        self.tracker = tracker or Tracker()
+        self._listener = listener
+
+        self._latest = None
+
+        # 统计
+        self.frames = 0
+        self.detector_calls = 0
+        self._started = 0.0
+
+        self._live = False
+        self._thread = None
+
+    ###### 对象处理方法 ######
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self) -> None:
+        """ 启动跟踪线程。 """
+        self._live = True
+        self._started = time.monotonic()
+        self._thread = Thread(target=self.__Track__)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        停止跟踪线程。
+
+        Args:
+            timeout (float | None): 等待的超时时间（秒）。
+        """
+        self._live = False
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    ###### 结果 ######
+
+    def latest(self, source: int = 0) -> Detections | None:
+        """ 获取最新一帧的跟踪结果（非阻塞）。 """
+        return self._latest
+
+    def fps(self) -> float:
+        """ 自启动以来每秒处理的帧数。 """
+        elapsed = time.monotonic() - self._started
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    def detectionRatio(self) -> float:
+        """ 检测器调用次数与处理帧数的比例。 """
+        return self.detector_calls / self.frames if self.frames else 0.0
+
+    ###### 后台线程 ######
+
+    def __Track__(self):
+        """
+        处理每个最新帧：检测或传播，然后发布结果。
+        """
+        last_seq = 0
+        since_detection = self.detect_interval
+
+        while self._live:
+            seq, frame = self._source.waitFrame(last_seq, timeout=0.5)
+            if seq == last_seq or frame is None:
+                continue
+            last_seq = seq
+            timestamp = time.monotonic()
+
+            # 间隔已到，或者有跟踪的置信度相对检测时下降过多时运行检测器
+            #  （比较比例而不是绝对值，低分数的检测不会导致每帧都运行检测器）
+            if since_detection >= self.detect_interval or \
+                    self.tracker.minConfidenceRatio() < self.min_confidence_ratio:
+                try:
+                    boxes, scores, classes = self._detector([frame])[0]
+                except Exception as e:
+                    print(f"推理失败: {e}")
+                    continue
+                self.tracker.update(boxes, scores, classes)
+                self.tracker.setFrame(frame)
+                self.detector_calls += 1
+                since_detection = 0
+            else:
+                self.tracker.predict(frame)
+            since_detection += 1
+            self.frames += 1
+
+            tracker = self.tracker
+            detections = Detections(0, seq, tracker.boxes.copy(), tracker.confidences.copy(),
+                                    tracker.classes.copy(), frame.shape[:2], timestamp,
+                                    time.monotonic() - timestamp, ids=tracker.ids.copy())
+            self._latest = detections
+
+            listener = self._listener
+            if listener:
+                listener.onValue(detections)
@@ -0,0 +1,247 @@
+from fractions import Fraction
+from threading import Thread, Condition
+from collections import deque
+import time
+
+import numpy as np
+
+"""
+视频编码阶段 - 在独立的线程中把带标注的帧编码保存为 H264 视频 (PyAV)。
+
+显示循环或推理回调只调用 submit()：帧放入有界队列后立即返回，
+队列满时按照丢弃策略丢帧，编码永远不会拖慢检测或显示。
+标注也可以交给编码线程绘制 (overlay)，调用者只需要提交原始帧和检测结果。
+
+使用方法：
+    with VideoEncoder("annotated.mp4", fps=30) as encoder:
+        encoder.submit(frame_show, copy=False)
+        ...
+        print(encoder.stats())
+"""
+
+# 帧的时间戳使用毫秒
+TIME_BASE = Fraction(1, 1000)
+
+
+class VideoEncoder:
+    """
+    有界队列 + 编码线程的 H264 编码器。
+    """
+
+    def __init__(self, path: str, fps: float = 30.0, codec: str = "libx264",
+                 options: dict | None = None, bit_rate: int | None = None,
+                 pix_fmt: str = "yuv420p", max_queue: int = 30, drop: str = "oldest",
+                 constant_rate: bool = False):
+        """
+        创建编码器并启动编码线程（输出文件在第一帧到达时创建）。
+
+        Args:
+            path (str): 输出文件，容器由扩展名决定（.mp4 / .mkv ...）。
+            fps (float): 名义帧率。
+            codec (str): PyAV 编码器名称，例如 'libx264'、'h264_nvenc'、'h264_qsv'。
+            options (dict | None): 编码器选项，None 使用 {"preset": "veryfast", "crf": "23"}（libx264）。
+            bit_rate (int | None): 目标码率 (bit/s)，None 由编码器决定。
+            pix_fmt (str): 编码的像素格式。
+            max_queue (int): 等待编码的最大帧数。
+            drop (str): 队列满时的策略，'oldest' 丢弃最旧的帧，'newest' 丢弃新提交的帧。
+            constant_rate (bool): True 按帧数计算时间戳（恒定帧率），
+                False 使用提交时间（可变帧率，与实际时间一致）。
+        """
+        if drop not in ("oldest", "newest"):
+            raise ValueError(f"未知的丢弃策略: {drop}")
+
+        self.path = path
+        self.fps = fps
+        self.codec = codec
+        self.options = options if options is not None else \
+            ({"preset": "veryfast", "crf": "23"} if codec == "libx264" else {})
+        self.bit_rate = bit_rate
+        self.pix_fmt = pix_fmt
+        self.max_queue = max_queue
+        self.drop = drop
+        self.constant_rate = constant_rate
+
+        self._queue = deque()
+        self._cond = Condition()
+        self._live = True
+
+        # 统计
+        self._submitted = 0
+        self._encoded = 0
+        self._dropped = 0
+        self._failed = 0
+        self._max_depth = 0
+        self._encode_time = 0.0
+        self._started = None
+
+        self._thread = Thread(target=self.__Encode__)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    ###### 提交 ######
+
+    def submit(self, frame: np.ndarray, overlay=None, timestamp: float | None = None,
+               copy: bool = True) -> bool:
+        """
+        提交一帧（不阻塞）。
+
+        Args:
+            frame (np.ndarray): BGR 帧 (高, 宽, 3)。
+            overlay: 可选的可调用对象，在编码线程中以帧的副本调用 overlay(frame)，
+                用于绘制标注（例如 lambda f: drawDetections(f, detections)）。
+            timestamp (float | None): 帧的时间 (time.monotonic)，None 使用当前时间。
+            copy (bool): 是否复制帧。调用者之后不再修改帧（例如每次都是新的数组）时可以为 False。
+
+        Return:
+            True 表示帧进入队列，False 表示被丢弃。
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if copy or overlay is not None:
+            frame = frame.copy()
+
+        with self._cond:
+            if not self._live:
+                return False
+            self._submitted += 1
+
+            if len(self._queue) >= self.max_queue:
+                self._dropped += 1
+                if self.drop == "newest":
+                    return False
+                self._queue.popleft()
+
+            self._queue.append((frame, overlay, timestamp))
+            self._max_depth = max(self._max_depth, len(self._queue))
+            self._cond.notify()
+        return True
+
+    ###### 编码线程 ######
+
+    def _open(self, width: int, height: int):
+        """ 创建输出文件和编码流。 """
+        import av
+
+        output = av.open(self.path, "w")
+        stream = output.add_stream(self.codec, rate=Fraction(self.fps).limit_denominator(1000),
+                                   options=self.options)
+        # yuv420p 要求宽高为偶数
+        stream.width = width - width % 2
+        stream.height = height - height % 2
+        stream.pix_fmt = self.pix_fmt
+        # 编码器使用毫秒时间基，否则它按 add_stream 的 1/fps 解释毫秒时间戳，
+        #  输出的时间戳错乱，mux 失败
+        stream.codec_context.time_base = TIME_BASE
+        if self.bit_rate:
+            stream.bit_rate = self.bit_rate
+        stream.thread_type = "AUTO"
+        return output, stream
+
+    def __Encode__(self):
+        """
+        取出帧，绘制标注，编码并写入文件。
+        """
+        import av
+
+        output = stream = None
+        first = None
+        last_pts = -1
+        # 无法创建输出文件时不再重试，之后的帧都计为失败
+        broken = False
+
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or not self._live)
+                if not self._queue:
+                    break
+                frame, overlay, timestamp = self._queue.popleft()
+
+            if broken:
+                self._failed += 1
+                continue
+
+            start = time.perf_counter()
+            try:
+                if overlay is not None:
+                    overlay(frame)
+
+                if output is None:
+                    try:
+                        output, stream = self._open(frame.shape[1], frame.shape[0])
+                    except Exception:
+                        broken = True
+                        raise
+                    first = timestamp
+                    self._started = time.monotonic()
+                frame = frame[:stream.height, :stream.width]
+
+                # 时间戳（毫秒），保证严格递增
+                if self.constant_rate:
+                    pts = round(self._encoded * 1000 / self.fps)
+                else:
+                    pts = round((timestamp - first) * 1000)
+                pts = max(pts, last_pts + 1)
+                last_pts = pts
+
+                video_frame = av.VideoFrame.from_ndarray(np.ascontiguousarray(frame), format="bgr24")
+                video_frame.pts = pts
+                # 不使用 stream.time_base：写入文件头之后容器会修改它（例如 mp4 的 1/16000）
+                video_frame.time_base = TIME_BASE
+                for packet in stream.encode(video_frame):
+                    output.mux(packet)
+            except Exception as e:
+                print(f"视频编码失败: {e}")
+                self._failed += 1
+                continue
+
+            self._encode_time += time.perf_counter() - start
+            self._encoded += 1
+
+        # 清空编码器中剩余的帧并关闭文件
+        if output is not None:
+            try:
+                for packet in stream.encode(None):
+                    output.mux(packet)
+            except Exception as e:
+                print(f"视频编码失败: {e}")
+            output.close()
+
+    ###### 统计 / 停止 ######
+
+    def queueDepth(self) -> int:
+        """ 当前等待编码的帧数。 """
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        """
+        编码统计。
+
+        Return:
+            {"submitted", "encoded", "dropped", "failed"（编码或写入失败的帧）,
+             "queue_depth", "max_queue_depth",
+             "encode_fps"（平均每秒编码的帧数）, "encode_ms"（每帧平均编码时间）}
+        """
+        elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+        return {
+            "submitted": self._submitted,
+            "encoded": self._encoded,
+            "dropped": self._dropped,
+            "failed": self._failed,
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self._max_depth,
+            "encode_fps": self._encoded / elapsed if elapsed > 0 else 0.0,
+            "encode_ms": self._encode_time / self._encoded * 1000 if self._encoded else 0.0,
+        }
+
+    def stop(self, timeout: float | None = None) -> None:
+        """ 编码队列中剩余的帧，然后关闭文件。 """
+        with self._cond:
+            self._live = False
+            self._cond.notify_all()
+        self._thread.join(timeout)
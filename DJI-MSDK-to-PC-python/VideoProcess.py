@@ -0,0 +1,295 @@
+from OpenDJI import EventListener
+from OpenDJI import _FrameTimes
+
+from SharedFrames import SharedFrameRing
+
+from threading import Thread, Condition
+import multiprocessing
+import queue
+import socket
+import time
+
+import numpy as np
+
+"""
+进程解码 - 在独立的子进程中接收和解码无人机视频，不与 GUI、推理和遥测争抢 GIL。
+
+子进程拥有视频套接字和 H264 解码器，把解码后的帧写入共享内存帧环
+(SharedFrameRing)，只有 (槽, 序号) 通过队列传给父进程。父进程的
+getFrame() / waitFrame() / 帧监听器直接得到指向共享内存的视图（不复制）。
+父进程中还有视图的槽保持固定，子进程不会写入，因此视图在释放之前一直有效；
+所有槽都被固定时子进程丢弃新帧，长时间保存的帧请复制。
+
+使用方法：
+    drone = OpenDJI(IP_ADDR, video_process=True)
+
+子进程使用 'spawn' 方式启动，因此主脚本必须有 if __name__ == '__main__': 保护。
+"""
+
+# 默认的帧槽数量和最大帧尺寸
+DEFAULT_SLOTS = 4
+DEFAULT_MAX_SHAPE = (1080, 1920, 3)
+
+
+def _decodeProcess(host: str, port: int, ring_name: str, slots: int, max_shape: tuple,
+                   pinned, messages, stop_event):
+    """
+    解码子进程：连接视频端口，解码帧并写入共享内存，
+    每一帧向父进程发送 ("frame", 槽, 序号, 到达时间)。
+
+    父进程中还有视图的槽在 'pinned' 中标记为 1，子进程轮流写入其他的槽。
+    握手：子进程先把槽标记为正在写入（序号 -1），再检查它是否被固定；
+    父进程先固定槽，再检查序号。两边的顺序保证父进程不会发布正在被写入的槽。
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.connect((host, port))
+    except OSError as e:
+        messages.put(("error", f"无法连接视频端口 {host}:{port}: {e}"))
+        sock.close()
+        return
+
+    # 子进程中才导入 PyAV
+    import av.codec
+
+    codec = av.codec.context.CodecContext.create('h264', 'r')
+    ring = SharedFrameRing(slots, max_shape, name=ring_name, create=False)
+    messages.put(("ready",))
+
+    sock.settimeout(0.5)
+    seq = 0
+    slot = -1
+    try:
+        while not stop_event.is_set():
+            # 读取数据，如果套接字关闭则结束进程。
+            try:
+                data = sock.recv(1 << 20)  # 1MB
+                if len(data) == 0:
+                    break
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+
+            # 到达时间：time.monotonic 是系统范围的时钟，父进程可以直接比较
+            timestamp = time.monotonic()
+
+            for packet in codec.parse(data):
+                for frame in codec.decode(packet):
+                    image = frame.to_ndarray(format='bgr24')
+
+                    seq += 1
+
+                    # 下一个没有被固定的槽（标记为正在写入之后再确认一次）
+                    for _ in range(slots):
+                        slot = (slot + 1) % slots
+                        if pinned[slot]:
+                            continue
+                        ring.invalidate(slot)
+                        if not pinned[slot]:
+                            break
+                    else:
+                        # 所有槽都有视图，丢弃这一帧
+                        continue
+
+                    try:
+                        ring.write(slot, image, seq)
+                    except ValueError as e:
+                        messages.put(("error", f"{e}，请增大 max_shape"))
+                        return
+                    messages.put(("frame", slot, seq, timestamp))
+    finally:
+        messages.put(("closed",))
+        sock.close()
+        ring.close()
+
+
+class ProcessVideoCodec:
+    """
+    与 BackgroundVideoCodec 相同的接口（read / wait / stop / 帧监听器），
+    但接收和解码在子进程中进行。
+
+    read()、wait() 和帧监听器得到的帧是共享内存的视图：视图存在期间它的槽
+    被固定，不会被覆盖。同时被固定的槽太多时子进程会丢帧，
+    需要长时间保存的帧请复制 (frame.copy())。
+
+    内部使用。
+    """
+
+    def __init__(self, host: str, port: int, slots: int = DEFAULT_SLOTS,
+                 max_shape: tuple = DEFAULT_MAX_SHAPE, connect_timeout: float = 10.0):
+        """
+        启动解码子进程，等待它连接到视频端口。
+
+        Args:
+            host (str): 手机的 IP 地址。
+            port (int): 视频端口。
+            slots (int): 帧槽数量（至少 3）。
+            max_shape (tuple): 最大帧尺寸 (高, 宽, 通道)，决定共享内存槽的大小。
+            connect_timeout (float): 等待子进程连接的超时时间（秒）。
+
+        Raises:
+            ConnectionError: 子进程无法连接到视频端口。
+        """
+        if slots < 3:
+            raise ValueError("slots 至少为 3")
+
+        self._ring = SharedFrameRing(slots, max_shape, on_release=self._unpin)
+        self._frame = None
+        self._listener = None
+        self._live = True
+
+        # 帧序号，用于 wait() 的 "最新帧" 语义
+        self._frame_seq = 0
+        self._frame_cond = Condition()
+        self._closed = False
+        self._frame_times = _FrameTimes()
+
+        context = multiprocessing.get_context("spawn")
+        # 每个槽是否被父进程固定（父进程中还有它的视图）
+        self._pinned = context.Array("b", slots, lock=False)
+        self._messages = context.Queue()
+        self._stop_event = context.Event()
+        self._process = context.Process(
+            target=_decodeProcess,
+            args=(host, port, self._ring.name, slots, max_shape,
+                  self._pinned, self._messages, self._stop_event))
+        self._process.daemon = True
+        self._process.start()
+
+        # 等待子进程连接
+        try:
+            message = self._messages.get(timeout=connect_timeout)
+        except queue.Empty:
+            message = ("error", f"连接视频端口 {host}:{port} 超时")
+        if message[0] != "ready":
+            self._shutdown(1.0)
+            raise ConnectionError(message[1])
+
+        # 启动接收线程
+        self._thread = Thread(target=self.__ReadFrames__)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __ReadFrames__(self):
+        """
+        在后台接收子进程的消息，只处理最新的帧。
+        """
+        while self._live:
+            try:
+                messages = [self._messages.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            # 取出所有等待的消息，较旧的帧直接跳过
+            try:
+                while True:
+                    messages.append(self._messages.get_nowait())
+            except queue.Empty:
+                pass
+
+            frames = [message for message in messages if message[0] == "frame"]
+            for message in messages:
+                if message[0] == "error":
+                    print(f"视频解码进程: {message[1]}")
+            if frames:
+                with self._frame_cond:
+                    for _, _, seq, timestamp in frames:
+                        self._frame_times.add(seq, timestamp)
+                self._publish(*frames[-1][1:3])
+            if any(message[0] == "closed" for message in messages):
+                break
+
+        # 如果连接/进程中断，则将帧设置为 None。
+        with self._frame_cond:
+            self._frame = None
+            self._closed = True
+            self._frame_cond.notify_all()
+
+    def _publish(self, slot: int, seq: int) -> None:
+        """ 固定槽（子进程不再写入它），确认帧完整后发布。 """
+        self._pinned[slot] = 1
+        ring_seq, image = self._ring.read(slot)
+        if ring_seq != seq:
+            # 父进程落后时，槽可能已经被重新写入（或者正在写入）；
+            #  视图被释放时解除固定
+            return
+
+        with self._frame_cond:
+            self._frame = image
+            self._frame_seq = seq
+            self._frame_cond.notify_all()
+
+        listener: EventListener = self._listener
+        if listener:
+            listener.onValue(image)
+
+    def _unpin(self, slot: int) -> None:
+        """ 槽的最后一个视图被释放，子进程可以重新写入它。 """
+        self._pinned[slot] = 0
+
+    def read(self) -> np.ndarray | None:
+        """ 从此视频流中获取最后可用的帧（共享内存视图）。 """
+        return self._frame
+
+    def wait(self, last_seq: int = 0, timeout: float | None = None):
+        """
+        等待序号大于 'last_seq' 的帧。
+
+        Args:
+            last_seq (int): 已经处理过的最后一个帧序号。
+            timeout (float | None): 超时时间（秒），或 None 表示无限期等待。
+
+        Return:
+            (seq, frame) - 最新的帧序号和帧。
+        """
+        with self._frame_cond:
+            self._frame_cond.wait_for(
+                lambda: self._frame_seq != last_seq or self._closed, timeout)
+            return self._frame_seq, self._frame
+
+    def frameTime(self, seq: int) -> float | None:
+        """ 帧的到达时间 (time.monotonic)，帧太旧时返回 None。 """
+        with self._frame_cond:
+            return self._frame_times.get(seq)
+
+    def _shutdown(self, timeout: float | None) -> None:
+        """ 停止子进程并释放共享内存。 """
+        self._stop_event.set()
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._messages.cancel_join_thread()
+        self._ring.close()
+
+    def stop(self, timeout: float | None = None):
+        """
+        停止接收线程和解码子进程。
+
+        Args:
+            timeout (float | None): 操作超时时间（秒），
+                或 None 表示无限期等待。
+        """
+        self._live = False
+        self._thread.join(timeout)
+        with self._frame_cond:
+            self._frame = None
+            self._closed = True
+            self._frame_cond.notify_all()
+        self._shutdown(timeout)
+
+    def registerListener(self, listener: EventListener):
+        """ 设置帧监听器 """
+        self._listener = listener
+
+    def unregisterListener(self):
+        """ 移除帧监听器 """
+        self._listener = None
+
+    def registerPacketListener(self, listener: EventListener):
+        """ 进程解码模式不提供原始数据包（它们只在子进程中） """
+        raise RuntimeError("进程解码模式不支持数据包监听器，请使用 VideoRelay")
+
+    def unregisterPacketListener(self, listener: EventListener | None = None):
+        """ 移除数据包监听器 """
+        pass
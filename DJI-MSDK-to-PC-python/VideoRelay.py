@@ -0,0 +1,406 @@
+from OpenDJI import OpenDJI
+from OpenDJI import EventListener
+from OpenDJI import BackgroundVideoCodec
+from SharedFrames import SharedFrameRing
+
+from multiprocessing import shared_memory
+from threading import Thread, Lock
+import argparse
+import socket
+import queue
+import time
+import os
+
+import numpy as np
+
+"""
+视频转发 - 保持唯一的一个到无人机视频端口的连接，并在本机上转发给多个消费者。
+
+    原始 H264：通过 TCP（默认 127.0.0.1:9999）或 Unix 套接字转发，
+               与 ExampleVideoRaw.py 这样直接读取视频端口的客户端兼容。
+               新的客户端从下一个关键帧开始接收（必要时先发送 SPS/PPS），
+               太慢的客户端会丢弃积压的数据，从下一个关键帧重新开始。
+    解码帧：   写入共享内存帧环，其他进程用 RelayFrames 读取最新的帧。
+
+上游的带宽和解码只消耗一次，与消费者的数量无关。
+
+命令行：
+    python VideoRelay.py 10.0.0.6
+"""
+
+# 共享内存的默认参数，RelayFrames 使用相同的默认值
+DEFAULT_SHM_NAME = "opendji_video"
+DEFAULT_SLOTS = 3
+DEFAULT_MAX_SHAPE = (1080, 1920, 3)
+
+# H264 NAL 单元类型
+NAL_IDR = 5
+NAL_SPS = 7
+NAL_PPS = 8
+
+START_CODE = b"\x00\x00\x01"
+
+
+def splitNals(data: bytes) -> list[tuple[int, bytes]]:
+    """
+    将 Annex B 格式的 H264 数据分割为 NAL 单元。
+
+    Args:
+        data (bytes): H264 数据（一个或多个 NAL 单元）。
+
+    Return:
+        [(NAL 类型, 不含起始码的 NAL 数据), ...]
+    """
+    nals = []
+    start = data.find(START_CODE)
+    while start >= 0 and start + 3 < len(data):
+        end = data.find(START_CODE, start + 3)
+        stop = len(data) if end < 0 else end
+        # 4 字节起始码的第一个 0 不属于前一个 NAL 单元
+        if end >= 0 and data[end - 1] == 0:
+            stop -= 1
+        payload = data[start + 3:stop]
+        nals.append((payload[0] & 0x1F, payload))
+        start = end
+    return nals
+
+
+class _RelayClient:
+    """ 一个原始 H264 客户端：有界的发送队列和独立的发送线程。 """
+
+    def __init__(self, sock: socket.socket, address, max_queue: int):
+        self._sock = sock
+        self.address = address
+        self._queue = queue.Queue(max_queue)
+        self.synced = False
+        self.live = True
+
+        self._thread = Thread(target=self.__Send__)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def offer(self, packet: bytes, keyframe: bool, parameter_sets: bytes) -> None:
+        """
+        排队一个数据包（在解码线程中调用，从不阻塞）。
+
+        Args:
+            packet (bytes): H264 数据包。
+            keyframe (bool): 数据包是否包含 IDR 帧。
+            parameter_sets (bytes): 最近的 SPS/PPS，数据包中没有时在关键帧前发送。
+        """
+        if not self.synced:
+            if not keyframe:
+                return
+            self.synced = True
+            packet = parameter_sets + packet
+
+        try:
+            self._queue.put_nowait(packet)
+        except queue.Full:
+            # 客户端太慢：丢弃积压的数据，从下一个关键帧重新开始
+            self.synced = False
+            try:
+                while True:
+                    self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+    def __Send__(self):
+        while self.live:
+            data = self._queue.get()
+            if data is None:
+                break
+            try:
+                self._sock.sendall(data)
+            except OSError:
+                break
+
+        self.live = False
+        self._sock.close()
+
+    def close(self) -> None:
+        self.live = False
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            self._sock.close()
+
+
+class _PacketListener(EventListener):
+    def __init__(self, relay):
+        self._relay = relay
+
+    def onValue(self, packet):
+        self._relay._onPacket(packet)
+
+
+class _FrameListener(EventListener):
+    def __init__(self, relay):
+        self._relay = relay
+
+    def onValue(self, frame):
+        self._relay._onFrame(frame)
+
+
+class VideoRelay:
+    """
+    视频转发服务。
+
+    创建后立即连接无人机并开始转发，stop() 或 'with' 作用域结束时关闭。
+    """
+
+    def __init__(self, host: str, listen_host: str = "127.0.0.1",
+                 listen_port: int | None = OpenDJI.PORT_VIDEO, unix_path: str | None = None,
+                 shm_name: str | None = DEFAULT_SHM_NAME, slots: int = DEFAULT_SLOTS,
+                 max_shape: tuple = DEFAULT_MAX_SHAPE, client_queue: int = 120):
+        """
+        启动视频转发。
+
+        Args:
+            host (str): 打开了 MSDK Remote 的手机的 IP 地址。
+            listen_host (str): 原始 H264 的 TCP 监听地址。
+            listen_port (int | None): 原始 H264 的 TCP 监听端口，None 表示不使用 TCP。
+            unix_path (str | None): 原始 H264 的 Unix 套接字路径，None 表示不使用。
+            shm_name (str | None): 解码帧的共享内存名称，None 表示不共享解码帧。
+            slots (int): 共享内存中的帧槽数量。
+            max_shape (tuple): 共享内存中最大的帧尺寸 (高, 宽, 通道)。
+            client_queue (int): 每个客户端最多积压的数据包数量。
+        """
+        self._client_queue = client_queue
+        self._clients = []
+        self._clients_lock = Lock()
+        self._parameter_sets = {}
+        self._live = True
+
+        # 解码帧的共享内存
+        self._ring = None
+        self._frame_seq = 0
+        self._frame_error = False
+        if shm_name is not None:
+            self._ring = self._createRing(shm_name, slots, max_shape)
+
+        # 本地监听的套接字
+        self._servers = []
+        self._unix_path = unix_path
+        try:
+            if listen_port is not None:
+                server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                server.bind((listen_host, listen_port))
+                self._servers.append(server)
+
+            if unix_path is not None:
+                if os.path.exists(unix_path):
+                    os.remove(unix_path)
+                server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                server.bind(unix_path)
+                self._servers.append(server)
+
+            # 唯一的上游连接
+            self._upstream = socket.create_connection((host, OpenDJI.PORT_VIDEO))
+
+        except Exception:
+            for server in self._servers:
+                server.close()
+            if self._ring is not None:
+                self._ring.close()
+            raise
+
+        for server in self._servers:
+            server.listen()
+            thread = Thread(target=self.__Accept__, args=(server,))
+            thread.daemon = True
+            thread.start()
+
+        self._codec = BackgroundVideoCodec(self._upstream)
+        self._codec.registerPacketListener(_PacketListener(self))
+        if self._ring is not None:
+            self._codec.registerListener(_FrameListener(self))
+
+    @staticmethod
+    def _createRing(name: str, slots: int, max_shape: tuple) -> SharedFrameRing:
+        """ 创建共享内存，之前异常退出留下的同名共享内存先释放。 """
+        try:
+            return SharedFrameRing(slots, max_shape, name=name)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            return SharedFrameRing(slots, max_shape, name=name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __Accept__(self, server: socket.socket):
+        """ 接受新的原始 H264 客户端 """
+        while self._live:
+            try:
+                sock, address = server.accept()
+            except OSError:
+                break
+            client = _RelayClient(sock, address, self._client_queue)
+            with self._clients_lock:
+                self._clients.append(client)
+
+    def _onPacket(self, packet: bytes) -> None:
+        """ 解码线程：记录 SPS/PPS，并将数据包转发给所有客户端。 """
+        keyframe = False
+        has_parameter_sets = False
+        for nal_type, payload in splitNals(packet):
+            if nal_type == NAL_IDR:
+                keyframe = True
+            elif nal_type in (NAL_SPS, NAL_PPS):
+                self._parameter_sets[nal_type] = b"\x00\x00\x00\x01" + payload
+                has_parameter_sets = True
+
+        parameter_sets = b"" if has_parameter_sets else \
+            self._parameter_sets.get(NAL_SPS, b"") + self._parameter_sets.get(NAL_PPS, b"")
+
+        with self._clients_lock:
+            self._clients = [client for client in self._clients if client.live]
+            clients = list(self._clients)
+
+        for client in clients:
+            client.offer(packet, keyframe, parameter_sets)
+
+    def _onFrame(self, frame: np.ndarray) -> None:
+        """ 解码线程：将帧写入共享内存中最旧的槽。 """
+        try:
+            self._frame_seq += 1
+            self._ring.write(self._frame_seq % self._ring.slots, frame, self._frame_seq)
+        except ValueError as e:
+            if not self._frame_error:
+                self._frame_error = True
+                print(f"无法共享解码帧: {e}")
+
+    def clients(self) -> list:
+        """ 当前连接的原始 H264 客户端地址。 """
+        with self._clients_lock:
+            return [client.address for client in self._clients if client.live]
+
+    def stop(self) -> None:
+        """ 关闭上游连接、所有客户端和共享内存。 """
+        self._live = False
+
+        # shutdown 会唤醒阻塞在 recv / accept 中的线程（仅 close 不会）
+        for sock in [self._upstream] + self._servers:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._codec.stop()
+
+        for server in self._servers:
+            server.close()
+        if self._unix_path is not None and os.path.exists(self._unix_path):
+            os.remove(self._unix_path)
+
+        with self._clients_lock:
+            for client in self._clients:
+                client.close()
+            self._clients = []
+
+        if self._ring is not None:
+            self._ring.close()
+
+
+class RelayFrames:
+    """
+    读取 VideoRelay 共享的解码帧（在其他进程中）。
+
+    提供与 OpenDJI 相同的 getFrame() / waitFrame() 方法，
+    因此可以直接作为 InferenceStage 等的视频源。
+    """
+
+    def __init__(self, name: str = DEFAULT_SHM_NAME, slots: int = DEFAULT_SLOTS,
+                 max_shape: tuple = DEFAULT_MAX_SHAPE, poll_interval: float = 0.002):
+        """
+        连接 VideoRelay 的共享内存（参数必须与 VideoRelay 相同）。
+
+        Args:
+            name (str): 共享内存的名称。
+            slots (int): 帧槽数量。
+            max_shape (tuple): 最大的帧尺寸。
+            poll_interval (float): waitFrame() 检查新帧的间隔（秒）。
+        """
+        self._ring = SharedFrameRing(slots, max_shape, name=name, create=False)
+        self._poll_interval = poll_interval
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _latestSeq(self) -> tuple[int, int]:
+        """ 返回 (序号, 槽)，序号最大的完整帧。 """
+        best_seq, best_slot = 0, -1
+        for slot in range(self._ring.slots):
+            seq = self._ring.read(slot)[0]
+            if seq > best_seq:
+                best_seq, best_slot = seq, slot
+        return best_seq, best_slot
+
+    def _read(self) -> tuple[int, np.ndarray | None]:
+        """ 复制最新的帧，复制期间槽被重新写入时重试。 """
+        for _ in range(3):
+            seq, slot = self._latestSeq()
+            if slot < 0:
+                return 0, None
+            frame = self._ring.read(slot)[1].copy()
+            if self._ring.read(slot)[0] == seq:
+                return seq, frame
+        return 0, None
+
+    def getFrame(self) -> np.ndarray | None:
+        """ 最新的帧（副本），没有帧时返回 None。 """
+        return self._read()[1]
+
+    def waitFrame(self, last_seq: int = 0, timeout: float | None = None):
+        """
+        等待比 'last_seq' 更新的帧。
+
+        Args:
+            last_seq (int): 已经处理过的最后一个帧序号。
+            timeout (float | None): 超时时间（秒），或 None 表示无限期等待。
+
+        Return:
+            (seq, frame) - 超时时序号等于 'last_seq'，帧为 None。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            seq, slot = self._latestSeq()
+            if seq != last_seq and slot >= 0:
+                seq, frame = self._read()
+                if frame is not None:
+                    return seq, frame
+            if deadline is not None and time.monotonic() >= deadline:
+                return last_seq, None
+            time.sleep(self._poll_interval)
+
+    def close(self) -> None:
+        """ 断开共享内存（不释放，由 VideoRelay 释放）。 """
+        self._ring.close()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="无人机视频转发服务")
+    parser.add_argument("host", help="打开了 MSDK Remote 的手机的 IP 地址")
+    parser.add_argument("--port", type=int, default=OpenDJI.PORT_VIDEO, help="本地 TCP 端口")
+    parser.add_argument("--unix", default=None, help="本地 Unix 套接字路径")
+    parser.add_argument("--shm", default=DEFAULT_SHM_NAME, help="解码帧的共享内存名称")
+    arguments = parser.parse_args()
+
+    with VideoRelay(arguments.host, listen_port=arguments.port, unix_path=arguments.unix,
+                    shm_name=arguments.shm) as relay:
+        print(f"正在转发 {arguments.host} 的视频，按 Ctrl+C 退出")
+        try:
+            while True:
+                time.sleep(5)
+                print(f"客户端: {len(relay.clients())}", end='\t\t\r')
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,218 @@
+from OpenDJI import OpenDJI
+from OpenDJI import EventListener
+
+import cv2
+import numpy as np
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtCore import Qt, QRect, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter, QColor
+
+"""
+视频控件 - 由视频流驱动（而不是定时器）的 Qt 视频显示控件。
+
+解码线程通过帧监听器交给控件最新的帧，控件只在有新帧时
+发出一个排队信号并重绘。帧直接包装为 QImage（BGR 格式不需要颜色转换），
+在 paintEvent 中一次性缩放绘制到控件上，不会为每帧创建 QPixmap。
+
+设置叠加层（例如 HUD）后，帧先缩小到显示尺寸（新的缓冲区，不修改解码器的帧），
+叠加层绘制在缩小后的帧上。
+"""
+
+# Qt 5.14 之后支持 BGR888，可以直接显示 OpenCV 的帧
+_FORMAT_BGR888 = getattr(QImage, "Format_BGR888", None)
+
+
+class _FrameListener(EventListener):
+    """ 将 OpenDJI 的帧转交给 VideoWidget（在解码线程中调用）。 """
+
+    def __init__(self, widget):
+        self._widget = widget
+
+    def onValue(self, frame):
+        self._widget.setFrame(frame)
+
+
+class VideoWidget(QWidget):
+    """
+    显示视频帧的控件。
+
+    setFrame() 可以在任何线程中调用：它只保存最新的帧，
+    并且在上一帧还没有被 GUI 线程取走时不会再次发出信号，
+    因此慢的 GUI 不会积压帧，没有新帧时也不会重绘。
+    """
+
+    # 内部信号：有新帧等待显示（排队连接到 GUI 线程）
+    _frameReady = pyqtSignal()
+
+    def __init__(self, parent=None, placeholder: str = "等待视频流...",
+                 smooth: bool = False):
+        """
+        初始化视频控件。
+
+        Args:
+            parent: 父控件。
+            placeholder (str): 没有帧时显示的文字。
+            smooth (bool): True 使用双线性缩放（更慢），False 使用最近邻缩放。
+        """
+        super(VideoWidget, self).__init__(parent)
+        self.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+        self._placeholder = placeholder
+        self._smooth = smooth
+
+        # 由解码线程写入的最新帧：(帧, 格式)
+        self._latest = None
+        self._pending = False
+
+        # 当前显示的图像，以及它引用的 numpy 缓冲区（保持其生命周期）
+        self._image = None
+        self._buffer = None
+
+        # 帧是否是共享内存的视图（进程解码），显示之前需要复制
+        self._copy = False
+
+        # 颜色转换的目标缓冲区，尺寸不变时重复使用
+        self._convert_buffer = None
+
+        # 叠加层，以及缩小到显示尺寸的缓冲区
+        self._overlay = None
+        self._display_buffer = None
+
+        self._frameReady.connect(self._onFrameReady, Qt.QueuedConnection)
+
+    def attach(self, drone: OpenDJI) -> None:
+        """
+        将控件注册为无人机的帧监听器。
+
+        Args:
+            drone (OpenDJI): 视频源。
+        """
+        self._copy = drone.shared_frames
+        drone.frameListener(_FrameListener(self))
+
+    def setOverlay(self, overlay) -> None:
+        """
+        设置叠加层，在缩小到显示尺寸的 BGR 帧上绘制。
+
+        Args:
+            overlay: 带有 apply(frame) 方法的对象（例如 HUD），None 表示取消。
+        """
+        self._overlay = overlay
+
+    def setFrame(self, frame: np.ndarray, format: str = "bgr") -> None:
+        """
+        提交新帧（线程安全）。
+
+        Args:
+            frame (np.ndarray): 帧数据。'bgr' / 'rgb' 为 (高, 宽, 3) 的 uint8，
+                'yuv420p' 为 (高 * 3 / 2, 宽) 的 I420 平面数据。
+            format (str): 'bgr'、'rgb' 或 'yuv420p'。
+        """
+        self._latest = (frame, format)
+        if not self._pending:
+            self._pending = True
+            self._frameReady.emit()
+
+    def _onFrameReady(self):
+        """ GUI 线程：取出最新的帧，包装为 QImage，并请求重绘。 """
+        self._pending = False
+        latest = self._latest
+        if latest is None:
+            return
+        frame, format = latest
+
+        if self._overlay is not None:
+            frame, image_format = self._overlayFrame(frame, format)
+
+        elif format == "yuv420p":
+            height = frame.shape[0] * 2 // 3
+            width = frame.shape[1]
+            if self._convert_buffer is None or self._convert_buffer.shape[:2] != (height, width):
+                self._convert_buffer = np.empty((height, width, 3), dtype=np.uint8)
+            cv2.cvtColor(frame, cv2.COLOR_YUV2RGB_I420, dst=self._convert_buffer)
+            frame, image_format = self._convert_buffer, QImage.Format_RGB888
+
+        elif format == "rgb":
+            image_format = QImage.Format_RGB888
+
+        elif _FORMAT_BGR888 is not None:
+            image_format = _FORMAT_BGR888
+
+        else:
+            # 旧版本的 Qt 不支持 BGR，转换到可重复使用的缓冲区中
+            if self._convert_buffer is None or self._convert_buffer.shape != frame.shape:
+                self._convert_buffer = np.empty(frame.shape, dtype=np.uint8)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._convert_buffer)
+            frame, image_format = self._convert_buffer, QImage.Format_RGB888
+
+        if self._copy and frame is latest[0]:
+            # 显示的帧一直保存到下一帧，不长时间占用解码进程的帧槽
+            frame = frame.copy()
+        frame = np.ascontiguousarray(frame)
+        height, width = frame.shape[:2]
+
+        # QImage 直接引用 numpy 缓冲区，不复制
+        self._buffer = frame
+        self._image = QImage(frame.data, width, height, frame.strides[0], image_format)
+        self.update()
+
+    def _overlayFrame(self, frame: np.ndarray, format: str) -> tuple:
+        """ 转换为 BGR，缩小到显示尺寸，并绘制叠加层。 """
+        if format == "yuv420p":
+            frame = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420)
+        elif format == "rgb":
+            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+
+        height, width = frame.shape[:2]
+        target = self._fitRect(width, height)
+        size = (max(1, target.width()), max(1, target.height()))
+
+        if self._display_buffer is None or self._display_buffer.shape[:2] != (size[1], size[0]):
+            self._display_buffer = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        cv2.resize(frame, size, dst=self._display_buffer, interpolation=cv2.INTER_AREA)
+        self._overlay.apply(self._display_buffer)
+
+        if _FORMAT_BGR888 is not None:
+            return self._display_buffer, _FORMAT_BGR888
+        cv2.cvtColor(self._display_buffer, cv2.COLOR_BGR2RGB, dst=self._display_buffer)
+        return self._display_buffer, QImage.Format_RGB888
+
+    def clear(self) -> None:
+        """ 清除当前帧，显示占位文字。 """
+        self._latest = None
+        self._image = None
+        self._buffer = None
+        self.update()
+
+    def _targetRect(self) -> QRect:
+        """ 当前图像保持宽高比、居中显示的目标区域。 """
+        return self._fitRect(self._image.width(), self._image.height())
+
+    def _fitRect(self, image_width: int, image_height: int) -> QRect:
+        """ 保持宽高比、居中显示的目标区域。 """
+        width = self.width()
+        height = self.height()
+
+        scale = min(width / image_width, height / image_height)
+        target_width = int(image_width * scale)
+        target_height = int(image_height * scale)
+        return QRect((width - target_width) // 2, (height - target_height) // 2,
+                     target_width, target_height)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(0, 0, 0))
+
+        if self._image is None:
+            painter.setPen(QColor(255, 255, 255))
+            font = painter.font()
+            font.setPixelSize(20)
+            painter.setFont(font)
+            painter.drawText(self.rect(), Qt.AlignCenter, self._placeholder)
+        else:
+            # 一次绘制完成缩放
+            painter.setRenderHint(QPainter.SmoothPixmapTransform, self._smooth)
+            painter.drawImage(self._targetRect(), self._image)
+
+        painter.end()
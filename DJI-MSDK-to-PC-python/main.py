@@ -1,19 +1,25 @@
 import sys
 import re
-import cv2  # 导入 OpenCV
-import numpy as np
 # [修改 1] 导入 QPushButton 以创建按钮
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QLabel, QSizePolicy, \
-    QPushButton
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QPushButton
 from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QTimer, QUrl, Qt
-from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWebChannel import QWebChannel
+from PyQt5.QtCore import QUrl
 
 # 导入 OpenDJI 库
 from OpenDJI import OpenDJI
+from VideoWidget import VideoWidget
+from HUD import HUD
+from QtBridge import DroneBridge
+from MapBridge import MapBridge, MAP_BRIDGE_JS
+from TileCache import TileCache, TileServer
 
 
 class RealTimeMapApp(QMainWindow):
+
+    # 由 DroneBridge 订阅的遥测键（HUD 也从这里获得这些键的值）
+    BRIDGE_KEYS = ((OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftLocation3D"),)
+
     def __init__(self):
         super(RealTimeMapApp, self).__init__()
         self.setWindowTitle('无人机监控终端 - 地图 / 视觉 / 控制')
@@ -31,13 +37,9 @@ class RealTimeMapApp(QMainWindow):
         self.qwebengine = QWebEngineView(self)
         content_layout.addWidget(self.qwebengine, stretch=1)
 
-        # 2. 右侧：视频显示
-        self.video_label = QLabel("等待视频流...", self)
-        self.video_label.setAlignment(Qt.AlignCenter)
-        self.video_label.setStyleSheet("background-color: black; color: white; font-size: 20px;")
-        self.video_label.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
-        self.video_label.setScaledContents(True)
-        content_layout.addWidget(self.video_label, stretch=1)
+        # 2. 右侧：视频显示（由视频流驱动，有新帧时才重绘）
+        self.video_widget = VideoWidget(self, "等待视频流...")
+        content_layout.addWidget(self.video_widget, stretch=1)
 
         # 将内容布局加入根布局
         root_layout.addLayout(content_layout, stretch=10)  # 内容区占大部分空间
@@ -71,84 +73,93 @@ class RealTimeMapApp(QMainWindow):
         self.container.setLayout(root_layout)  # 设置为新的根布局
         self.setCentralWidget(self.container)
 
+        # 地图桥接：轨迹通过 QWebChannel 批量推送到页面
+        self.map_bridge = MapBridge(self)
+        self.channel = QWebChannel(self.qwebengine.page())
+        self.channel.registerObject("mapBridge", self.map_bridge)
+        self.qwebengine.page().setWebChannel(self.channel)
+
+        # 本地瓦片服务器：地图瓦片和 Leaflet 文件优先从本地缓存读取（离线可用）
+        self.tile_cache = TileCache()
+        self.tile_server = TileServer(self.tile_cache)
+
         # 加载地图
         self.qwebengine.setHtml(self.generate_map_html(), baseUrl=QUrl.fromLocalFile('.'))
 
-        # 变量初始化
-        self.new_point = None
-        self.old_point = None
-        self.old_label = None
-
         # --- 连接无人机 ---
         self.drone = None
+        self.bridge = None
         IP_ADDR = "10.104.16.60"  # 替换为你的实际 IP
         try:
             print(f"正在连接到无人机 @ {IP_ADDR}...")
-            self.drone = OpenDJI(IP_ADDR)
+            # 视频在子进程中解码，解码不会让 GUI 线程等待 GIL
+            self.drone = OpenDJI(IP_ADDR, video_process=True)
             print("连接成功！")
 
+            # 视频帧由解码线程直接推送给视频控件
+            self.video_widget.attach(self.drone)
+
+            # 遥测 HUD，叠加在缩小到显示尺寸的帧上。
+            #  位置由 DroneBridge 订阅（每个键只有一个监听器），通过 on_telemetry 传给 HUD
+            self.hud = HUD()
+            self.hud.listen(self.drone, exclude=self.BRIDGE_KEYS)
+            self.video_widget.setOverlay(self.hud)
+
             NUM_REG = '[-+]?\\d+\\.?\\d*'
             self.location_pattern = re.compile(
                 '{"latitude":(' + NUM_REG + '),' +
                 '"longitude":(' + NUM_REG + '),' +
                 '"altitude":(' + NUM_REG + ')}')
+
+            # --- 遥测与命令 ---
+            # 位置通过 listen() 推送，命令在后台线程执行，
+            #  结果都以 Qt 信号的形式回到 GUI 线程，界面不会被网络阻塞。
+            self.bridge = DroneBridge(self.drone, self)
+            self.bridge.telemetry.connect(self.on_telemetry)
+            self.bridge.commandFinished.connect(self.on_command_finished)
+            self.bridge.commandFailed.connect(self.on_command_failed)
+            for module, key in self.BRIDGE_KEYS:
+                self.bridge.subscribe(module, key)
         except Exception as e:
             print(f"连接到无人机失败: {e}")
 
-        # --- 定时器设置 ---
-        self.timer_gps = QTimer(self)
-        self.timer_gps.timeout.connect(self.update_map)
-        self.timer_gps.start(1000)
-
-        self.timer_video = QTimer(self)
-        self.timer_video.timeout.connect(self.update_video)
-        self.timer_video.start(30)
-
     # [修改 5] 添加起飞和降落的逻辑函数
     def action_takeoff(self):
-        """执行一键起飞"""
-        if self.drone:
+        """执行一键起飞（在后台线程中发送，结果由 on_command_finished 打印）"""
+        if self.bridge:
             print(">>> 发送起飞指令...")
-            # 参考 ExampleControl.py，参数 True 可能表示打印调试信息或确认
-            try:
-                result = self.drone.takeoff(True)
-                print(f"起飞指令返回: {result}")
-            except Exception as e:
-                print(f"起飞指令发送失败: {e}")
+            self.bridge.takeoff()
         else:
             print("错误: 无人机未连接")
 
     def action_land(self):
-        """执行一键降落"""
-        if self.drone:
+        """执行一键降落（在后台线程中发送，结果由 on_command_finished 打印）"""
+        if self.bridge:
             print(">>> 发送降落指令...")
-            try:
-                result = self.drone.land(True)
-                print(f"降落指令返回: {result}")
-            except Exception as e:
-                print(f"降落指令发送失败: {e}")
+            self.bridge.land()
         else:
             print("错误: 无人机未连接")
 
-    def update_video(self):
-        """获取视频帧，处理并显示"""
-        if self.drone is None:
-            return
-
-        frame = self.drone.getFrame()
-
-        if frame is not None:
-            # OpenCV 默认是 BGR，Qt 显示需要 RGB
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    def on_command_finished(self, request_id, name, result):
+        """命令执行完成（GUI 线程）"""
+        if result is None:
+            print(f"{name} 指令没有返回（超时）")
+        else:
+            print(f"{name} 指令返回: {result}")
 
-            h, w, ch = frame.shape
-            bytes_per_line = ch * w
+    def on_command_failed(self, request_id, name, error):
+        """命令执行失败（GUI 线程）"""
+        print(f"{name} 指令发送失败: {error}")
 
-            qt_image = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.video_label.setPixmap(QPixmap.fromImage(qt_image))
+    def on_telemetry(self, module, key, value):
+        """订阅的键有新值（GUI 线程）"""
+        self.hud.update(module, key, value)
+        if key == "AircraftLocation3D":
+            self.update_map(value)
 
     def generate_map_html(self):
         # ... (保持原有的 HTML 生成代码不变) ...
+        base = self.tile_server.url
         html = """
         <!DOCTYPE html>
         <html>
@@ -158,78 +169,54 @@ class RealTimeMapApp(QMainWindow):
             <style>
                 body, html, #map { height: 100%; margin: 0; }
             </style>
-            <link rel="stylesheet" href="https://unpkg.com/leaflet@1.7.1/dist/leaflet.css">
-            <script src="https://unpkg.com/leaflet@1.7.1/dist/leaflet.js"></script>
+            <link rel="stylesheet" href="BASE/assets/leaflet.css">
+            <script src="BASE/assets/leaflet.js"></script>
+            <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
         </head>
         <body>
             <div id="map" style="width: 100%; height: 100vh;"></div>
             <script>
                 var mymap = L.map('map').setView([31.2304, 121.4737], 13); 
-                L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+                L.tileLayer('BASE/tiles/{z}/{x}/{y}.png', {
+                    maxZoom: 19,
                     attribution: '© OpenStreetMap contributors'
                 }).addTo(mymap);
-                var pathMarkers = L.layerGroup().addTo(mymap);
                 var newMarkerIcon = L.icon({
-                    iconUrl: 'https://unpkg.com/leaflet@1.7.1/dist/images/marker-icon.png',
+                    iconUrl: 'BASE/assets/images/marker-icon.png',
                     iconSize: [25, 41],
                     iconAnchor: [12, 41]
                 });
-                var oldMarker;
-                var oldLabel;
-                function addPoint(lat, lng, isNew) {
-                    var latlng = new L.LatLng(lat, lng);
-                    if (isNew) {
-                        if (oldMarker) { pathMarkers.removeLayer(oldMarker); }
-                        if (oldLabel) { mymap.removeLayer(oldLabel); }
-                        oldMarker = L.marker(latlng, { icon: newMarkerIcon }).addTo(pathMarkers);
-                        var label = L.divIcon({
-                            className: 'label',
-                            html: `<div style="white-space: nowrap; margin-left: 1em;">Lat: ${lat.toFixed(7)} Lng: ${lng.toFixed(7)}</div>`
-                        });
-                        var newLabel = L.marker(latlng, { icon: label }).addTo(mymap);
-                        oldLabel = newLabel;
-                    }
-                    if (!mymap.firstPanDone) {
-                        mymap.setView(latlng, 17);
-                        mymap.firstPanDone = true;
-                    } else {
-                        mymap.panTo(latlng);
-                    }
-                }
+            </script>
+            <script>
+        """ + MAP_BRIDGE_JS + """
             </script>
         </body>
         </html>
-        """
+        """.replace("BASE", base)
         return html
 
-    def update_map(self):
-        if self.drone is None:
-            return
-
+    def update_map(self, location3D_str):
         try:
-            location3D_str = self.drone.getValue(OpenDJI.MODULE_FLIGHTCONTROLLER, "AircraftLocation3D")
             location_match = self.location_pattern.fullmatch(location3D_str)
             if location_match:
                 latitude = float(location_match.group(1))
                 longitude = float(location_match.group(2))
                 if abs(latitude) > 0.01:
-                    new_point = [latitude, longitude]
-                    if self.new_point is not None: self.old_point = self.new_point
-                    self.new_point = new_point
-                    javascript = f"addPoint({new_point[0]}, {new_point[1]}, true);"
-                    self.qwebengine.page().runJavaScript(javascript)
-                    if self.old_point is not None:
-                        lineCoordinates = "[[" + f"{self.old_point[0]},{self.old_point[1]}], [{new_point[0]},{new_point[1]}]]"
-                        javascript = f"var line = L.polyline({lineCoordinates}, {{color: 'red'}}).addTo(mymap);"
-                        self.qwebengine.page().runJavaScript(javascript)
+                    # 只保存点，MapBridge 会批量推送到页面
+                    self.map_bridge.addPoint(latitude, longitude)
         except Exception as e:
             # 可以在这里打印错误，或者忽略偶尔的解析错误
             pass
 
     def closeEvent(self, event):
         print("正在关闭窗口并断开无人机连接...")
+        if self.bridge:
+            self.bridge.stop()
         if self.drone:
+            self.drone.removeFrameListener()
             self.drone.close()
+        self.tile_server.stop()
+        self.tile_cache.close()
         event.accept()
 
 
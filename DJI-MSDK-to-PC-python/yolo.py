@@ -1,12 +1,21 @@
 from OpenDJI import OpenDJI
+from Inference import InferenceStage, YoloDetector, TiledDetector, drawDetections
+from Tracker import TrackingStage
+from TimeSync import TimeSync
+from GeoLocate import GeoLocator, CameraModel
+from VideoEncoder import VideoEncoder
+from MotionGate import MotionGate
 import cv2
 import numpy as np
-from ultralytics import YOLO  # 导入 YOLO 库
 
 """
 在这个示例中，我们将无人机的实时视频流传给 YOLO 进行检测，
 并显示带有检测框的视频。
 
+检测在后台线程中运行（InferenceStage），总是处理最新的帧，
+显示循环等待新帧（waitFrame），只在有新帧时缩小并绘制最近一次的检测结果，
+因此显示帧率不受推理速度的限制，也不会重复绘制同一帧。
+
     按 Q - 关闭程序
 """
 
@@ -15,47 +24,116 @@ from ultralytics import YOLO  # 导入 YOLO 库
 IP_ADDR = "192.168.137.116"
 # 你的模型路径 (例如你上传的 last.pt 或官方的 yolo11n.pt)
 MODEL_PATH = 'last.pt'
+# 置信度阈值
+CONFIDENCE = 0.1
+# 显示缩放比例
+SCALE_FACTOR = 0.6
+# 使用跟踪：每 DETECT_INTERVAL 帧运行一次 YOLO，其他帧用光流传播检测框，
+#  每个目标有持久的跟踪 ID。设置为 False 则每个最新帧都运行 YOLO。
+USE_TRACKER = False
+DETECT_INTERVAL = 5
+# 变化门控：画面没有变化时不运行 YOLO，复用上一次的检测结果（悬停时大幅减少计算），
+#  最长 GATE_MAX_INTERVAL 秒仍然重新检测一次。设置为 None 则每帧都运行 YOLO。
+GATE_THRESHOLD = None  # 例如 6.0（块的平均亮度差）
+GATE_MAX_INTERVAL = 2.0
+# 分块推理：高分辨率（例如 4K）的帧切成重叠的图块后一起推理，检测小目标。
+#  设置为 None 则把整帧交给 YOLO（内部缩小到推理尺寸）。
+TILE_SIZE = None  # 例如 640
+TILE_OVERLAP = 0.2
+# 地理定位：按帧的时刻对齐遥测，在检测框旁显示框中心的地面经纬度
+GEOLOCATE = False
+CAMERA_HFOV = 82.1
+# 保存带标注的视频（在编码线程中编码，不影响检测和显示），None 表示不保存
+SAVE_VIDEO = None  # 例如 "annotated.mp4"
 # ------------
 
 # 1. 加载 YOLO 模型
 print(f"正在加载模型 {MODEL_PATH} ...")
 try:
-    model = YOLO(MODEL_PATH)
+    detector = YoloDetector(MODEL_PATH, conf=CONFIDENCE, imgsz=TILE_SIZE)
 except Exception as e:
     print(f"模型加载失败: {e}")
     exit()
 
+if TILE_SIZE is not None:
+    detector = TiledDetector(detector, TILE_SIZE, TILE_OVERLAP)
+
+# 创建一个黑色背景提示 "No Signal"
+BLANK_FRAME = np.zeros((720, 1280, 3), dtype=np.uint8)
+cv2.putText(BLANK_FRAME, "Waiting for Frame...", (50, 360),
+            cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+BLANK_FRAME = cv2.resize(BLANK_FRAME, (0, 0), fx=SCALE_FACTOR, fy=SCALE_FACTOR)
+
 # 连接到无人机
 with OpenDJI(IP_ADDR) as drone:
     print(f"已连接到无人机 @ {IP_ADDR}")
     print("按 'q' 关闭程序")
 
-    while cv2.waitKey(1) != ord('q'):
-        # 2. 获取无人机视频帧 (OpenCV BGR 格式)
-        frame = drone.getFrame()
-
-        # 如果没有帧，显示黑屏或跳过
-        if frame is None:
-            # 创建一个黑色背景提示 "No Signal"
-            frame = np.zeros((720, 1280, 3), dtype=np.uint8)
-            cv2.putText(frame, "Waiting for Frame...", (50, 360),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-        else:
-            # 3. 使用 YOLO 进行推理
-            # stream=True 可以让推理更快，但对于单帧显示直接调用即可
-            # conf=0.5 设置置信度阈值
-            results = model(frame, verbose=False, conf=0.1)
-
-            # 4. 在帧上绘制检测结果
-            # results[0].plot() 会返回一个画好框的 numpy 数组
-            annotated_frame = results[0].plot()
-
-            # 将处理后的帧赋值回去，准备显示
-            frame = annotated_frame
-
-        # 5. 显示结果
-        # 可以在这里调整图像大小以适应屏幕
-        frame_show = cv2.resize(frame, (0, 0), fx=0.6, fy=0.6)
-        cv2.imshow("Drone YOLO Detection", frame_show)
-
-    cv2.destroyAllWindows()
\ No newline at end of file
+    # 2. 在后台启动推理（或跟踪）
+    if USE_TRACKER:
+        stage = TrackingStage(detector, drone, detect_interval=DETECT_INTERVAL)
+    else:
+        gate = MotionGate(GATE_THRESHOLD, max_interval=GATE_MAX_INTERVAL) \
+            if GATE_THRESHOLD is not None else None
+        stage = InferenceStage(detector, [drone], gate=gate)
+
+    # 遥测历史和地面投影（可选）
+    sync = TimeSync(drone) if GEOLOCATE else None
+    locator = GeoLocator(CameraModel(hfov=CAMERA_HFOV))
+
+    encoder = VideoEncoder(SAVE_VIDEO) if SAVE_VIDEO else None
+    last_seq = 0
+    key = -1
+
+    with stage:
+
+        while key != ord('q'):
+            # 3. 等待新的无人机视频帧 (OpenCV BGR 格式)，最多等待 50 毫秒，
+            #  之后由 waitKey 处理窗口事件和按键
+            seq, frame = drone.waitFrame(last_seq, timeout=0.05)
+
+            # 如果没有帧（还没有收到，或者视频流已关闭），显示黑屏
+            #  （视频流关闭后 waitFrame 立即返回，由 waitKey 控制循环速度）
+            if frame is None:
+                cv2.imshow("Drone YOLO Detection", BLANK_FRAME)
+                key = cv2.waitKey(50)
+                continue
+
+            # 没有新帧时不重新绘制
+            if seq == last_seq:
+                key = cv2.waitKey(1)
+                continue
+            last_seq = seq
+
+            # 4. 先缩小，再在小图上绘制最近的检测结果
+            frame_show = cv2.resize(frame, (0, 0), fx=SCALE_FACTOR, fy=SCALE_FACTOR)
+            detections = stage.latest()
+            drawDetections(frame_show, detections, detector.names)
+
+            if sync is not None and detections is not None and len(detections) > 0:
+                state = sync.atFrame(detections.seq)
+                if state is not None:
+                    latlon = locator.locateDetections(detections, state)
+                    for box, (lat, lon) in zip(detections.boxes, latlon):
+                        if lat == lat:  # 不是 NaN
+                            x, y = int(box[0] * SCALE_FACTOR), int(box[3] * SCALE_FACTOR) + 15
+                            cv2.putText(frame_show, f"{lat:.6f}, {lon:.6f}", (x, y),
+                                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
+
+            cv2.putText(frame_show, f"Detection FPS: {stage.fps():.1f}", (10, 25),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+            if not USE_TRACKER and GATE_THRESHOLD is not None:
+                cv2.putText(frame_show, f"Reused: {stage.reusedRatio() * 100:.0f}%", (10, 50),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+
+            # 5. 显示结果（并提交给编码器，frame_show 每次都是新的数组，不需要复制）
+            cv2.imshow("Drone YOLO Detection", frame_show)
+            if encoder is not None:
+                encoder.submit(frame_show, copy=False)
+            key = cv2.waitKey(1)
+
+    if encoder is not None:
+        encoder.stop()
+        print(f"已保存 {SAVE_VIDEO}: {encoder.stats()}")
+
+    cv2.destroyAllWindows()